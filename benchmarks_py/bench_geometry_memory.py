@@ -0,0 +1,50 @@
+"""Measures memory per Word, with and without geometry interning.
+
+Run from the root of the Foundation repo:
+  PYTHONPATH=py python3 benchmarks_py/bench_geometry_memory.py
+"""
+
+import json
+import random
+import tracemalloc
+
+from typing import Callable, Tuple
+
+from foundation.document import Document, dump_to_json, load_fnd_doc_from_json
+from foundation.entity import Text, Word
+from foundation.geometry import BBox, Interval
+
+
+def random_document(word_count: int) -> Document:
+  rng = random.Random(0)
+  words = tuple(
+    Word(BBox(Interval(x, x + rng.uniform(5, 40)),
+              Interval(y, y + rng.uniform(8, 12))), 'word')
+    for x, y in ((rng.uniform(0, 1000), rng.uniform(0, 1400))
+                 for _ in range(word_count)))
+  texts = tuple(Text.from_words(words[i:i + 4])
+                for i in range(0, word_count, 4))
+  return Document.from_entities(words + texts)
+
+
+def measure(build: Callable[[], object]) -> Tuple[object, int]:
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  result = build()
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return result, after - before
+
+
+def main() -> None:
+  word_count = 20000
+  blob = json.loads(dump_to_json(random_document(word_count)))
+  for intern_geometry in (False, True):
+    _, size = measure(lambda: load_fnd_doc_from_json(blob, intern_geometry))
+    print(f'intern_geometry={intern_geometry}: '
+          f'{size / word_count:.0f} bytes per word '
+          '(each word also appears in one Text)')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,76 @@
+"""Compares the compact pickling of documents with default pickling.
+
+Default pickling is emulated with a Pickler that reduces entities, documents
+and extractions the way `object.__reduce_ex__` would without their
+`__reduce__` methods.
+
+Run from the root of the Foundation repo:
+  PYTHONPATH=py python3 benchmarks_py/bench_pickle.py
+"""
+
+import copyreg
+import io
+import json
+import pickle
+import random
+import time
+
+from typing import Any, Callable, Tuple
+
+from foundation.document import Document, dump_to_json, load_fnd_doc_from_json
+from foundation.entity import Entity, Text, Word
+from foundation.extraction import Extraction
+from foundation.geometry import BBox, Interval
+
+
+def random_document(word_count: int) -> Document:
+  rng = random.Random(0)
+  words = tuple(
+    Word(BBox(Interval(x, x + rng.uniform(5, 40)),
+              Interval(y, y + rng.uniform(8, 12))), 'word')
+    for x, y in ((rng.uniform(0, 1000), rng.uniform(0, 1400))
+                 for _ in range(word_count)))
+  texts = tuple(Text.from_words(words[i:i + 4])
+                for i in range(0, word_count, 4))
+  return Document.from_entities(words + texts)
+
+
+class DefaultPickler(pickle.Pickler):
+
+  def reducer_override(self, obj: Any) -> Any:
+    if isinstance(obj, (Entity, Document, Extraction)):
+      return copyreg.__newobj__, (type(obj),), obj.__dict__ # type: ignore
+    return NotImplemented
+
+
+def default_dumps(obj: Any) -> bytes:
+  f = io.BytesIO()
+  DefaultPickler(f, pickle.HIGHEST_PROTOCOL).dump(obj)
+  return f.getvalue()
+
+
+def timed(f: Callable[[], Any], repeat: int = 5) -> Tuple[Any, float]:
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = f()
+    best = min(best, time.perf_counter() - start)
+  return result, best
+
+
+def main() -> None:
+  # Loading from JSON un-shares the words, as for real documents.
+  document = load_fnd_doc_from_json(
+    json.loads(dump_to_json(random_document(20000))))
+  for name, dumps in (
+      ('default', default_dumps),
+      ('compact', lambda d: pickle.dumps(d, pickle.HIGHEST_PROTOCOL))):
+    data, dump_time = timed(lambda: dumps(document))
+    loaded, load_time = timed(lambda: pickle.loads(data))
+    assert loaded == document
+    print(f'{name}: {len(data) / 1e6:.2f} MB, '
+          f'dumps {dump_time * 1e3:.0f} ms, loads {load_time * 1e3:.0f} ms')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,279 @@
+"""An indexed archive of many documents in one file.
+
+An archive file is laid out as:
+
+  - a header: the magic bytes `FNDA`, a format version (uint32), and the
+    offset and length of the current index (uint64 each),
+  - the documents, each as JSON, optionally zlib-compressed,
+  - indexes, in JSON: for each document name, the offset and length of its
+    record and whether it is compressed.
+
+Looking up a document by name is a dict lookup and a single read. Appending
+writes the new records and a new index after the current index, makes them
+durable, and only then points the header at the new index. Until that last
+step the header keeps pointing at the previous index, so a crash or a full
+disk while appending loses only the new documents. Existing records are never
+rewritten or moved.
+
+Any number of readers may use an archive at once, also while another process
+appends to it: the header and index are read under a shared file lock, and a
+writer takes an exclusive one only to publish a new index. Records are
+immutable once indexed, so reading them needs no lock. Writers lock a sidecar
+`.lock` file for as long as they are open, so a second writer waits for the
+first to finish.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+try:
+  import fcntl
+except ImportError: # pragma: no cover
+  # File locking is only available on Unix.
+  fcntl = None # type: ignore
+
+from .document import Document, dump_to_json, load_fnd_doc_from_json
+from .targets import DocTargets, Targets
+
+
+MAGIC = b'FNDA'
+ARCHIVE_FORMAT_VERSION = 2
+
+# Magic, version, index offset, index length.
+_HEADER = struct.Struct('<4sIQQ')
+
+# Offset, length, compressed.
+_IndexEntry = Tuple[int, int, bool]
+
+
+def _lock(f: BinaryIO, exclusive: bool) -> None:
+  if fcntl is not None:
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock(f: BinaryIO) -> None:
+  if fcntl is not None:
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _read_header(f: BinaryIO) -> Tuple[int, int]:
+  """The offset and length of the current index."""
+  header = os.pread(f.fileno(), _HEADER.size, 0)
+  if len(header) < _HEADER.size:
+    raise ValueError('not a Foundation document archive')
+  magic, version, index_offset, index_length = _HEADER.unpack(header)
+  if magic != MAGIC:
+    raise ValueError('not a Foundation document archive')
+  if version != ARCHIVE_FORMAT_VERSION:
+    raise ValueError(f'unsupported archive version {version}')
+  return index_offset, index_length
+
+
+def _read_index(f: BinaryIO) -> Tuple[Dict[str, _IndexEntry], int]:
+  """The current index of an archive, and where it ends."""
+  index_offset, index_length = _read_header(f)
+  data = os.pread(f.fileno(), index_length, index_offset)
+  if len(data) < index_length:
+    raise ValueError('archive is truncated')
+  index = {name: (offset, length, compressed) for name, (offset, length,
+           compressed) in json.loads(data).items()}
+  return index, index_offset + index_length
+
+
+def _writer_lock_path(path: Path) -> Path:
+  """The sidecar file which writers of an archive lock."""
+  return path.with_name(path.name + '.lock')
+
+
+def _write_header(f: BinaryIO, index_offset: int, index_length: int) -> None:
+  os.pwrite(f.fileno(), _HEADER.pack(
+    MAGIC, ARCHIVE_FORMAT_VERSION, index_offset, index_length), 0)
+
+
+class ArchiveWriter:
+  """Adds documents to an archive, creating it if needed.
+
+  The new documents become visible to readers when the writer is closed. If
+  the writer is used as a context manager and the block raises, they are
+  discarded instead. Adding a document with the name of an existing one
+  replaces it in the index.
+  """
+
+  def __init__(self, path: Path, compress: bool = False):
+    """
+    Args:
+      path: The archive file.
+      compress: Whether to zlib-compress the documents added by this writer.
+    """
+    self.compress = compress
+    # Writers exclude each other for their whole lifetime through a sidecar
+    # file, so that the lock on the archive itself, which readers share, is
+    # only held to publish an index.
+    lock_path = _writer_lock_path(path)
+    self._writer_lock: BinaryIO = lock_path.open('a+b') # type: ignore
+    _lock(self._writer_lock, exclusive=True)
+    try:
+      # Not truncating: another process may be reading it.
+      self.f: BinaryIO = os.fdopen(
+        os.open(path, os.O_RDWR | os.O_CREAT), 'r+b') # type: ignore
+      _lock(self.f, exclusive=True)
+      try:
+        if os.fstat(self.f.fileno()).st_size == 0:
+          index = b'{}'
+          _write_header(self.f, _HEADER.size, len(index))
+          os.pwrite(self.f.fileno(), index, _HEADER.size)
+          os.fsync(self.f.fileno())
+        self.index, self.position = _read_index(self.f)
+      finally:
+        _unlock(self.f)
+    except BaseException:
+      self._writer_lock.close()
+      raise
+    self._committed_end = self.position
+
+  def add(self, document: Document) -> None:
+    if document.name is None:
+      raise ValueError('only named documents can be archived')
+    data = dump_to_json(document).encode('utf-8')
+    if self.compress:
+      data = zlib.compress(data)
+    # Only past the current index, which nothing indexed refers to.
+    os.pwrite(self.f.fileno(), data, self.position)
+    self.index[document.name] = (self.position, len(data), self.compress)
+    self.position += len(data)
+
+  def close(self) -> None:
+    """Publishes the added documents."""
+    try:
+      index = json.dumps(self.index).encode('utf-8')
+      os.pwrite(self.f.fileno(), index, self.position)
+      os.fsync(self.f.fileno())
+      _lock(self.f, exclusive=True)
+      try:
+        _write_header(self.f, self.position, len(index))
+        os.fsync(self.f.fileno())
+        # Drop anything left over from an earlier failed append.
+        self.f.truncate(self.position + len(index))
+      finally:
+        _unlock(self.f)
+    finally:
+      self._release()
+
+  def discard(self) -> None:
+    """Drops the added documents. The archive is left as it was."""
+    try:
+      self.f.truncate(self._committed_end)
+    finally:
+      self._release()
+
+  def _release(self) -> None:
+    self.f.close()
+    self._writer_lock.close()
+
+  def __enter__(self) -> 'ArchiveWriter':
+    return self
+
+  def __exit__(
+    self,
+    exc_type: Optional[Type[BaseException]],
+    exc_value: Optional[BaseException],
+    traceback: Optional[TracebackType],
+  ) -> None:
+    if exc_type is None:
+      self.close()
+    else:
+      self.discard()
+
+
+def save_archive(
+  path: Path,
+  documents: Iterable[Document],
+  compress: bool = False,
+) -> None:
+  """Adds documents to an archive."""
+  with ArchiveWriter(path, compress) as writer:
+    for document in documents:
+      writer.add(document)
+
+
+class DocumentArchive:
+  """Random access to the documents in an archive, by name.
+
+  Reads use `os.pread`, so one DocumentArchive can be shared between threads.
+  """
+
+  def __init__(self, path: Path):
+    self.path = path
+    self.f: BinaryIO = path.open('rb') # type: ignore
+    self.refresh()
+
+  def refresh(self) -> None:
+    """Picks up documents appended since this archive was opened."""
+    _lock(self.f, exclusive=False)
+    try:
+      self.index, _ = _read_index(self.f)
+    finally:
+      _unlock(self.f)
+
+  @property
+  def names(self) -> List[str]:
+    return list(self.index)
+
+  def __len__(self) -> int:
+    return len(self.index)
+
+  def __contains__(self, name: str) -> bool:
+    return name in self.index
+
+  def __getitem__(self, name: str) -> Document:
+    if name not in self.index:
+      raise KeyError(f'doc {name} missing from {self.path}')
+    offset, length, compressed = self.index[name]
+    data = os.pread(self.f.fileno(), length, offset)
+    if compressed:
+      data = zlib.decompress(data)
+    return load_fnd_doc_from_json(json.loads(data))
+
+  def get(self, name: str) -> Optional[Document]:
+    return self[name] if name in self.index else None
+
+  def __iter__(self) -> Iterator[Document]:
+    """The documents in the order they were added."""
+    for name in sorted(self.index, key=lambda name: self.index[name][0]):
+      yield self[name]
+
+  def get_by_doc_name(
+    self,
+    targets: Targets,
+    doc_name: str,
+  ) -> Tuple[DocTargets, Document]:
+    """Like `Targets.get_by_doc_name`, but also fetches the document."""
+    return targets.get_by_doc_name(doc_name), self[doc_name]
+
+  def with_targets(
+    self,
+    targets: Targets,
+  ) -> Iterator[Tuple[DocTargets, Document]]:
+    """Each doc's targets together with its document from this archive."""
+    for doc_targets in targets.doc_targets:
+      yield doc_targets, self[doc_targets.doc_name]
+
+  def close(self) -> None:
+    self.f.close()
+
+  def __enter__(self) -> 'DocumentArchive':
+    return self
+
+  def __exit__(
+    self,
+    exc_type: Optional[Type[BaseException]],
+    exc_value: Optional[BaseException],
+    traceback: Optional[TracebackType],
+  ) -> None:
+    self.close()
@@ -0,0 +1,362 @@
+"""Columnar geometry.
+
+A BBoxArray stores many bounding boxes as four parallel NumPy columns so that
+geometric predicates can be evaluated over a whole page of words at once. Every
+method mirrors a scalar method on BBox and returns the same results.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from numpy.typing import DTypeLike
+
+from .entity import Entity
+from .geometry import BBox, FixedPoint, Interval, Point
+
+
+def _checked_cast(values: np.ndarray, dtype: DTypeLike) -> np.ndarray:
+  """values as an integer dtype, which must hold all of them."""
+  info = np.iinfo(dtype)
+  # NaNs fail both comparisons.
+  if values.size and not (values.min() >= info.min and
+                          values.max() <= info.max):
+    raise OverflowError(f'coordinates out of range for {np.dtype(dtype)}')
+  return values.astype(dtype)
+
+
+class BBoxArray:
+  """A struct-of-arrays collection of bounding boxes.
+
+  Attributes:
+    x0: The `ix.a` coordinate of each box.
+    x1: The `ix.b` coordinate of each box.
+    y0: The `iy.a` coordinate of each box.
+    y1: The `iy.b` coordinate of each box.
+  """
+
+  __slots__ = ('x0', 'x1', 'y0', 'y1')
+
+  def __init__(
+    self,
+    x0: np.ndarray,
+    x1: np.ndarray,
+    y0: np.ndarray,
+    y1: np.ndarray,
+  ):
+    if not len(x0) == len(x1) == len(y0) == len(y1):
+      raise ValueError('BBoxArray columns must have equal lengths')
+    self.x0 = x0
+    self.x1 = x1
+    self.y0 = y0
+    self.y1 = y1
+
+  @staticmethod
+  def from_bboxes(
+    bboxes: Iterable[BBox],
+    dtype: Optional[DTypeLike] = None,
+  ) -> 'BBoxArray':
+    """Packs bboxes into columns.
+
+    Args:
+      bboxes: The boxes.
+      dtype: The column type. Defaults to float64, which holds fixed-point
+        coordinates exactly too. Pass int32 for compact fixed-point columns;
+        products such as `area` are computed in int64.
+
+    Raises:
+      OverflowError: If dtype is an integer type and a coordinate is out of
+        its range.
+    """
+    rows = [(b.ix.a, b.ix.b, b.iy.a, b.iy.b) for b in bboxes]
+    if dtype is None or np.dtype(dtype).kind not in 'iu':
+      coords = np.array(rows, dtype=np.float64 if dtype is None else dtype)
+    else:
+      coords = _checked_cast(np.array(rows), dtype)
+    coords = coords.reshape(-1, 4)
+    return BBoxArray(*(np.ascontiguousarray(coords[:, k]) for k in range(4)))
+
+  @staticmethod
+  def from_entities(
+    entities: Iterable[Entity],
+    dtype: Optional[DTypeLike] = None,
+  ) -> 'BBoxArray':
+    return BBoxArray.from_bboxes((e.bbox for e in entities), dtype)
+
+  def quantized(self, fixed_point: FixedPoint) -> 'BBoxArray':
+    """These boxes in fixed-point int32 coordinates.
+
+    Raises:
+      OverflowError: If a quantized coordinate does not fit in an int32.
+    """
+    def quantize(column: np.ndarray) -> np.ndarray:
+      return _checked_cast(
+        np.round(column * fixed_point.resolution), np.int32)
+    return BBoxArray(*map(quantize, (self.x0, self.x1, self.y0, self.y1)))
+
+  @property
+  def dtype(self) -> np.dtype:
+    return self.x0.dtype
+
+  def __len__(self) -> int:
+    return len(self.x0)
+
+  def __getitem__(self, i: int) -> BBox:
+    return BBox(
+      Interval(self.x0[i].item(), self.x1[i].item()),
+      Interval(self.y0[i].item(), self.y1[i].item()))
+
+  def __iter__(self) -> Iterator[BBox]:
+    return iter(self.to_bboxes())
+
+  def to_bboxes(self) -> Tuple[BBox, ...]:
+    return tuple(
+      BBox(Interval(x0, x1), Interval(y0, y1))
+      for x0, x1, y0, y1 in zip(
+        self.x0.tolist(), self.x1.tolist(), self.y0.tolist(), self.y1.tolist()))
+
+  def select(self, mask_or_indices: np.ndarray) -> 'BBoxArray':
+    """The sub-array picked out by a boolean mask or an index array."""
+    return BBoxArray(
+      self.x0[mask_or_indices],
+      self.x1[mask_or_indices],
+      self.y0[mask_or_indices],
+      self.y1[mask_or_indices])
+
+  @property
+  def width(self) -> np.ndarray:
+    return _widened(self.x1) - self.x0
+
+  @property
+  def height(self) -> np.ndarray:
+    return _widened(self.y1) - self.y0
+
+  @property
+  def area(self) -> np.ndarray:
+    return self.width * self.height
+
+  @property
+  def center(self) -> Tuple[np.ndarray, np.ndarray]:
+    """The x and y coordinates of each box's center."""
+    return (_widened(self.x1) + self.x0) / 2, (_widened(self.y1) + self.y0) / 2
+
+  def contains(self, p: Point) -> np.ndarray:
+    """Vectorized `p in bbox` for each box."""
+    return (self.x0 <= p.x) & (p.x <= self.x1) & \
+           (self.y0 <= p.y) & (p.y <= self.y1)
+
+  def intersects(self, other: BBox) -> np.ndarray:
+    """Vectorized `bbox.intersects_bbox(other)` for each box."""
+    return ~((self.x1 < other.ix.a) | (other.ix.b < self.x0)) & \
+           ~((self.y1 < other.iy.a) | (other.iy.b < self.y0))
+
+  def contains_bbox(self, other: BBox) -> np.ndarray:
+    """Vectorized `bbox.contains_bbox(other)` for each box."""
+    if not (other.ix.valid and other.iy.valid):
+      return np.zeros(len(self), dtype=bool)
+    return (self.x0 <= other.ix.a) & (other.ix.b <= self.x1) & \
+           (self.y0 <= other.iy.a) & (other.iy.b <= self.y1)
+
+  def contained_in(self, other: BBox) -> np.ndarray:
+    """Vectorized `other.contains_bbox(bbox)` for each box.
+
+    This is the usual "which words are inside this region" filter.
+    """
+    return (other.ix.a <= self.x0) & (self.x0 <= self.x1) & \
+           (self.x1 <= other.ix.b) & \
+           (other.iy.a <= self.y0) & (self.y0 <= self.y1) & \
+           (self.y1 <= other.iy.b)
+
+  def percentages_overlapping(self, other: BBox) -> 'BBoxArray':
+    """Vectorized `bbox.percentages_overlapping(other)` for each box.
+
+    Rows for which the scalar method returns None are NaN in every column.
+    """
+    px0, px1, px_ok = _percentages_overlapping(
+      self.x0, self.x1, other.ix.a, other.ix.b)
+    py0, py1, py_ok = _percentages_overlapping(
+      self.y0, self.y1, other.iy.a, other.iy.b)
+    missing = ~(px_ok & py_ok)
+    for column in (px0, px1, py0, py1):
+      column[missing] = np.nan
+    return BBoxArray(px0, px1, py0, py1)
+
+  def distances_to(self, other: BBox) -> np.ndarray:
+    """Vectorized `BBox.distance(bbox, other)` for each box."""
+    return _distances(
+      self.x0, self.x1, self.y0, self.y1,
+      other.ix.a, other.ix.b, other.iy.a, other.iy.b)
+
+  def union(self) -> Optional[BBox]:
+    """Same as `BBox.union` over all boxes in this array."""
+    if len(self) == 0:
+      return None
+    return BBox(
+      Interval(
+        min(self.x0.min(), self.x1.min()).item(),
+        max(self.x0.max(), self.x1.max()).item()),
+      Interval(
+        min(self.y0.min(), self.y1.min()).item(),
+        max(self.y0.max(), self.y1.max()).item()))
+
+
+# A column, or a scalar broadcast against columns.
+_Coords = Union[np.ndarray, float]
+
+
+def _widened(column: _Coords) -> _Coords:
+  """Integer columns as int64, so that sums and products of int32
+  coordinates cannot overflow."""
+  if isinstance(column, np.ndarray) and column.dtype.kind in 'iu':
+    return column.astype(np.int64)
+  return column
+
+
+def _distances(
+  ax0: _Coords, ax1: _Coords, ay0: _Coords, ay1: _Coords,
+  bx0: _Coords, bx1: _Coords, by0: _Coords, by1: _Coords,
+) -> np.ndarray:
+  """`BBox.distance` over broadcast columns, with the same float operations in
+  the same order, so that results agree exactly."""
+  ax0, ax1, ay0, ay1, bx0, bx1, by0, by1 = map(
+    _widened, (ax0, ax1, ay0, ay1, bx0, bx1, by0, by1))
+  inner_width = np.maximum(
+    np.maximum(ax1, bx1) - np.minimum(ax0, bx0) - (ax1 - ax0) - (bx1 - bx0), 0)
+  inner_height = np.maximum(
+    np.maximum(ay1, by1) - np.minimum(ay0, by0) - (ay1 - ay0) - (by1 - by0), 0)
+  # Square in float64, which cannot overflow.
+  inner_width = np.asarray(inner_width, dtype=np.float64)
+  inner_height = np.asarray(inner_height, dtype=np.float64)
+  return np.sqrt(inner_width * inner_width + inner_height * inner_height)
+
+
+def distance_matrix(
+  boxes: BBoxArray,
+  other: Optional[BBoxArray] = None,
+) -> np.ndarray:
+  """The matrix of `BBox.distance` between every box and every other box.
+
+  Args:
+    boxes: n boxes.
+    other: m boxes. Defaults to boxes.
+
+  Returns:
+    An n by m array of distances.
+  """
+  if other is None:
+    other = boxes
+  return _distances(
+    boxes.x0[:, None], boxes.x1[:, None], boxes.y0[:, None], boxes.y1[:, None],
+    other.x0[None, :], other.x1[None, :], other.y0[None, :], other.y1[None, :])
+
+
+def pairs_within_distance(
+  boxes: BBoxArray,
+  cutoff: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """The sparse form of `distance_matrix(boxes)`, keeping distances <= cutoff.
+
+  Each box is grown by half the cutoff and bucketed into the cells of a
+  uniform grid it overlaps; only boxes sharing a cell are compared. A pair is
+  compared only in the cell holding the lower corner of the overlap of the
+  grown boxes, so no pair is reported twice. Memory is proportional to the
+  number of (box, cell) incidences and candidate pairs rather than n^2.
+
+  Returns:
+    Arrays (i, j, distance) with i < j, sorted by (i, j). Boxes which are not
+    valid are skipped.
+  """
+  empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+           np.zeros(0, dtype=np.float64))
+  ids = np.flatnonzero((boxes.x0 <= boxes.x1) & (boxes.y0 <= boxes.y1))
+  if len(ids) < 2 or cutoff < 0:
+    return empty
+
+  # A little slack keeps rounding in the growth from losing boundary pairs;
+  # exact distances are checked at the end anyway.
+  half = cutoff / 2 + abs(cutoff) * 1e-9
+  ex0, ex1 = boxes.x0[ids] - half, boxes.x1[ids] + half
+  ey0, ey1 = boxes.y0[ids] - half, boxes.y1[ids] + half
+  cell_size = max(float(np.median(np.concatenate([ex1 - ex0, ey1 - ey0]))),
+                  float(cutoff))
+  if not cell_size > 0:
+    cell_size = 1.0
+  origin_x, origin_y = ex0.min(), ey0.min()
+
+  def cells(xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return (np.floor((xs - origin_x) / cell_size).astype(np.int64),
+            np.floor((ys - origin_y) / cell_size).astype(np.int64))
+
+  cx0, cy0 = cells(ex0, ey0)
+  cx1, cy1 = cells(ex1, ey1)
+  row_length = int(cx1.max()) + 1
+  widths = cx1 - cx0 + 1
+  counts = widths * (cy1 - cy0 + 1)
+  members = np.repeat(np.arange(len(ids)), counts)
+  offsets = np.arange(int(counts.sum())) - \
+            np.repeat(np.cumsum(counts) - counts, counts)
+  cell_ids = (np.repeat(cy0, counts) + offsets // np.repeat(widths, counts)) * \
+             row_length + \
+             np.repeat(cx0, counts) + offsets % np.repeat(widths, counts)
+  order = np.argsort(cell_ids, kind='stable')
+  cell_ids, members = cell_ids[order], members[order]
+
+  boundaries = np.flatnonzero(np.diff(cell_ids)) + 1
+  starts = np.concatenate([[0], boundaries])
+  ends = np.concatenate([boundaries, [len(cell_ids)]])
+  triangles: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+  I: List[np.ndarray] = []
+  J: List[np.ndarray] = []
+  C: List[np.ndarray] = []
+  for start, end in zip(starts.tolist(), ends.tolist()):
+    k = end - start
+    if k < 2:
+      continue
+    if k not in triangles:
+      triangles[k] = np.triu_indices(k, 1)
+    upper, lower = triangles[k]
+    group = members[start:end]
+    I.append(group[upper])
+    J.append(group[lower])
+    C.append(np.full(len(upper), cell_ids[start]))
+  if not I:
+    return empty
+  i, j, c = np.concatenate(I), np.concatenate(J), np.concatenate(C)
+
+  overlapping = (ex0[i] <= ex1[j]) & (ex0[j] <= ex1[i]) & \
+                (ey0[i] <= ey1[j]) & (ey0[j] <= ey1[i])
+  i, j, c = i[overlapping], j[overlapping], c[overlapping]
+  rx, ry = cells(np.maximum(ex0[i], ex0[j]), np.maximum(ey0[i], ey0[j]))
+  owned = ry * row_length + rx == c
+  i, j = ids[i[owned]], ids[j[owned]]
+
+  d = _distances(
+    boxes.x0[i], boxes.x1[i], boxes.y0[i], boxes.y1[i],
+    boxes.x0[j], boxes.x1[j], boxes.y0[j], boxes.y1[j])
+  within = d <= cutoff
+  i, j, d = i[within], j[within], d[within]
+  order = np.lexsort((j, i))
+  return i[order], j[order], d[order]
+
+
+def _percentages_overlapping(
+  a: np.ndarray,
+  b: np.ndarray,
+  other_a: float,
+  other_b: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """Vectorized `Interval.percentages_overlapping` along one axis.
+
+  Returns:
+    The two percentage columns and a mask of rows which are not None.
+  """
+  lo = np.maximum(a, other_a)
+  hi = np.minimum(b, other_b)
+  ok = lo <= hi
+  length = b - a
+  degenerate = length == 0
+  with np.errstate(divide='ignore', invalid='ignore'):
+    p0 = np.where(degenerate, 0.0, (lo - a) / length)
+    p1 = np.where(degenerate, 1.0, (hi - a) / length)
+  return p0, p1, ok
+
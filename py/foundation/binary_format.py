@@ -0,0 +1,227 @@
+"""A memory-mappable binary document format.
+
+A binary document is an `EntityStore` on disk:
+
+  - the magic bytes `FNDB`, a format version (uint32) and the length of the
+    header (uint32),
+  - the header, in JSON: the document's bbox and name, the entity type
+    strings, and the dtype, offset and length of each column section,
+  - the column sections, each 8-byte aligned: type codes, geometry, text ids,
+    child offsets and ids, roots, the string table (UTF-8 bytes plus int64
+    offsets) and the remaining field values of each entity (one JSON array
+    per entity, plus int64 offsets).
+
+Each section keeps the dtype of the store's column, so the int geometry of
+e.g. a fixed-point document reads back as ints.
+
+`open_binary_document` maps the file and wraps the sections in NumPy arrays
+without copying them; strings and field values are decoded when an entity
+that uses them is accessed. Opening a document therefore costs the same
+regardless of its size.
+"""
+
+import json
+import mmap
+import struct
+
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Sequence, Tuple, Type, overload
+
+import numpy as np
+
+from .bbox_array import BBoxArray
+from .document import Document
+from .entity import Entity, entity_resolver
+from .entity_store import EntityStore
+from .geometry import BBox
+from .instantiate import compile_decoder
+from .json_writer import DataclassEncoder
+
+
+MAGIC = b'FNDB'
+BINARY_FORMAT_VERSION = 1
+
+# Magic, version, header length.
+_PREAMBLE = struct.Struct('<4sII')
+_ALIGNMENT = 8
+
+
+class _StringTable(Sequence[str]):
+  """The strings of a section of UTF-8 bytes and their offsets."""
+
+  def __init__(self, data: np.ndarray, offsets: np.ndarray):
+    self.data = data
+    self.offsets = offsets
+
+  def __len__(self) -> int:
+    return len(self.offsets) - 1
+
+  @overload
+  def __getitem__(self, i: int) -> str: ...
+  @overload
+  def __getitem__(self, i: slice) -> Sequence[str]: ...
+  def __getitem__(self, i: Any) -> Any:
+    if isinstance(i, slice):
+      return [self[j] for j in range(*i.indices(len(self)))]
+    return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes() \
+      .decode('utf-8')
+
+
+class _AttributeTable(Sequence[Tuple[Any, ...]]):
+  """The remaining field values of each entity, decoded on access."""
+
+  def __init__(
+    self,
+    rows: _StringTable,
+    type_codes: np.ndarray,
+    decoders: Sequence[Tuple[Callable[[Any], Any], ...]],
+  ):
+    self.rows = rows
+    self.type_codes = type_codes
+    self.decoders = decoders
+    self._decoded: Dict[int, Tuple[Any, ...]] = {}
+
+  def __len__(self) -> int:
+    return len(self.rows)
+
+  @overload
+  def __getitem__(self, i: int) -> Tuple[Any, ...]: ...
+  @overload
+  def __getitem__(self, i: slice) -> Sequence[Tuple[Any, ...]]: ...
+  def __getitem__(self, i: Any) -> Any:
+    if isinstance(i, slice):
+      return [self[j] for j in range(*i.indices(len(self)))]
+    i = int(i)
+    values = self._decoded.get(i)
+    if values is None:
+      decoders = self.decoders[self.type_codes[i]]
+      values = self._decoded[i] = tuple(
+        decode(value) for decode, value
+        in zip(decoders, json.loads(self.rows[i])))
+    return values
+
+
+def _packed_strings(strings: Sequence[str]) -> Tuple[bytes, np.ndarray]:
+  encoded = [s.encode('utf-8') for s in strings]
+  offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+  np.cumsum([len(e) for e in encoded], out=offsets[1:])
+  return b''.join(encoded), offsets
+
+
+def write_binary_document(store: EntityStore, f: BinaryIO) -> None:
+  """Writes an EntityStore in the binary document format."""
+  encoder = DataclassEncoder()
+  text_data, text_offsets = _packed_strings(store.texts)
+  attribute_data, attribute_offsets = _packed_strings(
+    [encoder.encode(store.attributes[i]) for i in range(len(store))])
+  sections: List[Tuple[str, np.ndarray]] = [
+    ('type_codes', store.type_codes),
+    ('x0', store.geometry.x0),
+    ('x1', store.geometry.x1),
+    ('y0', store.geometry.y0),
+    ('y1', store.geometry.y1),
+    ('text_ids', store.text_ids),
+    ('child_offsets', store.child_offsets),
+    ('child_ids', store.child_ids),
+    ('roots', store.roots),
+    ('text_data', np.frombuffer(text_data, dtype=np.uint8)),
+    ('text_offsets', text_offsets),
+    ('attribute_data', np.frombuffer(attribute_data, dtype=np.uint8)),
+    ('attribute_offsets', attribute_offsets),
+  ]
+  layout: Dict[str, Tuple[str, int, int]] = {}
+  offset = 0
+  for name, array in sections:
+    layout[name] = (array.dtype.str, offset, len(array))
+    offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+  header = json.dumps({
+    'bbox': asdict(store.bbox) if store.bbox is not None else None,
+    'name': store.name,
+    'types': [type_string for _, type_string in store.types],
+    'sections': layout,
+  }).encode('utf-8')
+  header += b' ' * (-(_PREAMBLE.size + len(header)) % _ALIGNMENT)
+  f.write(_PREAMBLE.pack(MAGIC, BINARY_FORMAT_VERSION, len(header)))
+  f.write(header)
+  for _, array in sections:
+    data = np.ascontiguousarray(array).tobytes()
+    f.write(data)
+    f.write(b'\0' * (-len(data) % _ALIGNMENT))
+
+
+def save_binary_document(document: Document, path: Path) -> None:
+  with path.open('wb') as f:
+    write_binary_document(EntityStore.from_document(document), f)
+
+
+def read_binary_document(
+  buffer: Any,
+  resolver: Callable[[Any], Type[Entity]] = entity_resolver,
+) -> EntityStore:
+  """An EntityStore over a binary document in a buffer, without copying it.
+
+  Args:
+    buffer: Any object supporting the buffer protocol, e.g. an mmap.
+    resolver: Maps `{'type': type_string}` to an entity class, for the stored
+      entity types and for entities in field values. Pass one which knows
+      your own Entity subclasses to read documents containing them.
+  """
+  magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+  if magic != MAGIC:
+    raise ValueError('not a binary Foundation document')
+  if version != BINARY_FORMAT_VERSION:
+    raise ValueError(f'unsupported binary document version {version}')
+  header = json.loads(
+    bytes(memoryview(buffer)[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+  start = _PREAMBLE.size + header_length
+
+  def section(name: str) -> np.ndarray:
+    dtype, offset, count = header['sections'][name]
+    return np.frombuffer(
+      buffer, dtype=np.dtype(dtype), count=count, offset=start + offset)
+
+  types: List[Tuple[Type[Entity], str]] = [
+    (resolver({'type': t}), t) for t in header['types']]
+  type_codes = section('type_codes')
+  store = EntityStore(
+    types=types,
+    type_codes=type_codes,
+    geometry=BBoxArray(section('x0'), section('x1'), section('y0'),
+                       section('y1')),
+    texts=_StringTable(section('text_data'), section('text_offsets')),
+    text_ids=section('text_ids'),
+    child_offsets=section('child_offsets'),
+    child_ids=section('child_ids'),
+    attributes=(),
+    roots=section('roots'),
+    bbox=compile_decoder(BBox)(header['bbox'])
+      if header['bbox'] is not None else None,
+    name=header['name'])
+  decoders = [
+    tuple(compile_decoder(
+            entity_type.__dataclass_fields__[name].type, # type: ignore
+            base_classes={Entity},
+            derived_class_resolver=resolver)
+          for name in names)
+    for (entity_type, _), names in zip(types, store.attribute_names)]
+  store.attributes = _AttributeTable(
+    _StringTable(section('attribute_data'), section('attribute_offsets')),
+    type_codes,
+    decoders)
+  return store
+
+
+def open_binary_document(
+  path: Path,
+  resolver: Callable[[Any], Type[Entity]] = entity_resolver,
+) -> EntityStore:
+  """Memory-maps a binary document.
+
+  The file is mapped read-only and stays mapped for as long as the returned
+  store, or any array taken from it, is alive. See `read_binary_document` for
+  resolver.
+  """
+  with path.open('rb') as f:
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  return read_binary_document(buffer, resolver)
@@ -0,0 +1,159 @@
+"""Many documents in one JSON Lines file.
+
+Each line of a corpus file is one record:
+
+  {"name": <document name>, "document": <document>, "extraction": <extraction>}
+
+where "extraction" is optional. The name comes first so that readers can skip
+records by name without parsing the rest of the line. Files whose name ends
+in `.gz` are gzip-compressed; reading detects compression by content.
+"""
+
+import gzip
+import json
+
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Container, Dict, Iterable, Iterator, Optional, TextIO, Type, Union
+
+from .document import Document, load_fnd_doc_from_json
+from .extraction import Extraction, load_extraction_from_json
+from .geometry import FixedPoint
+from .json_writer import write_json
+
+
+_NAME_PREFIX = '{"name": '
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+@dataclass(frozen=True)
+class CorpusRecord:
+  document: Document
+  extraction: Optional[Extraction] = None
+
+
+def _open(path: Path, mode: str, compress: Optional[bool] = None) -> TextIO:
+  if mode == 'r':
+    with path.open('rb') as f:
+      compress = f.read(2) == _GZIP_MAGIC
+  elif compress is None:
+    compress = path.suffix == '.gz'
+  if compress:
+    return gzip.open(path, mode + 't', encoding='utf-8') # type: ignore
+  return path.open(mode, encoding='utf-8') # type: ignore
+
+
+class CorpusWriter:
+  """Writes records to a corpus file, one at a time.
+
+  Use as a context manager:
+
+    with CorpusWriter(path) as writer:
+      for document in documents:
+        writer.write(document)
+  """
+
+  def __init__(
+    self,
+    path: Path,
+    compress: Optional[bool] = None,
+    append: bool = False,
+  ):
+    """
+    Args:
+      path: The corpus file.
+      compress: Whether to gzip the file. By default, files ending in `.gz`
+        are compressed.
+      append: Add records to an existing corpus instead of replacing it.
+    """
+    self.f = _open(path, 'a' if append else 'w', compress)
+
+  def write(
+    self,
+    document: Document,
+    extraction: Optional[Extraction] = None,
+  ) -> None:
+    record: Dict[str, Any] = {'name': document.name, 'document': document}
+    if extraction is not None:
+      record['extraction'] = extraction
+    write_json(record, self.f)
+    self.f.write('\n')
+
+  def close(self) -> None:
+    self.f.close()
+
+  def __enter__(self) -> 'CorpusWriter':
+    return self
+
+  def __exit__(
+    self,
+    exc_type: Optional[Type[BaseException]],
+    exc_value: Optional[BaseException],
+    traceback: Optional[TracebackType],
+  ) -> None:
+    self.close()
+
+
+def save_corpus(
+  path: Path,
+  records: Iterable[Union[Document, CorpusRecord]],
+  compress: Optional[bool] = None,
+) -> None:
+  """Writes documents, or documents with extractions, to a corpus file."""
+  with CorpusWriter(path, compress) as writer:
+    for record in records:
+      if isinstance(record, CorpusRecord):
+        writer.write(record.document, record.extraction)
+      else:
+        writer.write(record)
+
+
+def _record_name(line: str) -> Optional[str]:
+  """The name of a record, read from the start of its line."""
+  if line.startswith(_NAME_PREFIX):
+    name, _ = json.JSONDecoder().raw_decode(line, len(_NAME_PREFIX))
+    return name
+  return json.loads(line).get('name')
+
+
+def iter_corpus(
+  path: Path,
+  names: Optional[Container[Optional[str]]] = None,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> Iterator[CorpusRecord]:
+  """Yields the records of a corpus file in order.
+
+  Only one record is held in memory at a time.
+
+  Args:
+    path: The corpus file.
+    names: If given, only records for documents with these names are decoded
+      and yielded.
+    intern_geometry: See `load_fnd_doc_from_json`.
+    fixed_point: See `load_fnd_doc_from_json`.
+  """
+  with _open(path, 'r') as f:
+    for line in f:
+      if not line.strip():
+        continue
+      if names is not None and _record_name(line) not in names:
+        continue
+      blob = json.loads(line)
+      extraction = blob.get('extraction')
+      yield CorpusRecord(
+        load_fnd_doc_from_json(blob['document'], intern_geometry, fixed_point),
+        load_extraction_from_json(extraction)
+          if extraction is not None else None)
+
+
+def iter_corpus_documents(
+  path: Path,
+  names: Optional[Container[Optional[str]]] = None,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> Iterator[Document]:
+  """Like `iter_corpus`, but only yields the documents."""
+  return (record.document for record in iter_corpus(
+    path, names, intern_geometry, fixed_point))
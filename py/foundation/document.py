@@ -3,14 +3,19 @@
 import json
 
 from dataclasses import asdict, dataclass, field, replace
-from functools import lru_cache
+from hashlib import blake2b
 from itertools import chain
 from pathlib import Path
-from typing import Dict, Optional, Iterable, Tuple, Type, TypeVar
-
-from .entity import Entity, Word, entity_resolver
-from .geometry import BBox
-from .instantiate import instantiate
+from typing import Any, Callable, Dict, List, Optional, Iterable, Tuple, Type, TypeVar
+
+from .entity import DIGEST_SIZE, Entity, REFERENCE_FORMAT_VERSION, Word, bbox_digest_bytes, dump_entity_table, entity_resolver, load_entity_table, pickle_table, unpickle_table
+from .document_index import DocumentIndex
+from .geometry import BBox, FixedPoint, geometry_factories
+from .instantiate import compile_decoder
+from .memo import cached_property
+from .spatial_index import EntityIndex
+from .text_index import TextIndex
+from .json_writer import DataclassEncoder, write_json
 from .typing_utils import unwrap
 
 
@@ -39,42 +44,143 @@ class Document:
       tuple(chain(self.entities, entities)), self.name)
 
   def filter_entities(self, entity_type: Type[E]) -> Iterable[E]:
-    yield from (e for e in self.entities if isinstance(e, entity_type))
+    yield from self.entity_index.of_type(entity_type)
+
+  @cached_property
+  def entity_index(self) -> DocumentIndex:
+    """This document's entities by type and by page, built on first use."""
+    return DocumentIndex(self.entities)
+
+  def __reduce__(self) -> Tuple[Callable, Tuple[Any, ...]]:
+    return _unpickle_document, (self.bbox, self.name) + pickle_table(
+      self.entities)
+
+  @cached_property
+  def digest(self) -> str:
+    """A stable digest of this document's content, as a hex string.
+
+    See `Entity.digest`.
+    """
+    h = blake2b(digest_size=DIGEST_SIZE)
+    h.update(bbox_digest_bytes(self.bbox))
+    h.update(json.dumps(self.name).encode('utf-8'))
+    for entity in self.entities:
+      h.update(bytes.fromhex(entity.digest))
+    return h.hexdigest()
+
+  @cached_property
+  def spatial_index(self) -> EntityIndex:
+    """An R-tree over this document's entities, built on first use."""
+    return EntityIndex(self.entities)
+
+  @cached_property
+  def text_index(self) -> TextIndex:
+    """An inverted index over this document's Words and Texts, built on first
+    use."""
+    return TextIndex(self.entities)
 
-  @lru_cache(maxsize=None)
   def median_line_height(self) -> float:
+    return self._median_line_height
+
+  @cached_property
+  def _median_line_height(self) -> float:
     return median_word_height(
       chain.from_iterable(
         E.entity_words() for E in self.entities))
 
 
+def _unpickle_document(
+  bbox: BBox,
+  name: Optional[str],
+  types: Tuple[type, ...],
+  entries: List[Tuple[Any, ...]],
+  roots: List[int],
+) -> Document:
+  entities = unpickle_table(types, entries)
+  return Document(bbox, tuple(entities[i] for i in roots), name)
+
+
 def median_word_height(words: Iterable[Word]) -> float:
-  L = sorted(words, key=lambda W: W.height)
+  L = sorted(W.height for W in words)
   if not L:
     return 0
   n = len(L)
   if n % 2 == 0:
-    return 0.5 * (L[n // 2 - 1].height + L[n // 2].height)
-  return L[(n - 1) // 2].height
-
-
-def load_fnd_doc_from_json(blob: Dict) -> Document:
-  return instantiate(
+    return 0.5 * (L[n // 2 - 1] + L[n // 2])
+  return L[(n - 1) // 2]
+
+
+def load_fnd_doc_from_json(
+  blob: Dict,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> Document:
+  """Loads a Document from its JSON representation.
+
+  Args:
+    blob: The parsed JSON.
+    intern_geometry: If true, equal Intervals and BBoxes in the document share
+      a single instance. This saves a lot of memory in documents with many
+      derived entities.
+    fixed_point: If given, all coordinates are quantized to ints in this
+      fixed-point coordinate system.
+  """
+  factories = geometry_factories(intern_geometry, fixed_point)
+  if 'entity_table' in blob:
+    entities = load_entity_table(blob['entity_table'], factories)
+    return Document(
+      compile_decoder(BBox, factories=factories)(blob['bbox']),
+      tuple(entities[i] for i in blob['entities']),
+      blob.get('name'))
+  return compile_decoder(
     Document,
-    blob,
     base_classes={Entity},
-    derived_class_resolver=entity_resolver)
+    derived_class_resolver=entity_resolver,
+    factories=factories)(blob)
 
 
-def load_document(path: Path) -> Document:
+def load_document(
+  path: Path,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> Document:
   with path.open() as f:
-    return load_fnd_doc_from_json(json.load(f))
-
-
-def dump_to_json(root: Document) -> str:
-  return json.dumps(asdict(root))
-
-
-def save_document(root: Document, path: Path) -> None:
+    return load_fnd_doc_from_json(json.load(f), intern_geometry, fixed_point)
+
+
+def dump_to_json(root: Document, by_reference: bool = False) -> str:
+  """Dumps a Document to JSON.
+
+  Args:
+    root: The document.
+    by_reference: Use the entity table format, in which `entities` holds
+      indices into `entity_table` and shared sub-entities are written once.
+  """
+  if by_reference:
+    table, roots = dump_entity_table(root.entities)
+    return json.dumps({
+      'bbox': asdict(root.bbox),
+      'entities': roots,
+      'name': root.name,
+      'format_version': REFERENCE_FORMAT_VERSION,
+      'entity_table': table,
+    })
+  return DataclassEncoder().encode(root)
+
+
+def save_document(
+  root: Document,
+  path: Path,
+  by_reference: bool = False,
+) -> None:
+  """Saves a Document as JSON.
+
+  The inline format is written incrementally, without holding the JSON or a
+  dict copy of the document in memory.
+  """
   with path.open('w') as f:
-    f.write(dump_to_json(root) + '\n')
+    if by_reference:
+      f.write(dump_to_json(root, by_reference))
+    else:
+      write_json(root, f)
+    f.write('\n')
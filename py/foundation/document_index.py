@@ -0,0 +1,107 @@
+"""Indexes of a document's entities by type and by page."""
+
+from typing import Dict, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from .entity import Entity, Page
+from .geometry import BBox
+from .memo import cached_property
+from .spatial_index import RTree
+
+
+E = TypeVar('E', bound=Entity)
+
+
+def reading_order_key(entity: Entity) -> Tuple[float, float]:
+  """Sorts entities top to bottom, then left to right."""
+  return entity.bbox.iy.a, entity.bbox.ix.a
+
+
+class DocumentIndex:
+  """Groups a document's entities by type and by the page they are on.
+
+  An entity is on the page whose bbox contains its bbox, or, if no page
+  contains it, on the page it overlaps most. Entities which overlap no page
+  are on no page. Each distinct query is answered once and then cached.
+
+  Grouping by type is a single pass over the entities. The page assignment
+  needs an R-tree over the pages and a sort, so it is only built by the first
+  query about pages.
+  """
+
+  def __init__(self, entities: Sequence[Entity]):
+    self.entities = tuple(entities)
+    self._by_type: Dict[type, List[int]] = {}
+    for i, entity in enumerate(self.entities):
+      self._by_type.setdefault(type(entity), []).append(i)
+    self._type_cache: Dict[type, Tuple[Entity, ...]] = {}
+    self._page_cache: Dict[
+      Tuple[Optional[int], type], Tuple[Entity, ...]] = {}
+    self._page_of: Optional[Dict[Entity, Optional[int]]] = None
+
+  @cached_property
+  def pages(self) -> Tuple[Page, ...]:
+    """The document's pages, by `Page.index`."""
+    return tuple(sorted(self.of_type(Page), key=lambda page: page.index))
+
+  @cached_property
+  def _page_numbers(self) -> List[Optional[int]]:
+    page_tree = RTree([(page.bbox, page) for page in self.pages])
+    return [_page_number(page_tree, entity.bbox) for entity in self.entities]
+
+  @cached_property
+  def _by_page(self) -> Dict[Optional[int], List[int]]:
+    """The positions of the entities on each page, in reading order."""
+    by_page: Dict[Optional[int], List[int]] = {}
+    for i in sorted(range(len(self.entities)),
+                    key=lambda i: reading_order_key(self.entities[i])):
+      by_page.setdefault(self._page_numbers[i], []).append(i)
+    return by_page
+
+  def of_type(self, entity_type: Type[E]) -> Tuple[E, ...]:
+    """The instances of entity_type, in document order."""
+    result = self._type_cache.get(entity_type)
+    if result is None:
+      positions = sorted(
+        i for t, indices in self._by_type.items()
+        if issubclass(t, entity_type) for i in indices)
+      result = self._type_cache[entity_type] = tuple(
+        self.entities[i] for i in positions)
+    return result # type: ignore
+
+  def on_page(
+    self,
+    page_index: Optional[int],
+    entity_type: Type[E] = Entity, # type: ignore
+  ) -> Tuple[E, ...]:
+    """The instances of entity_type on a page, in reading order.
+
+    Args:
+      page_index: A `Page.index`, or None for the entities on no page.
+      entity_type: The type of entities to return.
+    """
+    key = (page_index, entity_type)
+    result = self._page_cache.get(key)
+    if result is None:
+      result = self._page_cache[key] = tuple(
+        self.entities[i] for i in self._by_page.get(page_index, ())
+        if isinstance(self.entities[i], entity_type))
+    return result # type: ignore
+
+  def page_number(self, entity: Entity) -> Optional[int]:
+    """The `Page.index` of the page a document entity is on, if any."""
+    if self._page_of is None:
+      self._page_of = dict(zip(self.entities, self._page_numbers))
+    return self._page_of[entity]
+
+
+def _page_number(page_tree: RTree[Page], bbox: BBox) -> Optional[int]:
+  best: Optional[Page] = None
+  best_area = 0.0
+  for page in page_tree.search(bbox):
+    if page.bbox.contains_bbox(bbox):
+      return page.index
+    overlap = BBox.intersection((page.bbox, bbox))
+    area = overlap.area if overlap is not None else 0.0
+    if best is None or area > best_area:
+      best, best_area = page, area
+  return best.index if best is not None else None
@@ -1,21 +1,95 @@
 """Entity types."""
 import json
+import struct
 
-from dataclasses import asdict, dataclass, fields
-from itertools import chain
-from typing import Any, Dict, Generic, Iterable, Optional, Tuple, Type
+from dataclasses import asdict, dataclass, fields, is_dataclass
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, Type
 
-from .geometry import BBox
-from .instantiate import instantiate
+from .geometry import BBox, FixedPoint, Interval, geometry_factories
+from .instantiate import compile_decoder
+from .json_writer import DataclassEncoder
+from .memo import cached_hash, cached_property
 from .ocr import InputWord
 from .typing_utils import assert_exhaustive, unwrap
 
 
+# The size of entity and document digests, in bytes.
+DIGEST_SIZE = 16
+
+_BBOX_STRUCT = struct.Struct('<4d')
+_NUMBER_STRUCT = struct.Struct('<d')
+_LENGTH_STRUCT = struct.Struct('<Q')
+
+
+def bbox_digest_bytes(bbox: BBox) -> bytes:
+  """The bytes of a bbox that enter digests. Equal bboxes have equal bytes.
+
+  Coordinates are packed as doubles, so an int coordinate and the equal float
+  give the same bytes, and so do 0.0 and -0.0.
+  """
+  return _BBOX_STRUCT.pack(
+    bbox.ix.a + 0.0, bbox.ix.b + 0.0, bbox.iy.a + 0.0, bbox.iy.b + 0.0)
+
+
+def _digest_value(value: Any, out: List[bytes]) -> None:
+  """Appends a canonical encoding of a field value to out.
+
+  Values which compare equal are encoded equally: numbers are encoded by
+  value rather than by type, and entities by their digest.
+  """
+  if value is None:
+    out.append(b'N')
+  elif isinstance(value, (bool, int, float)):
+    number = float(value) if isinstance(value, float) or \
+      -2 ** 53 <= value <= 2 ** 53 else None
+    if number is None:
+      # Ints which no float equals.
+      out.append(b'I' + str(value).encode('ascii') + b';')
+    else:
+      # Adding 0.0 turns -0.0 into 0.0.
+      out.append(b'F' + _NUMBER_STRUCT.pack(number + 0.0))
+  elif isinstance(value, str):
+    data = value.encode('utf-8')
+    out.append(b'S' + _LENGTH_STRUCT.pack(len(data)) + data)
+  elif isinstance(value, Entity):
+    out.append(b'E' + bytes.fromhex(value.digest))
+  elif isinstance(value, (tuple, list)):
+    out.append(b'L' + _LENGTH_STRUCT.pack(len(value)))
+    for item in value:
+      _digest_value(item, out)
+  elif isinstance(value, dict):
+    items = []
+    for k, v in value.items():
+      key: List[bytes] = []
+      _digest_value(k, key)
+      encoded: List[bytes] = []
+      _digest_value(v, encoded)
+      items.append((b''.join(key), b''.join(encoded)))
+    out.append(b'D' + _LENGTH_STRUCT.pack(len(items)))
+    for k, v in sorted(items):
+      out.append(k + v)
+  elif is_dataclass(value) and not isinstance(value, type):
+    _digest_value(type(value).__name__, out)
+    out.append(b'C')
+    for f in fields(value):
+      if f.compare:
+        _digest_value(getattr(value, f.name), out)
+  else:
+    _digest_value(repr(value), out)
+
+
+@cached_hash
 @dataclass(frozen=True)
 class Entity:
   bbox: BBox
   type: str
 
+  def __init_subclass__(cls, **kwargs: Any):
+    super().__init_subclass__(**kwargs) # type: ignore
+    # This runs before @dataclass, which keeps the cached methods.
+    cached_hash(cls)
+
   @property
   def height(self) -> float:
     return self.bbox.height
@@ -44,14 +118,64 @@ class Entity:
 
     If this Entity is a Word, yields itself.
 
+    The words are found with an iterative walk on the first call and cached
+    on the entity, so later calls are O(1).
+
     STRONGLY RECOMMENDED not to override this.
     """
-    yield from chain.from_iterable(E.entity_words() for E in self.children)
+    words = self.__dict__.get('_entity_words')
+    if words is None:
+      words = self.__dict__['_entity_words'] = _leaf_words(self)
+    return iter(words)
 
   @property
   def entity_text(self) -> Optional[str]:
     return getattr(self, 'text', None)
 
+  @cached_property
+  def digest(self) -> str:
+    """A stable digest of this entity's content, as a hex string.
+
+    The digest is computed Merkle-style from the entity's type, geometry and
+    other field values and the digests of its children, so it is computed
+    once per entity, and equal entities have equal digests in every process.
+    Use it as a cache or deduplication key.
+    """
+    return _entity_digest(self)
+
+  def __reduce__(self) -> Tuple[Callable, Tuple[Any, ...]]:
+    types, entries, roots = pickle_table((self,))
+    return _unpickle_entity, (types, entries, roots[0])
+
+
+def _entity_digest(entity: Entity) -> str:
+  names, _ = _field_layout(type(entity))
+  h = blake2b(digest_size=DIGEST_SIZE)
+  h.update(type(entity).__name__.encode('utf-8'))
+  h.update(bbox_digest_bytes(entity.bbox))
+  out: List[bytes] = []
+  for name in names:
+    # Children are entities, so they enter as their digests.
+    _digest_value(getattr(entity, name), out)
+  h.update(b''.join(out))
+  return h.hexdigest()
+
+
+def _leaf_words(entity: Entity) -> Tuple['Word', ...]:
+  """The Words under entity, in order, reusing any already cached words."""
+  words: List[Word] = []
+  stack = [entity]
+  while stack:
+    E = stack.pop()
+    cached = E.__dict__.get('_entity_words')
+    if cached is not None:
+      words.extend(cached)
+    elif isinstance(E, Word):
+      words.append(E)
+    else:
+      stack.extend(reversed(tuple(E.children)))
+  return tuple(words)
+
 
 @dataclass(frozen=True)
 class Page(Entity):
@@ -119,7 +243,7 @@ class Word(Entity):
 
     This provides the base case for Entity.words.
     """
-    yield self
+    return iter((self,))
 
 
 @dataclass(frozen=True)
@@ -504,39 +628,348 @@ class NamedEntity(Entity):
     yield from self.words
 
 
+_entity_registry: Dict[str, Type[Entity]] = {
+  'Address': Address,
+  'Cluster': Cluster,
+  'Date': Date,
+  'DollarAmount': DollarAmount,
+  'Integer': Integer,
+  'NamedEntity': NamedEntity,
+  'Number': Number,
+  'Page': Page,
+  'PersonName': PersonName,
+  'Text': Text,
+  'Table': Table,
+  'TableCell': TableCell,
+  'TableRow': TableRow,
+  'Time': Time,
+  'Word': Word,
+}
+
+
 def entity_resolver(v: Any) -> Type:
   assert isinstance(v, dict)
-  entity_registry = {
-    'Address': Address,
-    'Cluster': Cluster,
-    'Date': Date,
-    'DollarAmount': DollarAmount,
-    'Integer': Integer,
-    'NamedEntity': NamedEntity,
-    'Number': Number,
-    'Page': Page,
-    'PersonName': PersonName,
-    'Text': Text,
-    'Table': Table,
-    'TableCell': TableCell,
-    'TableRow': TableRow,
-    'Time': Time,
-    'Word': Word,
-  }
   assert 'type' in v
   entity_type = v['type']
-  if entity_type not in entity_registry:
+  if entity_type not in _entity_registry:
     raise TypeError(f'Entity type {entity_type} not supported')
-  return entity_registry[entity_type]
+  return _entity_registry[entity_type]
+
+
+_children_fields: Dict[type, Optional[str]] = {}
+
+
+def children_field(entity_type: Type[Entity]) -> Optional[str]:
+  """The name of the field holding an entity type's children, if any.
+
+  Every entity type keeps the sub-entities yielded by `Entity.children` in a
+  single `Tuple[SomeEntity, ...]` field, in the same order.
+  """
+  if entity_type not in _children_fields:
+    _children_fields[entity_type] = None
+    for field in fields(entity_type):
+      args = getattr(field.type, '__args__', ())
+      if getattr(field.type, '__origin__', None) is tuple and args and \
+          isinstance(args[0], type) and issubclass(args[0], Entity):
+        _children_fields[entity_type] = field.name
+        break
+  return _children_fields[entity_type]
+
+
+"""Entity tables.
+
+The inline JSON format nests every child entity inside its parent, so an entity
+reachable from several parents -- typically a Word, shared by a Text, a Cluster
+line, a Date and a TableCell -- is written once per parent, and loaded back as
+that many separate objects.
+
+An entity table instead lists each distinct entity once, children before
+parents, and replaces the children field of each entry by a list of indices
+into the table. Loading a table preserves sharing. Entities are deduplicated by
+value, so equal entities loaded from inline JSON collapse into one entry.
+"""
+REFERENCE_FORMAT_VERSION = 2
 
 
-def load_entity_from_json(blob: Dict) -> Entity:
-  return instantiate(
+def _plain(value: Any) -> Any:
+  """The `asdict` representation of a non-entity field value."""
+  if is_dataclass(value) and not isinstance(value, type):
+    return asdict(value)
+  if isinstance(value, (tuple, list)):
+    return [_plain(v) for v in value]
+  return value
+
+
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _value_key(value: Any) -> Any:
+  """A key for deduplicating field values.
+
+  Keys are hashable when the value is made of hashable parts, and equal only
+  for values which are equal and have the same types throughout, so that
+  e.g. `Interval(0, 1)` and `Interval(0.0, 1.0)`, or True and 1, are kept
+  apart.
+  """
+  t = type(value)
+  if t in _SCALAR_TYPES:
+    return t, value
+  if t is tuple or t is list:
+    return (t,) + tuple(_value_key(v) for v in value)
+  if t is dict:
+    return (t,) + tuple(
+      (_value_key(k), _value_key(v)) for k, v in value.items())
+  if is_dataclass(value) and not isinstance(value, type):
+    return (t,) + tuple(_value_key(getattr(value, f.name))
+                        for f in fields(value))
+  return t, value
+
+
+def dump_entity_table(
+  roots: Iterable[Entity],
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+  """Encodes the DAG under roots as an entity table.
+
+  Returns:
+    The table, and the indices of the roots in it.
+  """
+  table: List[Dict[str, Any]] = []
+  by_identity: Dict[int, int] = {}
+  # Keyed by an entity's own field values and their types, with its children
+  # replaced by their indices, so deduplicating by value never hashes whole
+  # subtrees.
+  by_value: Dict[Tuple[Any, ...], int] = {}
+  # Keeps visited entities alive so that their ids are not reused.
+  visited: List[Entity] = []
+
+  def add(entity: Entity) -> int:
+    index = by_identity.get(id(entity))
+    if index is not None:
+      return index
+    child_field = children_field(type(entity))
+    entry: Dict[str, Any] = {}
+    key: List[Any] = [type(entity)]
+    for field in fields(entity):
+      value = getattr(entity, field.name)
+      if field.name == child_field:
+        value = [add(child) for child in value]
+        entry[field.name] = value
+        key.append(tuple(value))
+      else:
+        entry[field.name] = _plain(value)
+        key.append(_value_key(value))
+    try:
+      index = by_value.setdefault(tuple(key), len(table))
+    except TypeError:
+      # Unhashable field values; such entities are only shared by identity.
+      index = len(table)
+    if index == len(table):
+      table.append(entry)
+    by_identity[id(entity)] = index
+    visited.append(entity)
+    return index
+
+  return table, [add(root) for root in roots]
+
+
+class EntityTableDecoder:
+  """Decodes the entries of an entity table on demand.
+
+  Decoding an entry decodes the entries it refers to, and every entry is
+  decoded at most once, so entities referring to the same entry share it.
+  """
+
+  def __init__(
+    self,
+    table: List[Dict[str, Any]],
+    factories: Optional[Dict[type, Callable[..., Any]]] = None,
+  ):
+    self.table = table
+    self.factories = factories
+    # Per entity type: its children field and decoders for its other fields.
+    self._decoders: Dict[type, Tuple[Optional[str], Dict[str, Callable]]] = {}
+    self._entities: Dict[int, Entity] = {}
+
+  def __len__(self) -> int:
+    return len(self.table)
+
+  def entity(self, index: int) -> Entity:
+    entity = self._entities.get(index)
+    if entity is not None:
+      return entity
+    # Entries only refer to earlier entries, so decoding everything pending
+    # below index in increasing order never recurses.
+    pending = {index}
+    stack = [index]
+    while stack:
+      entry = self.table[stack.pop()]
+      child_field = children_field(entity_resolver(entry))
+      for child in entry.get(child_field, ()) if child_field else ():
+        if child not in pending and child not in self._entities:
+          pending.add(child)
+          stack.append(child)
+    for i in sorted(pending):
+      self._entities[i] = self._decode(self.table[i])
+    return self._entities[index]
+
+  def _decode(self, entry: Dict[str, Any]) -> Entity:
+    entity_type = entity_resolver(entry)
+    if entity_type not in self._decoders:
+      child_field = children_field(entity_type)
+      self._decoders[entity_type] = child_field, {
+        field.name: compile_decoder(
+          field.type, # type: ignore
+          base_classes={Entity},
+          derived_class_resolver=entity_resolver,
+          factories=self.factories)
+        for field in fields(entity_type) if field.name != child_field}
+    child_field, field_decoders = self._decoders[entity_type]
+    kwargs = {name: field_decoders[name](value)
+              for name, value in entry.items() if name != child_field}
+    if child_field is not None and child_field in entry:
+      kwargs[child_field] = tuple(
+        self._entities[i] for i in entry[child_field])
+    return entity_type(**kwargs)
+
+
+def load_entity_table(
+  table: List[Dict[str, Any]],
+  factories: Optional[Dict[type, Callable[..., Any]]] = None,
+) -> List[Entity]:
+  """Decodes an entity table. Entries referring to the same index share it."""
+  decoder = EntityTableDecoder(table, factories)
+  return [decoder.entity(i) for i in range(len(table))]
+
+
+def load_entity_from_json(
+  blob: Dict,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> Entity:
+  """Loads an Entity dumped in either the inline or the entity table format."""
+  factories = geometry_factories(intern_geometry, fixed_point)
+  if 'entity_table' in blob:
+    return load_entity_table(blob['entity_table'], factories)[blob['root']]
+  return compile_decoder(
     Entity,
-    blob,
     base_classes={Entity},
-    derived_class_resolver=entity_resolver)
+    derived_class_resolver=entity_resolver,
+    factories=factories)(blob)
+
 
+def dump_to_json(entity: Entity, by_reference: bool = False) -> str:
+  """Dumps an Entity to JSON.
 
-def dump_to_json(entity: Entity) -> str:
-  return json.dumps(asdict(entity))
+  Args:
+    entity: The entity.
+    by_reference: Use the entity table format, which writes shared
+      sub-entities once.
+  """
+  if by_reference:
+    table, (root,) = dump_entity_table((entity,))
+    return json.dumps({
+      'format_version': REFERENCE_FORMAT_VERSION,
+      'entity_table': table,
+      'root': root,
+    })
+  return DataclassEncoder().encode(entity)
+
+
+"""Pickling.
+
+Entities pickle as a flat table instead of as nested objects: each entity is
+one tuple holding the index of its type, its bbox coordinates and its other
+field values in field order, with its children replaced by their indices in
+the table. The table is built like an entity table, so shared and equal
+sub-entities (typically Words) are written once, and unpickling rebuilds the
+entities without calling their constructors and without any caches.
+"""
+PickleTable = Tuple[Tuple[type, ...], List[Tuple[Any, ...]], List[int]]
+
+
+_field_layouts: Dict[type, Tuple[Tuple[str, ...], Optional[str]]] = {}
+
+
+def _field_layout(
+  entity_type: Type[Entity],
+) -> Tuple[Tuple[str, ...], Optional[str]]:
+  """An entity type's fields other than bbox, in order, and its children
+  field."""
+  layout = _field_layouts.get(entity_type)
+  if layout is None:
+    layout = _field_layouts[entity_type] = (
+      tuple(f.name for f in fields(entity_type) if f.name != 'bbox'),
+      children_field(entity_type))
+  return layout
+
+
+def pickle_table(roots: Iterable[Entity]) -> PickleTable:
+  """Flattens the DAG under roots.
+
+  Returns:
+    The entity types, the table entries, and the indices of the roots.
+  """
+  type_codes: Dict[type, int] = {}
+  entries: List[Tuple[Any, ...]] = []
+  by_identity: Dict[int, int] = {}
+  by_value: Dict[Tuple[Any, ...], int] = {}
+  # Keeps visited entities alive so that their ids are not reused.
+  visited: List[Entity] = []
+
+  def add(entity: Entity) -> int:
+    index = by_identity.get(id(entity))
+    if index is not None:
+      return index
+    names, child_field = _field_layout(type(entity))
+    code = type_codes.setdefault(type(entity), len(type_codes))
+    bbox = entity.bbox
+    entry = (code, bbox.ix.a, bbox.ix.b, bbox.iy.a, bbox.iy.b) + tuple(
+      tuple(add(child) for child in getattr(entity, name))
+        if name == child_field else getattr(entity, name)
+      for name in names)
+    try:
+      # Equal entries with values of different types, e.g. 1 and 1.0, are
+      # kept apart.
+      key = (entry, tuple(map(type, entry))) + tuple(
+        _value_key(value) for name, value in zip(names, entry[5:])
+        if name != child_field and type(value) not in _SCALAR_TYPES)
+      index = by_value.setdefault(key, len(entries))
+    except TypeError:
+      # Unhashable field values; such entities are only shared by identity.
+      index = len(entries)
+    if index == len(entries):
+      entries.append(entry)
+    by_identity[id(entity)] = index
+    visited.append(entity)
+    return index
+
+  indices = [add(root) for root in roots]
+  return tuple(sorted(type_codes, key=type_codes.__getitem__)), entries, indices
+
+
+def unpickle_table(
+  types: Tuple[type, ...],
+  entries: List[Tuple[Any, ...]],
+) -> List[Entity]:
+  """Rebuilds the entities of a `pickle_table`."""
+  layouts = [(t,) + _field_layout(t) for t in types]
+  entities: List[Entity] = []
+  for entry in entries:
+    entity_type, names, child_field = layouts[entry[0]]
+    entity = object.__new__(entity_type)
+    values = entity.__dict__
+    values['bbox'] = BBox(Interval(entry[1], entry[2]),
+                          Interval(entry[3], entry[4]))
+    values.update(zip(names, entry[5:]))
+    if child_field is not None:
+      values[child_field] = tuple(entities[i] for i in values[child_field])
+    entities.append(entity)
+  return entities
+
+
+def _unpickle_entity(
+  types: Tuple[type, ...],
+  entries: List[Tuple[Any, ...]],
+  root: int,
+) -> Entity:
+  return unpickle_table(types, entries)[root]
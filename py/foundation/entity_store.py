@@ -0,0 +1,364 @@
+"""A flat, columnar representation of a document's entity DAG.
+
+An EntityStore numbers every distinct entity in a document and keeps their
+data in parallel columns instead of a graph of Python objects:
+
+  - a type-code column indexing into a table of (entity class, type string),
+  - geometry columns (a BBoxArray),
+  - a text column indexing into a deduplicated string table,
+  - CSR-style child arrays: the children of entity i are
+    `child_ids[child_offsets[i]:child_offsets[i + 1]]`,
+  - the remaining field values of each entity, as a tuple.
+
+Children always have smaller ids than their parents. Shared sub-entities are
+stored once: entities are deduplicated by identity, and Words also by value.
+
+EntityViews are lightweight handles into a store which read like the entity
+classes; `EntityView.materialize` builds the real Entity.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from .bbox_array import BBoxArray
+from .document import Document
+from .entity import Entity, Word, children_field
+from .geometry import BBox
+from .typing_utils import unwrap
+
+
+# Fields stored in dedicated columns rather than in `EntityStore.attributes`.
+_COLUMN_FIELDS = frozenset({'bbox', 'type', 'text'})
+
+
+def _attribute_names(entity_type: Type[Entity]) -> Tuple[str, ...]:
+  child_field = children_field(entity_type)
+  return tuple(f for f in entity_type.__dataclass_fields__ # type: ignore
+               if f not in _COLUMN_FIELDS and f != child_field)
+
+
+class EntityStore:
+  """The entities of a document, in flat arrays.
+
+  Attributes:
+    types: The (entity class, type string) pair for each type code.
+    type_codes: The type code of each entity.
+    geometry: The bbox of each entity. The columns are int64 if all
+      coordinates are ints, e.g. in fixed-point documents, and float64
+      otherwise, in which case int coordinates come back as equal floats.
+    texts: The string table. Like `attributes`, this may be any sequence,
+      e.g. one which decodes entries on access.
+    text_ids: Each entity's `text` field as an index into `texts`, or -1 for
+      entities without one.
+    child_offsets: CSR offsets into `child_ids`, one more than the number of
+      entities.
+    child_ids: The children of all entities, concatenated.
+    attributes: The values of each entity's other fields, in the order given
+      by `attribute_names` for its type code.
+    roots: The ids of the document's top-level entities, in order.
+    bbox: The document's bbox.
+    name: The document's name.
+  """
+
+  def __init__(
+    self,
+    types: Sequence[Tuple[Type[Entity], str]],
+    type_codes: np.ndarray,
+    geometry: BBoxArray,
+    texts: Sequence[str],
+    text_ids: np.ndarray,
+    child_offsets: np.ndarray,
+    child_ids: np.ndarray,
+    attributes: Sequence[Tuple[Any, ...]],
+    roots: np.ndarray,
+    bbox: Optional[BBox] = None,
+    name: Optional[str] = None,
+  ):
+    self.types = tuple(types)
+    self.type_codes = type_codes
+    self.geometry = geometry
+    self.texts = texts
+    self.text_ids = text_ids
+    self.child_offsets = child_offsets
+    self.child_ids = child_ids
+    self.attributes = attributes
+    self.roots = roots
+    self.bbox = bbox
+    self.name = name
+    self.attribute_names = tuple(_attribute_names(t) for t, _ in self.types)
+    self.child_fields = tuple(children_field(t) for t, _ in self.types)
+    self.word_mask = np.array(
+      [issubclass(t, Word) for t, _ in self.types], dtype=bool)[type_codes] \
+        if self.types else np.zeros(len(type_codes), dtype=bool)
+    self._materialized: Dict[int, Entity] = {}
+
+  @staticmethod
+  def from_entities(
+    entities: Sequence[Entity],
+    bbox: Optional[BBox] = None,
+    name: Optional[str] = None,
+  ) -> 'EntityStore':
+    """Builds a store whose roots are the given entities."""
+    builder = _Builder()
+    roots = [builder.add(e) for e in entities]
+    return builder.build(roots, bbox, name)
+
+  @staticmethod
+  def from_document(document: Document) -> 'EntityStore':
+    return EntityStore.from_entities(
+      document.entities, document.bbox, document.name)
+
+  def __len__(self) -> int:
+    return len(self.type_codes)
+
+  def entity_type(self, entity_id: int) -> Type[Entity]:
+    return self.types[self.type_codes[entity_id]][0]
+
+  def type(self, entity_id: int) -> str:
+    return self.types[self.type_codes[entity_id]][1]
+
+  def text(self, entity_id: int) -> Optional[str]:
+    text_id = self.text_ids[entity_id]
+    return self.texts[text_id] if text_id >= 0 else None
+
+  def children(self, entity_id: int) -> np.ndarray:
+    offsets = self.child_offsets
+    return self.child_ids[offsets[entity_id]:offsets[entity_id + 1]]
+
+  def attribute(self, entity_id: int, name: str) -> Any:
+    names = self.attribute_names[self.type_codes[entity_id]]
+    if name not in names:
+      raise AttributeError(f'{self.type(entity_id)} has no attribute {name}')
+    return self.attributes[entity_id][names.index(name)]
+
+  def entity_word_ids(self, entity_id: int) -> List[int]:
+    """The ids of the Words under the entity, like `Entity.entity_words`."""
+    word_mask, offsets, child_ids = \
+      self.word_mask, self.child_offsets, self.child_ids
+    words = []
+    stack = [entity_id]
+    while stack:
+      i = stack.pop()
+      if word_mask[i]:
+        words.append(i)
+      else:
+        stack.extend(child_ids[offsets[i]:offsets[i + 1]][::-1].tolist())
+    return words
+
+  def view(self, entity_id: int) -> 'EntityView':
+    return EntityView(self, entity_id)
+
+  @property
+  def entities(self) -> Tuple['EntityView', ...]:
+    """Views of the top-level entities."""
+    return tuple(EntityView(self, i) for i in self.roots.tolist())
+
+  def filter_ids(self, entity_type: Type[Entity]) -> np.ndarray:
+    """The ids of all entities (not just roots) of the given type."""
+    codes = [code for code, (t, _) in enumerate(self.types)
+             if issubclass(t, entity_type)]
+    return np.flatnonzero(np.isin(self.type_codes, codes))
+
+  def materialize(self, entity_id: int) -> Entity:
+    """The Entity with this entity_id. Shared children stay shared."""
+    entity = self._materialized.get(entity_id)
+    if entity is not None:
+      return entity
+    # Children have smaller ids than their parents, so building everything
+    # below it in increasing id order never recurses.
+    pending = sorted(self._unmaterialized_below(entity_id))
+    for i in pending:
+      self._materialized[i] = self._build(i)
+    return self._materialized[entity_id]
+
+  def _unmaterialized_below(self, entity_id: int) -> List[int]:
+    seen = {entity_id}
+    stack = [entity_id]
+    while stack:
+      for child in self.children(stack.pop()).tolist():
+        if child not in seen and child not in self._materialized:
+          seen.add(child)
+          stack.append(child)
+    return list(seen)
+
+  def _build(self, entity_id: int) -> Entity:
+    code = self.type_codes[entity_id]
+    entity_type, type_string = self.types[code]
+    kwargs = dict(zip(self.attribute_names[code], self.attributes[entity_id]))
+    kwargs['bbox'] = self.geometry[entity_id]
+    kwargs['type'] = type_string
+    text = self.text(entity_id)
+    if text is not None:
+      kwargs['text'] = text
+    child_field = self.child_fields[code]
+    if child_field is not None:
+      kwargs[child_field] = tuple(
+        self._materialized[c] for c in self.children(entity_id).tolist())
+    return entity_type(**kwargs)
+
+  def to_document(self) -> Document:
+    return Document(
+      unwrap(self.bbox),
+      tuple(self.materialize(i) for i in self.roots.tolist()),
+      self.name)
+
+
+class _Builder:
+  """Assigns ids to entities in post-order and accumulates the columns."""
+
+  def __init__(self) -> None:
+    self.type_codes: Dict[Tuple[Type[Entity], str], int] = {}
+    self.text_table: Dict[str, int] = {}
+    self.by_identity: Dict[int, int] = {}
+    self.words: Dict[Word, int] = {}
+    self.codes: List[int] = []
+    self.bboxes: List[BBox] = []
+    self.text_ids: List[int] = []
+    self.children: List[List[int]] = []
+    self.attributes: List[Tuple[Any, ...]] = []
+    self.empty_attributes: Dict[int, Tuple[Any, ...]] = {}
+    # Keeps added entities alive so that their ids are not reused.
+    self.entities: List[Entity] = []
+
+  def add(self, entity: Entity) -> int:
+    entity_id = self.by_identity.get(id(entity))
+    if entity_id is not None:
+      return entity_id
+    if isinstance(entity, Word):
+      entity_id = self.words.get(entity)
+      if entity_id is not None:
+        self.by_identity[id(entity)] = entity_id
+        return entity_id
+
+    child_field = children_field(type(entity))
+    children = [self.add(child) for child in getattr(entity, child_field)] \
+      if child_field is not None else []
+
+    fields = type(entity).__dataclass_fields__ # type: ignore
+    key = (type(entity), entity.type)
+    code = self.type_codes.setdefault(key, len(self.type_codes))
+    text = entity.text if 'text' in fields else None # type: ignore
+    text_id = -1 if text is None else \
+      self.text_table.setdefault(text, len(self.text_table))
+    values = tuple(getattr(entity, name)
+                   for name in _attribute_names(type(entity)))
+    if all(value is None for value in values):
+      values = self.empty_attributes.setdefault(code, values)
+
+    entity_id = len(self.codes)
+    self.codes.append(code)
+    self.bboxes.append(entity.bbox)
+    self.text_ids.append(text_id)
+    self.children.append(children)
+    self.attributes.append(values)
+    self.entities.append(entity)
+    self.by_identity[id(entity)] = entity_id
+    if isinstance(entity, Word):
+      self.words[entity] = entity_id
+    return entity_id
+
+  def build(
+    self,
+    roots: List[int],
+    bbox: Optional[BBox],
+    name: Optional[str],
+  ) -> EntityStore:
+    counts = np.array([len(c) for c in self.children], dtype=np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    child_ids = np.fromiter(
+      (c for cs in self.children for c in cs), dtype=np.int64,
+      count=int(offsets[-1]))
+    return EntityStore(
+      types=sorted(self.type_codes, key=self.type_codes.__getitem__),
+      type_codes=np.array(self.codes, dtype=np.int16),
+      geometry=BBoxArray.from_bboxes(self.bboxes, np.int64 if all(
+        type(c) is int for b in self.bboxes
+        for c in (b.ix.a, b.ix.b, b.iy.a, b.iy.b)) else None),
+      texts=sorted(self.text_table, key=self.text_table.__getitem__),
+      text_ids=np.array(self.text_ids, dtype=np.int32),
+      child_offsets=offsets,
+      child_ids=child_ids,
+      attributes=self.attributes,
+      roots=np.array(roots, dtype=np.int64),
+      bbox=bbox,
+      name=name)
+
+
+class EntityView:
+  """A read-only handle to one entity in an EntityStore.
+
+  Views expose the same attributes as the entity they stand for -- `bbox`,
+  `type`, `text`, `children`, `entity_words()` and the entity's own fields --
+  but children are returned as views and nothing is materialized unless
+  `materialize` is called.
+  """
+
+  __slots__ = ('store', 'id')
+
+  def __init__(self, store: EntityStore, entity_id: int):
+    self.store = store
+    self.id = entity_id
+
+  def __eq__(self, other: Any) -> bool:
+    return isinstance(other, EntityView) and \
+      self.store is other.store and self.id == other.id
+
+  def __hash__(self) -> int:
+    return hash((id(self.store), self.id))
+
+  def __repr__(self) -> str:
+    return f'<EntityView {self.type} #{self.id}>'
+
+  @property
+  def entity_type(self) -> Type[Entity]:
+    return self.store.entity_type(self.id)
+
+  @property
+  def type(self) -> str:
+    return self.store.type(self.id)
+
+  @property
+  def bbox(self) -> BBox:
+    return self.store.geometry[self.id]
+
+  @property
+  def height(self) -> float:
+    return self.bbox.height
+
+  @property
+  def width(self) -> float:
+    return self.bbox.width
+
+  @property
+  def text(self) -> Optional[str]:
+    return self.store.text(self.id)
+
+  @property
+  def entity_text(self) -> Optional[str]:
+    if self.store.text_ids[self.id] >= 0:
+      return self.text
+    return getattr(self.materialize(), 'text', None)
+
+  @property
+  def children(self) -> Tuple['EntityView', ...]:
+    return tuple(EntityView(self.store, i)
+                 for i in self.store.children(self.id).tolist())
+
+  def entity_words(self) -> Iterator['EntityView']:
+    for i in self.store.entity_word_ids(self.id):
+      yield EntityView(self.store, i)
+
+  def isinstance(self, entity_type: Type[Entity]) -> bool:
+    return issubclass(self.entity_type, entity_type)
+
+  def materialize(self) -> Entity:
+    return self.store.materialize(self.id)
+
+  def __getattr__(self, name: str) -> Any:
+    # Only called for names which are not view attributes: entity fields.
+    code = self.store.type_codes[self.id]
+    if name == self.store.child_fields[code]:
+      return self.children
+    return self.store.attribute(self.id, name)
@@ -9,11 +9,12 @@ from dataclasses import asdict, dataclass, replace
 from functools import lru_cache
 from itertools import chain
 from pathlib import Path
-from typing import Any, Collection, Dict, FrozenSet, Generator, Iterable, Optional, Set, Tuple, TypeVar
+from typing import Any, Callable, Collection, Dict, FrozenSet, Generator, Iterable, List, Optional, Set, Tuple, TypeVar
 
-from .entity import Entity, entity_resolver
+from .entity import Entity, entity_resolver, pickle_table, unpickle_table
 from .geometry import BBox
-from .instantiate import instantiate
+from .instantiate import compile_decoder
+from .json_writer import write_json
 
 
 """An ID for "something we wish to extract" in a document.
@@ -127,6 +128,11 @@ class Extraction:
     return isinstance(other, Extraction) and \
             frozenset(self.assignments) == frozenset(other.assignments)
 
+  def __reduce__(self) -> Tuple[Callable, Tuple[Any, ...]]:
+    return _unpickle_extraction, \
+      (tuple(point.field for point in self.assignments),) + pickle_table(
+        point.entity for point in self.assignments)
+
   def __contains__(self, field: Field) -> bool:
     return field in self.fields
 
@@ -182,14 +188,30 @@ class Extraction:
     return f'<Extraction({", ".join(map(str, self.points()))})>'
 
 
+def _unpickle_extraction(
+  fields: Tuple[Field, ...],
+  types: Tuple[type, ...],
+  entries: List[Tuple[Any, ...]],
+  roots: List[int],
+) -> Extraction:
+  entities = unpickle_table(types, entries)
+  return Extraction(tuple(
+    ExtractionPoint(field, entities[i]) for field, i in zip(fields, roots)))
+
+
 def load_extraction(path: Path) -> Extraction:
   with path.open() as f:
     return load_extraction_from_json(json.load(f))
 
 
+def save_extraction(extraction: Extraction, path: Path) -> None:
+  with path.open('w') as f:
+    write_json(extraction, f)
+    f.write('\n')
+
+
 def load_extraction_from_json(blob: Dict) -> Extraction:
-  return instantiate(
+  return compile_decoder(
     Extraction,
-    blob,
     base_classes={Entity},
-    derived_class_resolver=entity_resolver)
+    derived_class_resolver=entity_resolver)(blob)
@@ -1,18 +1,31 @@
 """Geometry."""
 
+import heapq
+
+from bisect import bisect_left
 from dataclasses import dataclass
-from itertools import chain
 from math import sqrt
-from typing import Dict, FrozenSet, Generator, Iterable, Optional
+from typing import Any, Callable, Dict, FrozenSet, Generator, Iterable, List, Optional, Sequence, Tuple
+
+
+# Geometry objects are by far the most numerous objects in a loaded document,
+# so they use __slots__ instead of a per-instance __dict__. Frozen dataclasses
+# with slots cannot be unpickled through the default __setstate__, hence the
+# __reduce__ methods, which rebuild through the constructor.
 
 
 @dataclass(frozen=True)
 class Interval:
   """Represents a closed interval."""
 
+  __slots__ = ('a', 'b')
+
   a: float
   b: float
 
+  def __reduce__(self) -> Tuple[type, Tuple[float, float]]:
+    return Interval, (self.a, self.b)
+
   @property
   def length(self) -> float:
     return self.b - self.a
@@ -73,27 +86,58 @@ class Interval:
 
   @staticmethod
   def spanning(xs: Iterable[float]) -> 'Interval':
-    xs = tuple(xs)
-    if not xs:
+    it = iter(xs)
+    lo = next(it, None)
+    if lo is None:
       # Actually, the empty intersection is defined to be the ambient space --
       # in this case the real line -- so it's not really right to return `None`.
       raise RuntimeError('cannot take the spanning interval '
         'of an empty list of points')
-    return Interval(min(xs), max(xs))
+    hi = lo
+    for x in it:
+      if x < lo:
+        lo = x
+      elif x > hi:
+        hi = x
+    return Interval(lo, hi)
 
   @staticmethod
   def spanning_intervals(Is: Iterable['Interval']) -> 'Interval':
-    return Interval.spanning(chain.from_iterable(I.ends for I in Is))
+    it = iter(Is)
+    first = next(it, None)
+    if first is None:
+      raise RuntimeError('cannot take the spanning interval '
+        'of an empty list of intervals')
+    lo, hi = min(first.a, first.b), max(first.a, first.b)
+    for I in it:
+      # Like min and max, prefer a when a == b.
+      a, b = I.a, I.b
+      if b < a:
+        a, b = b, a
+      elif not a < b:
+        b = a
+      if a < lo:
+        lo = a
+      if b > hi:
+        hi = b
+    return Interval(lo, hi)
 
   @staticmethod
   def intersection(Is: Iterable['Interval']) -> Optional['Interval']:
-    Is = tuple(Is)
-    if not Is:
+    it = iter(Is)
+    first = next(it, None)
+    if first is None:
       # Actually, the empty intersection is defined to be the ambient space --
       # in this case the real line -- so it's not really right to return `None`.
       raise RuntimeError('cannot take the intersection '
         'of an empty list of intervals')
-    return Interval.build(max(I.a for I in Is), min(I.b for I in Is))
+    a, b = first.a, first.b
+    for I in it:
+      if I.a > a:
+        a = I.a
+      if I.b < b:
+        b = I.b
+    return Interval.build(a, b)
 
   def dump(self) -> Dict:
     return {
@@ -104,9 +148,14 @@ class Interval:
 
 @dataclass(frozen=True)
 class Point:
+  __slots__ = ('x', 'y')
+
   x: float
   y: float
 
+  def __reduce__(self) -> Tuple[type, Tuple[float, float]]:
+    return Point, (self.x, self.y)
+
   def __str__(self) -> str:
     return "Point({}, {})".format(self.x, self.y)
 
@@ -133,9 +182,14 @@ class Point:
 
 @dataclass(frozen=True)
 class BBox:
+  __slots__ = ('ix', 'iy')
+
   ix: Interval
   iy: Interval
 
+  def __reduce__(self) -> Tuple[type, Tuple[Interval, Interval]]:
+    return BBox, (self.ix, self.iy)
+
   @property
   def center(self) -> Point:
     return Point(self.ix.center, self.iy.center)
@@ -196,25 +250,47 @@ class BBox:
   def build(ix: Optional[Interval], iy: Optional[Interval]) -> Optional['BBox']:
     return BBox(ix, iy) if ix is not None and iy is not None else None
 
+  # The aggregates below make a single pass over their input and work on raw
+  # coordinates, without materializing the input or any corner Points.
+
   @staticmethod
   def spanning(ps: Iterable[Point]) -> Optional['BBox']:
-    ps = tuple(ps)
-    if not ps:
+    it = iter(ps)
+    p = next(it, None)
+    if p is None:
       return None
-    ix = Interval(min(p.x for p in ps), max(p.x for p in ps))
-    iy = Interval(min(p.y for p in ps), max(p.y for p in ps))
-    return BBox(ix, iy)
+    x0 = x1 = p.x
+    y0 = y1 = p.y
+    for p in it:
+      x, y = p.x, p.y
+      if x < x0:
+        x0 = x
+      elif x > x1:
+        x1 = x
+      if y < y0:
+        y0 = y
+      elif y > y1:
+        y1 = y
+    return BBox(Interval(x0, x1), Interval(y0, y1))
 
   @staticmethod
   def intersection(bs: Iterable['BBox']) -> Optional['BBox']:
-    bs = tuple(bs)
-    if not bs:
-      return None
-    ix = Interval.intersection(b.ix for b in bs)
-    iy = Interval.intersection(b.iy for b in bs)
-    if ix is None or iy is None:
+    it = iter(bs)
+    b = next(it, None)
+    if b is None:
       return None
-    return BBox(ix, iy)
+    x0, x1, y0, y1 = b.ix.a, b.ix.b, b.iy.a, b.iy.b
+    for b in it:
+      ix, iy = b.ix, b.iy
+      if ix.a > x0:
+        x0 = ix.a
+      if ix.b < x1:
+        x1 = ix.b
+      if iy.a > y0:
+        y0 = iy.a
+      if iy.b < y1:
+        y1 = iy.b
+    return BBox.build(Interval.build(x0, x1), Interval.build(y0, y1))
 
   @staticmethod
   def union(bs: Iterable['BBox']) -> Optional['BBox']:
@@ -223,9 +299,34 @@ class BBox:
     Returns:
       None if bs is an empty iterator.
     """
-    b = BBox.spanning(
-      chain.from_iterable([b.corners() for b in bs]))
-    return b
+    it = iter(bs)
+    b = next(it, None)
+    if b is None:
+      return None
+    x0, x1 = min(b.ix.a, b.ix.b), max(b.ix.a, b.ix.b)
+    y0, y1 = min(b.iy.a, b.iy.b), max(b.iy.a, b.iy.b)
+    for b in it:
+      ix, iy = b.ix, b.iy
+      # Like min and max over the corners, prefer a when a == b.
+      a, c = ix.a, ix.b
+      if c < a:
+        a, c = c, a
+      elif not a < c:
+        c = a
+      if a < x0:
+        x0 = a
+      if c > x1:
+        x1 = c
+      a, c = iy.a, iy.b
+      if c < a:
+        a, c = c, a
+      elif not a < c:
+        c = a
+      if a < y0:
+        y0 = a
+      if c > y1:
+        y1 = c
+    return BBox(Interval(x0, x1), Interval(y0, y1))
 
   @staticmethod
   def distance(b1: 'BBox', b2: 'BBox') -> float:
@@ -233,10 +334,273 @@ class BBox:
     iy = Interval(min(b1.iy.a, b2.iy.a), max(b1.iy.b, b2.iy.b))
     inner_width = max(0, ix.length - b1.ix.length - b2.ix.length)
     inner_height = max(0, iy.length - b1.iy.length - b2.iy.length)
-    return sqrt(inner_width**2 + inner_height**2)
+    # Squaring by multiplication is correctly rounded (unlike `**`, which goes
+    # through libm's pow), so vectorized versions of this agree exactly.
+    return sqrt(inner_width * inner_width + inner_height * inner_height)
 
   def dump(self) -> Dict:
     return {
       'ix': self.ix.dump(),
       'iy': self.iy.dump(),
     }
+
+
+@dataclass(frozen=True)
+class FixedPoint:
+  """An integer coordinate system for loading geometry.
+
+  Coordinates are quantized to the nearest multiple of 1 / resolution and
+  stored as that multiple, so with resolution 100 an OCR coordinate of 12.345
+  pixels becomes the int 1234. Geometry loaded this way is in the quantized
+  units: predicates and indexes compare ints exactly, hashing is cheap and
+  `BBoxArray` can pack it into int32 columns, as long as the quantized
+  coordinates fit: packing raises OverflowError otherwise. Use `dequantize`
+  to get back to the original units.
+  """
+  resolution: int = 1
+
+  def quantize(self, x: float) -> int:
+    return int(round(x * self.resolution))
+
+  def dequantize(self, q: float) -> float:
+    return q / self.resolution
+
+  def interval(self, a: float, b: float) -> Interval:
+    return Interval(self.quantize(a), self.quantize(b))
+
+  def bbox(self, ix: Interval, iy: Interval) -> BBox:
+    """Builds a BBox from intervals which are already quantized."""
+    return BBox(ix, iy)
+
+  def quantized_bbox(self, bbox: BBox) -> BBox:
+    return BBox(self.interval(bbox.ix.a, bbox.ix.b),
+                self.interval(bbox.iy.a, bbox.iy.b))
+
+  def dequantized_bbox(self, bbox: BBox) -> BBox:
+    return BBox(
+      Interval(self.dequantize(bbox.ix.a), self.dequantize(bbox.ix.b)),
+      Interval(self.dequantize(bbox.iy.a), self.dequantize(bbox.iy.b)))
+
+  @property
+  def factories(self) -> Dict[type, Callable[..., Any]]:
+    """Constructor overrides for `instantiate`."""
+    return {Interval: self.interval, BBox: self.bbox}
+
+
+class GeometryInterner:
+  """Hands out one shared instance for equal Intervals and BBoxes.
+
+  Documents repeat the same boxes a lot: a Word's bbox reappears in every
+  Text, Date or TableCell built over it. Loading through an interner (see
+  `load_document(..., intern_geometry=True)`) keeps one copy of each.
+
+  Coordinates are keyed together with their type, so that an int coordinate
+  is never replaced by an equal float one and dumps are unchanged.
+
+  Attributes:
+    fixed_point: If given, `interval` quantizes its coordinates first.
+  """
+
+  def __init__(self, fixed_point: Optional[FixedPoint] = None) -> None:
+    self.fixed_point = fixed_point
+    self._intervals: Dict[Tuple[type, float, type, float], Interval] = {}
+    self._bboxes: Dict[Tuple[Interval, Interval], BBox] = {}
+
+  def interval(self, a: float, b: float) -> Interval:
+    if self.fixed_point is not None:
+      a, b = self.fixed_point.quantize(a), self.fixed_point.quantize(b)
+    return self._interval(a, b)
+
+  def _interval(self, a: float, b: float) -> Interval:
+    key = (a.__class__, a, b.__class__, b)
+    I = self._intervals.get(key)
+    if I is None:
+      I = self._intervals[key] = Interval(a, b)
+    return I
+
+  def bbox(self, ix: Interval, iy: Interval) -> BBox:
+    """Interns a BBox. Its intervals are interned as they are."""
+    ix = self._interval(ix.a, ix.b)
+    iy = self._interval(iy.a, iy.b)
+    key = (ix, iy)
+    b = self._bboxes.get(key)
+    if b is None:
+      b = self._bboxes[key] = BBox(ix, iy)
+    return b
+
+  @property
+  def factories(self) -> Dict[type, Callable[..., Any]]:
+    """Constructor overrides for `instantiate`."""
+    return {Interval: self.interval, BBox: self.bbox}
+
+
+def geometry_factories(
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> Optional[Dict[type, Callable[..., Any]]]:
+  """The `instantiate` factories implementing the geometry loading options."""
+  if intern_geometry:
+    return GeometryInterner(fixed_point).factories
+  if fixed_point is not None:
+    return fixed_point.factories
+  return None
+
+
+class IntervalIndex:
+  """A static interval tree for 1-D overlap, containment and stabbing queries.
+
+  The intervals are sorted by their start and laid out as an implicit balanced
+  binary tree, where each node also stores the smallest and largest end in its
+  subtree. Queries skip the subtrees which cannot hold a result, and take
+  O((k + 1) log n) time for k results, and O(n) at worst. All query results
+  are indices into the sequence the index was built from, in increasing
+  order.
+
+  Intervals are assumed to be valid.
+  """
+
+  def __init__(self, intervals: Sequence[Interval]):
+    self.intervals = tuple(intervals)
+    order = sorted(range(len(self.intervals)),
+                   key=lambda i: (self.intervals[i].a, self.intervals[i].b))
+    self._order = order
+    self._starts = [self.intervals[i].a for i in order]
+    self._ends = [self.intervals[i].b for i in order]
+    self._max_ends = list(self._ends)
+    self._min_ends = list(self._ends)
+    # Fill in subtree extrema bottom-up: children are finished before parents
+    # when nodes are visited in reverse pre-order.
+    nodes: List[Tuple[int, int]] = []
+    stack = [(0, len(order))]
+    while stack:
+      lo, hi = stack.pop()
+      if lo < hi:
+        nodes.append((lo, hi))
+        mid = (lo + hi) // 2
+        stack.append((lo, mid))
+        stack.append((mid + 1, hi))
+    for lo, hi in reversed(nodes):
+      mid = (lo + hi) // 2
+      for child in ((lo + mid) // 2 if lo < mid else None,
+                    (mid + 1 + hi) // 2 if mid + 1 < hi else None):
+        if child is None:
+          continue
+        if self._max_ends[child] > self._max_ends[mid]:
+          self._max_ends[mid] = self._max_ends[child]
+        if self._min_ends[child] < self._min_ends[mid]:
+          self._min_ends[mid] = self._min_ends[child]
+
+  def __len__(self) -> int:
+    return len(self.intervals)
+
+  def _query(self, max_start: float, min_end: float) -> List[int]:
+    """Indices of intervals with `a <= max_start` and `b >= min_end`."""
+    result = []
+    stack = [(0, len(self._order))]
+    while stack:
+      lo, hi = stack.pop()
+      if lo >= hi:
+        continue
+      mid = (lo + hi) // 2
+      if self._max_ends[mid] < min_end:
+        continue
+      stack.append((lo, mid))
+      if self._starts[mid] <= max_start:
+        if self._ends[mid] >= min_end:
+          result.append(self._order[mid])
+        stack.append((mid + 1, hi))
+    result.sort()
+    return result
+
+  def overlapping(self, query: Interval) -> List[int]:
+    """Intervals I for which `I.intersects_interval(query)`."""
+    return self._query(query.b, query.a)
+
+  def stabbing(self, x: float) -> List[int]:
+    """Intervals I for which `x in I`."""
+    return self._query(x, x)
+
+  def containing(self, query: Interval) -> List[int]:
+    """Intervals I for which `I.contains_interval(query)`."""
+    if not query.valid:
+      return []
+    return self._query(query.a, query.b)
+
+  def contained_in(self, query: Interval) -> List[int]:
+    """Intervals I for which `query.contains_interval(I)`.
+
+    These are the intervals starting at or after `query.a` and ending at or
+    before `query.b`. Subtrees which start too early or whose smallest end is
+    too late are skipped. Apart from the O(log n) subtrees on the path to the
+    first interval starting at `query.a`, every subtree visited holds a
+    result.
+    """
+    if not query.valid:
+      return []
+    first = bisect_left(self._starts, query.a)
+    result = []
+    stack = [(0, len(self._order))]
+    while stack:
+      lo, hi = stack.pop()
+      if lo >= hi or hi <= first:
+        continue
+      mid = (lo + hi) // 2
+      if self._min_ends[mid] > query.b:
+        continue
+      stack.append((mid + 1, hi))
+      if mid >= first:
+        if self._ends[mid] <= query.b:
+          result.append(self._order[mid])
+        stack.append((lo, mid))
+    result.sort()
+    return result
+
+  def overlapping_pairs(
+    self,
+    other: Optional['IntervalIndex'] = None,
+  ) -> List[Tuple[int, int]]:
+    """All pairs of overlapping intervals, found with a sweep line.
+
+    Args:
+      other: If given, pairs (i, j) are such that interval i of this index
+        intersects interval j of other. Otherwise pairs (i, j) with i < j are
+        overlapping intervals of this index.
+    """
+    if other is None:
+      pairs = _sweep_pairs(self, self)
+      return sorted((i, j) if i < j else (j, i) for i, j in pairs if i != j)
+    return sorted(_sweep_pairs(self, other))
+
+
+def _sweep_pairs(
+  left: IntervalIndex,
+  right: IntervalIndex,
+) -> List[Tuple[int, int]]:
+  """Overlapping (left, right) index pairs, by merging the two sorted orders.
+
+  When left is right, each unordered pair is reported once.
+  """
+  self_join = left is right
+  active_left: List[Tuple[float, int]] = []
+  active_right: List[Tuple[float, int]] = []
+  pairs: List[Tuple[int, int]] = []
+  i = j = 0
+  n, m = len(left._order), 0 if self_join else len(right._order)
+  while i < n or j < m:
+    if j >= m or (i < n and left._starts[i] <= right._starts[j]):
+      start, end, index = left._starts[i], left._ends[i], left._order[i]
+      i += 1
+      mine, theirs = active_left, (active_left if self_join else active_right)
+      flip = False
+    else:
+      start, end, index = right._starts[j], right._ends[j], right._order[j]
+      j += 1
+      mine, theirs = active_right, active_left
+      flip = True
+    while theirs and theirs[0][0] < start:
+      heapq.heappop(theirs)
+    for _, other_index in theirs:
+      pairs.append((other_index, index) if flip or self_join
+                   else (index, other_index))
+    heapq.heappush(mine, (end, index))
+  return pairs
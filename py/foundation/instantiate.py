@@ -14,7 +14,12 @@ def instantiate(t: typing.Type[T], v: typing.Any,
                  base_classes: typing.Optional[typing.Set[typing.Type]] = None,
                  derived_class_resolver:
                    typing.Optional[
-                     typing.Callable[[typing.Any], typing.Type]] = None) -> T:
+                     typing.Callable[[typing.Any], typing.Type]] = None,
+                 factories:
+                   typing.Optional[
+                     typing.Dict[typing.Type,
+                                 typing.Callable[..., typing.Any]]] = None) \
+                                   -> T:
   """Map a raw dict to a tree of dataclasses.
 
   The intended use of this is to load the contents of a JSON file into an
@@ -40,6 +45,9 @@ def instantiate(t: typing.Type[T], v: typing.Any,
       deserialized dictionary value to derived_class_resolver -- which should
       return the actual dataclass type to use.
     derived_class_resolver: See base_classes.
+    factories: Optionally maps dataclass types to callables that are used
+      instead of the type's constructor. They receive the same keyword
+      arguments. This is used e.g. to intern or quantize geometry on load.
 
   Example code:
     @dataclass
@@ -99,8 +107,10 @@ def instantiate(t: typing.Type[T], v: typing.Any,
       raise RuntimeError('dataclasses must be instantiated from dicts; '
         f'error instantiating {t} from {v}')
     types = {field.name: field.type for field in dataclasses.fields(t)}
-    return t(**{key: instantiate( # type: ignore
-        types[key], value, FRR, base_classes, derived_class_resolver)
+    constructor = factories.get(t, t) if factories else t
+    return constructor(**{key: instantiate( # type: ignore
+        types[key], value, FRR, base_classes, derived_class_resolver,
+        factories)
       for key, value in v.items()})
 
   elif get_origin(t) == list:
@@ -108,7 +118,8 @@ def instantiate(t: typing.Type[T], v: typing.Any,
       raise RuntimeError('lists must be instantiated from lists; '
         f'error instantiating {t} from {v}')
     return list(instantiate( # type: ignore
-        get_args(t)[0], entry, FRR, base_classes, derived_class_resolver)
+        get_args(t)[0], entry, FRR, base_classes, derived_class_resolver,
+        factories)
       for entry in v)
 
   elif get_origin(t) == tuple:
@@ -116,12 +127,14 @@ def instantiate(t: typing.Type[T], v: typing.Any,
       raise RuntimeError('tuples must be instantiated from lists; '
         f'error instantiating {t} from {v}')
     return tuple(instantiate( # type: ignore
-        get_args(t)[0], entry, FRR, base_classes, derived_class_resolver)
+        get_args(t)[0], entry, FRR, base_classes, derived_class_resolver,
+        factories)
       for entry in v)
 
   elif is_optional(t):
     return None if v is None else instantiate( # type: ignore
-      get_optional_arg(t), v, FRR, base_classes, derived_class_resolver)
+      get_optional_arg(t), v, FRR, base_classes, derived_class_resolver,
+      factories)
 
   elif get_origin(t) == dict:
     if not isinstance(v, dict):
@@ -136,7 +149,8 @@ def instantiate(t: typing.Type[T], v: typing.Any,
       if not key_type in {int, float, str}:
         raise RuntimeError(f'invalid key type in dict: {key_type} in {t}')
       return dict(**{key_type(key): instantiate( # type: ignore
-          value_type, value, FRR, base_classes, derived_class_resolver)
+          value_type, value, FRR, base_classes, derived_class_resolver,
+          factories)
         for key, value in v.items()})
     else:
       return v # type: ignore
@@ -145,7 +159,8 @@ def instantiate(t: typing.Type[T], v: typing.Any,
     t_name = get_forward_arg(t)
     if FRR and t_name in FRR:
       return instantiate(
-        FRR[t_name], v, FRR, base_classes, derived_class_resolver)
+        FRR[t_name], v, FRR, base_classes, derived_class_resolver,
+        factories)
     else:
       raise RuntimeError(
         'you need to provide instantiate with a dictionary to resolve '
@@ -153,3 +168,159 @@ def instantiate(t: typing.Type[T], v: typing.Any,
 
   else:
     return t(v) # type: ignore
+
+
+# A compiled decoder maps a raw value and the `factories` to use to the
+# decoded value.
+_Decoder = typing.Callable[
+  [typing.Any, typing.Optional[typing.Dict[typing.Type, typing.Any]]],
+  typing.Any]
+
+_DecoderKey = typing.Tuple[typing.Any, ...]
+
+_decoders: typing.Dict[_DecoderKey, _Decoder] = {}
+
+
+def compile_decoder(t: typing.Type[T],
+                    forward_ref_resolver:
+                      typing.Optional[
+                        typing.Dict[str, typing.Type]] = None,
+                    base_classes:
+                      typing.Optional[typing.Set[typing.Type]] = None,
+                    derived_class_resolver:
+                      typing.Optional[
+                        typing.Callable[[typing.Any], typing.Type]] = None,
+                    factories:
+                      typing.Optional[
+                        typing.Dict[typing.Type,
+                                    typing.Callable[..., typing.Any]]] = None) \
+                                      -> typing.Callable[[typing.Any], T]:
+  """A function equivalent to `instantiate` with these arguments.
+
+  `instantiate` inspects the target type again for every value it decodes.
+  This instead inspects each type once and builds a specialized decoding
+  function for it, which is cached, so decoding many values of the same type
+  only pays for the work that depends on the values.
+
+  Compiled decoders are shared between calls with equal `t`,
+  `forward_ref_resolver`, `base_classes` and `derived_class_resolver`;
+  `factories` are looked up when decoding, so passing new factories for each
+  call (e.g. to intern geometry per document) costs nothing extra.
+
+  See `instantiate` for the arguments.
+  """
+  assert base_classes and     derived_class_resolver or \
+     not base_classes and not derived_class_resolver
+
+  context = (
+    tuple(sorted(forward_ref_resolver.items()))
+      if forward_ref_resolver else (),
+    frozenset(base_classes) if base_classes else frozenset(),
+    derived_class_resolver)
+  decode = _compile(t, context)
+  return lambda v: decode(v, factories)
+
+
+def _compile(t: typing.Any, context: _DecoderKey) -> _Decoder:
+  key = (t, context)
+  decoder = _decoders.get(key)
+  if decoder is None:
+    # Recursive types refer back to themselves while being compiled.
+    compiled: typing.List[_Decoder] = []
+    _decoders[key] = lambda v, factories: compiled[0](v, factories)
+    decoder = _build_decoder(t, context)
+    compiled.append(decoder)
+    _decoders[key] = decoder
+  return decoder
+
+
+def _raise(error: Exception) -> _Decoder:
+  """A decoder for types which `instantiate` only rejects given a value."""
+  def decode(v: typing.Any, factories: typing.Any) -> typing.Any:
+    raise error
+  return decode
+
+
+def _build_decoder(t: typing.Any, context: _DecoderKey) -> _Decoder:
+  forward_refs, base_classes, derived_class_resolver = context
+
+  def get_args(t: typing.Type) -> typing.Tuple[type, ...]:
+    return getattr(t, '__args__', tuple())
+  def get_origin(t: typing.Type) -> typing.Optional[type]:
+    return getattr(t, '__origin__', None)
+  KT = typing.KT # type: ignore
+  VT = typing.VT # type: ignore
+
+  if t in base_classes:
+    # Derived classes are only known from the values, so they are compiled
+    # on first sight.
+    derived: typing.Dict[type, _Decoder] = {}
+    def decode_base(v: typing.Any, factories: typing.Any) -> typing.Any:
+      derived_type = derived_class_resolver(v)
+      decode = derived.get(derived_type)
+      if decode is None:
+        decode = derived[derived_type] = _compile(derived_type, context)
+      return decode(v, factories)
+    return decode_base
+
+  if dataclasses.is_dataclass(t):
+    field_decoders = {field.name: _compile(field.type, context)
+                      for field in dataclasses.fields(t)}
+    def decode_dataclass(v: typing.Any, factories: typing.Any) -> typing.Any:
+      if not isinstance(v, dict):
+        raise RuntimeError('dataclasses must be instantiated from dicts; '
+          f'error instantiating {t} from {v}')
+      constructor = factories.get(t, t) if factories else t
+      return constructor(**{key: field_decoders[key](value, factories) # type: ignore
+                            for key, value in v.items()})
+    return decode_dataclass
+
+  elif get_origin(t) == list or get_origin(t) == tuple:
+    kind: typing.Any = get_origin(t)
+    decode_entry = _compile(get_args(t)[0], context)
+    def decode_sequence(v: typing.Any, factories: typing.Any) -> typing.Any:
+      if not isinstance(v, list):
+        raise RuntimeError(f'{kind.__name__}s must be instantiated from lists; '
+          f'error instantiating {t} from {v}')
+      return kind(decode_entry(entry, factories) for entry in v)
+    return decode_sequence
+
+  elif (get_origin(t) is typing.Union and len(get_args(t)) == 2 and
+        type(None) in get_args(t)):
+    decode_arg = _compile(
+      next(arg for arg in get_args(t) if arg is not type(None)), context)
+    return lambda v, factories: \
+      None if v is None else decode_arg(v, factories)
+
+  elif get_origin(t) == dict:
+    if get_args(t) == (KT, VT) or get_args(t) == tuple():
+      def decode_raw_dict(v: typing.Any, factories: typing.Any) -> typing.Any:
+        if not isinstance(v, dict):
+          raise RuntimeError('dicts must be instantiated from dicts; '
+            f'error instantiating {t} from {v}')
+        return v
+      return decode_raw_dict
+    key_type, value_type = get_args(t)
+    if not key_type in {int, float, str}:
+      return _raise(RuntimeError(
+        f'invalid key type in dict: {key_type} in {t}'))
+    decode_value = _compile(value_type, context)
+    def decode_dict(v: typing.Any, factories: typing.Any) -> typing.Any:
+      if not isinstance(v, dict):
+        raise RuntimeError('dicts must be instantiated from dicts; '
+          f'error instantiating {t} from {v}')
+      return {key_type(key): decode_value(value, factories)
+              for key, value in v.items()}
+    return decode_dict
+
+  elif isinstance(t, typing.ForwardRef):
+    t_name = t.__forward_arg__
+    resolved = dict(forward_refs).get(t_name)
+    if resolved is None:
+      return _raise(RuntimeError(
+        'you need to provide instantiate with a dictionary to resolve '
+        f'types which are forward references (for "{t_name}")'))
+    return _compile(resolved, context)
+
+  else:
+    return lambda v, factories: t(v)
@@ -0,0 +1,52 @@
+"""Writing dataclass trees as JSON without copying them.
+
+`json.dumps(asdict(x))` first deep-copies x into dicts and then builds the
+whole JSON string, so saving a document takes several times its size in
+memory. The encoder here converts one dataclass at a time as the JSON encoder
+reaches it, and `write_json` writes the output in chunks as it is produced.
+The output is the same, byte for byte.
+"""
+
+import json
+
+from dataclasses import fields, is_dataclass
+from typing import Any, List, TextIO
+
+
+class DataclassEncoder(json.JSONEncoder):
+  """Encodes dataclasses like `asdict` does, but one level at a time.
+
+  `encode(value)` equals `json.dumps(asdict(value))` for the same encoder
+  options, but never copies the tree.
+  """
+
+  def default(self, o: Any) -> Any:
+    if is_dataclass(o) and not isinstance(o, type):
+      return {field.name: getattr(o, field.name) for field in fields(o)}
+    return super().default(o)
+
+
+def write_json(
+  value: Any,
+  f: TextIO,
+  chunk_size: int = 1 << 16,
+  **kwargs: Any,
+) -> None:
+  """Writes `json.dumps(asdict(value), **kwargs)` to f, in chunks.
+
+  Args:
+    value: A dataclass, or any JSON-serializable value containing dataclasses.
+    f: The file to write to.
+    chunk_size: Roughly how many characters to write at a time.
+    **kwargs: `json.JSONEncoder` options, e.g. `indent` and `sort_keys`.
+  """
+  pending: List[str] = []
+  pending_size = 0
+  for fragment in DataclassEncoder(**kwargs).iterencode(value):
+    pending.append(fragment)
+    pending_size += len(fragment)
+    if pending_size >= chunk_size:
+      f.write(''.join(pending))
+      pending.clear()
+      pending_size = 0
+  f.write(''.join(pending))
@@ -0,0 +1,111 @@
+"""Documents whose entities are decoded on first access.
+
+A LazyDocument parses its JSON once but keeps every top-level entity as its
+raw dict until it is accessed. Entities are decoded one top-level entity at a
+time, together with everything below it, and then kept, so the cost of
+loading is proportional to the entities a caller actually touches.
+`filter_entities` decides which entities match from the raw `type` field, so
+filtering for Words never decodes a Table.
+"""
+
+import json
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from .document import Document
+from .entity import Entity, EntityTableDecoder, entity_resolver
+from .geometry import BBox, FixedPoint, geometry_factories
+from .instantiate import compile_decoder
+
+
+E = TypeVar('E', bound=Entity)
+
+
+class LazyDocument:
+  """A read-only Document which decodes entities on demand.
+
+  Attributes:
+    bbox: The document's bbox.
+    name: The document's name.
+  """
+
+  def __init__(
+    self,
+    blob: Dict[str, Any],
+    intern_geometry: bool = False,
+    fixed_point: Optional[FixedPoint] = None,
+  ):
+    """
+    Args:
+      blob: The parsed JSON of a document, in the inline or the entity table
+        format.
+      intern_geometry: See `load_fnd_doc_from_json`.
+      fixed_point: See `load_fnd_doc_from_json`.
+    """
+    # All entities of the document share one set of factories, so interning
+    # works across entities decoded at different times.
+    factories = geometry_factories(intern_geometry, fixed_point)
+    self.bbox: BBox = compile_decoder(BBox, factories=factories)(blob['bbox'])
+    self.name: Optional[str] = blob.get('name')
+    self._raw: List[Dict[str, Any]]
+    self._decode_entity: Callable[[int], Entity]
+    if 'entity_table' in blob:
+      table = EntityTableDecoder(blob['entity_table'], factories)
+      roots: List[int] = blob['entities']
+      self._raw = [table.table[i] for i in roots]
+      self._decode_entity = lambda index: table.entity(roots[index])
+    else:
+      self._raw = blob.get('entities', [])
+      decode = compile_decoder(
+        Entity,
+        base_classes={Entity},
+        derived_class_resolver=entity_resolver,
+        factories=factories)
+      self._decode_entity = lambda index: decode(self._raw[index])
+    self._entities: Dict[int, Entity] = {}
+
+  def __len__(self) -> int:
+    """The number of top-level entities."""
+    return len(self._raw)
+
+  def entity(self, index: int) -> Entity:
+    """The index-th top-level entity."""
+    entity = self._entities.get(index)
+    if entity is None:
+      entity = self._entities[index] = self._decode_entity(index)
+    return entity
+
+  def entity_type(self, index: int) -> Type[Entity]:
+    """The type of the index-th top-level entity, without decoding it."""
+    return entity_resolver(self._raw[index])
+
+  @property
+  def entities(self) -> Tuple[Entity, ...]:
+    """All top-level entities. This decodes every entity."""
+    return tuple(self.entity(i) for i in range(len(self._raw)))
+
+  def filter_entities(self, entity_type: Type[E]) -> Iterator[E]:
+    """Like `Document.filter_entities`, but only decodes matching entities."""
+    for i in range(len(self._raw)):
+      if issubclass(self.entity_type(i), entity_type):
+        yield self.entity(i) # type: ignore
+
+  @property
+  def decoded_count(self) -> int:
+    """The number of top-level entities decoded so far."""
+    return len(self._entities)
+
+  def to_document(self) -> Document:
+    """The equivalent Document. This decodes every entity."""
+    return Document(self.bbox, self.entities, self.name)
+
+
+def load_document_lazily(
+  path: Path,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+) -> LazyDocument:
+  """Like `load_document`, but returns a LazyDocument."""
+  with path.open() as f:
+    return LazyDocument(json.load(f), intern_geometry, fixed_point)
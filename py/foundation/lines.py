@@ -0,0 +1,162 @@
+"""Building Text lines and Clusters from a page's Words.
+
+Lines are built in two sorts and a sweep:
+
+  - the words are sorted by vertical center, and each word joins the current
+    row if it overlaps the row's first word vertically, otherwise it starts a
+    new row,
+  - each row is sorted left to right and split wherever the horizontal gap
+    between words is too wide, e.g. between table columns.
+
+Lines are then grouped into Clusters: two lines are connected if they overlap
+horizontally and the vertical gap between them is small, and a Cluster is a
+connected group of lines. The candidate pairs come from a `spatial_join`, and
+the groups from a union-find.
+
+Thresholds are in units of the line height, which defaults to the median word
+height. Everything runs in O(n log n) time for n words, and the output only
+depends on the words, not on their input order.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .document import Document, median_word_height
+from .document_index import reading_order_key
+from .entity import Cluster, Text, Word
+from .geometry import BBox
+from .spatial_join import spatial_join
+
+
+def _line_order(line: Text) -> Tuple[float, float, float, float]:
+  return reading_order_key(line) + (line.bbox.ix.b, line.bbox.iy.b)
+
+
+def build_lines(
+  words: Iterable[Word],
+  line_height: Optional[float] = None,
+  max_gap: float = 1.0,
+  min_overlap: float = 0.5,
+) -> Tuple[Text, ...]:
+  """Groups words into lines of text.
+
+  Args:
+    words: The words of one page.
+    line_height: Defaults to the median height of words.
+    max_gap: Words more than this many line heights apart horizontally are
+      on different lines.
+    min_overlap: The fraction of the shorter of two words' heights which
+      must overlap vertically for them to be on the same line.
+
+  Returns:
+    The lines, in reading order.
+  """
+  words = tuple(words)
+  if not words:
+    return ()
+  # Plain tuples, so that sorting compares in C. The first item is twice the
+  # vertical center. The text and position break ties, which makes the result
+  # independent of the input order.
+  keys = []
+  for i, word in enumerate(words):
+    ix, iy = word.bbox.ix, word.bbox.iy
+    keys.append((iy.a + iy.b, ix.a, ix.b, iy.a, iy.b, word.text, i))
+  keys.sort()
+  if line_height is None:
+    line_height = median_word_height(words)
+  gap = max_gap * line_height
+
+  rows: List[List[Tuple[float, float, float, float, float, str, int]]] = []
+  row_a, row_b = 0.0, 0.0
+  for key in keys:
+    a, b = key[3], key[4]
+    overlap = min(b, row_b) - max(a, row_a)
+    if not rows or overlap < 0 or \
+        overlap < min_overlap * min(b - a, row_b - row_a):
+      rows.append([key])
+      row_a, row_b = a, b
+    else:
+      rows[-1].append(key)
+
+  lines = []
+  for row in rows:
+    row.sort(key=lambda key: key[1:])
+    start = 0
+    right = row[0][2]
+    for k in range(1, len(row)):
+      if row[k][1] - right > gap:
+        lines.append(Text.from_words(
+          tuple(words[key[-1]] for key in row[start:k])))
+        start = k
+      right = max(right, row[k][2])
+    lines.append(Text.from_words(tuple(words[key[-1]] for key in row[start:])))
+  lines.sort(key=_line_order)
+  return tuple(lines)
+
+
+def _find(parents: List[int], i: int) -> int:
+  while parents[i] != i:
+    parents[i] = parents[parents[i]]
+    i = parents[i]
+  return i
+
+
+def build_clusters(
+  lines: Sequence[Text],
+  line_height: Optional[float] = None,
+  max_line_gap: float = 0.75,
+) -> Tuple[Cluster, ...]:
+  """Groups lines into clusters, e.g. paragraphs.
+
+  Args:
+    lines: The lines of one page, e.g. from `build_lines`.
+    line_height: Defaults to the median height of the lines' words.
+    max_line_gap: Lines which overlap horizontally are in the same cluster
+      if the vertical gap between them is at most this many line heights.
+
+  Returns:
+    The clusters, in reading order. The lines of each cluster are in reading
+    order.
+  """
+  lines = sorted(lines, key=_line_order)
+  if not lines:
+    return ()
+  if line_height is None:
+    line_height = median_word_height(
+      word for line in lines for word in line.words)
+  # Lines are connected if their boxes, grown vertically by half the gap,
+  # intersect.
+  padding = max_line_gap * line_height / 2
+  bboxes = [BBox(line.bbox.ix, line.bbox.iy.expanded(padding))
+            for line in lines]
+  parents = list(range(len(lines)))
+  for i, j in spatial_join(bboxes, bboxes):
+    root_i, root_j = _find(parents, i), _find(parents, j)
+    if root_i != root_j:
+      # The earliest line in reading order is the root.
+      parents[max(root_i, root_j)] = min(root_i, root_j)
+
+  groups: Dict[int, List[Text]] = {}
+  for i, line in enumerate(lines):
+    groups.setdefault(_find(parents, i), []).append(line)
+  return tuple(Cluster.from_phrases(tuple(group))
+               for _, group in sorted(groups.items()))
+
+
+def document_lines(
+  document: Document,
+  max_gap: float = 1.0,
+  min_overlap: float = 0.5,
+) -> Tuple[Text, ...]:
+  """`build_lines` for each page of a document, in page order.
+
+  The line height is the document's `median_line_height`. Words which are on
+  no page come last.
+  """
+  index = document.entity_index
+  line_height = document.median_line_height()
+  page_indices: List[Optional[int]] = [page.index for page in index.pages]
+  result: List[Text] = []
+  for page_index in page_indices + [None]:
+    result.extend(build_lines(
+      index.on_page(page_index, Word), line_height, max_gap, min_overlap))
+  return tuple(result)
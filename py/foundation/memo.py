@@ -0,0 +1,96 @@
+"""Memoization helpers."""
+
+from dataclasses import fields
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, Type, TypeVar, overload
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class cached_property(Generic[T, R]):
+  """A property computed once per instance and then stored on the instance.
+
+  This is `functools.cached_property` (Python 3.8+), except that it writes
+  straight into the instance `__dict__`, so it also works on frozen
+  dataclasses. The cached value is not a dataclass field, so it does not take
+  part in equality, hashing, `repr` or `asdict`, and `dataclasses.replace`
+  produces a copy without it.
+  """
+
+  def __init__(self, f: Callable[[T], R]):
+    self.f = f
+    self.name = f.__name__
+    self.__doc__ = f.__doc__
+
+  def __set_name__(self, owner: Type[T], name: str) -> None:
+    self.name = name
+
+  @overload
+  def __get__(self, instance: None, owner: Optional[Type[T]] = None) \
+      -> 'cached_property[T, R]': ...
+  @overload
+  def __get__(self, instance: T, owner: Optional[Type[T]] = None) -> R: ...
+  def __get__(self, instance: Any, owner: Any = None) -> Any:
+    if instance is None:
+      return self
+    value = self.f(instance)
+    instance.__dict__[self.name] = value
+    return value
+
+
+C = TypeVar('C', bound=type)
+
+
+def _field_names(cls: type) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+  """The names of the fields of a dataclass which take part in hashing and
+  in equality, as the generated `__hash__` and `__eq__` would use them."""
+  names = _field_names_cache.get(cls)
+  if names is None:
+    fs = fields(cls)
+    names = _field_names_cache[cls] = (
+      tuple(f.name for f in fs if (f.compare if f.hash is None else f.hash)),
+      tuple(f.name for f in fs if f.compare))
+  return names
+
+
+_field_names_cache: Dict[type, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+
+
+def cached_hash(cls: C) -> C:
+  """A class decorator caching a frozen dataclass's hash on each instance.
+
+  The generated `__hash__` of a frozen dataclass hashes all fields, which for
+  nested dataclasses means the whole tree, every time. With this decorator
+  each instance hashes its fields once. `__eq__` also gets fast paths:
+  identical objects are equal, and objects with different hashes are not.
+
+  The methods compare the same fields as the generated ones would, but do
+  not depend on them: `@dataclass` keeps an `__eq__` and `__hash__` which a
+  class already defines, so this can also be applied before `@dataclass`
+  runs, e.g. from `__init_subclass__`.
+  """
+  def __hash__(self: Any) -> int:
+    value = self.__dict__.get('_hash')
+    if value is None:
+      names, _ = _field_names(self.__class__)
+      value = self.__dict__['_hash'] = hash(
+        tuple(getattr(self, name) for name in names))
+    return value
+
+  def __eq__(self: Any, other: Any) -> Any:
+    if self is other:
+      return True
+    if other.__class__ is not self.__class__:
+      return NotImplemented
+    if hash(self) != hash(other):
+      return False
+    _, names = _field_names(self.__class__)
+    # Like tuple comparison, which the generated __eq__ uses.
+    return all(a is b or a == b for a, b in zip(
+      (getattr(self, name) for name in names),
+      (getattr(other, name) for name in names)))
+
+  cls.__hash__ = __hash__ # type: ignore
+  cls.__eq__ = __eq__ # type: ignore
+  return cls
@@ -0,0 +1,200 @@
+"""Loading and saving many files in parallel.
+
+Decoding documents is pure-Python work, so loading a corpus in one process
+uses one core. The functions here fan the work out over a process pool:
+
+  - items are grouped into chunks, and each chunk is one task, which keeps the
+    per-task overhead low for small files,
+  - at most `max_in_flight` chunks are submitted at a time, so a slow consumer
+    does not make results pile up in memory,
+  - results are yielded in input order, or as soon as they are ready,
+  - an item which fails does not fail its chunk: its result carries the error
+    instead.
+"""
+
+import os
+import traceback
+
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Deque, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .document import Document, load_document, save_document
+from .extraction import Extraction, load_extraction, save_extraction
+from .targets import Targets, load_targets
+
+
+I = TypeVar('I')
+R = TypeVar('R')
+
+
+@dataclass(frozen=True)
+class TaskResult(Generic[I, R]):
+  """The outcome of one item.
+
+  Attributes:
+    item: The input item, e.g. a path.
+    value: The result, if the item succeeded.
+    error: The formatted exception, if the item failed.
+  """
+  item: I
+  value: Optional[R] = None
+  error: Optional[str] = None
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+
+def _run_chunk(
+  function: Callable[[I], R],
+  chunk: List[I],
+) -> List[TaskResult[I, R]]:
+  results: List[TaskResult[I, R]] = []
+  for item in chunk:
+    try:
+      results.append(TaskResult(item, function(item)))
+    except Exception:
+      results.append(TaskResult(item, error=traceback.format_exc()))
+  return results
+
+
+def parallel_map(
+  function: Callable[[I], R],
+  items: Iterable[I],
+  max_workers: Optional[int] = None,
+  chunk_size: int = 1,
+  ordered: bool = True,
+  max_in_flight: Optional[int] = None,
+  executor: Optional[Executor] = None,
+) -> Iterator[TaskResult[I, R]]:
+  """Applies function to items in a process pool.
+
+  Args:
+    function: A picklable function, i.e. one defined at module level.
+    items: The inputs. These are consumed lazily.
+    max_workers: The pool size. Defaults to the number of CPUs.
+    chunk_size: How many items to send to a worker at a time.
+    ordered: Yield results in input order. Otherwise results are yielded as
+      soon as their chunk is done.
+    max_in_flight: How many chunks may be submitted and not yet yielded at a
+      time. Defaults to twice max_workers, or twice the number of CPUs.
+    executor: Use this executor instead of starting a new process pool.
+
+  Yields:
+    A TaskResult for every item.
+  """
+  if chunk_size < 1:
+    raise ValueError('chunk_size must be positive')
+  if executor is None:
+    with ProcessPoolExecutor(max_workers) as pool:
+      yield from parallel_map(
+        function, items, max_workers, chunk_size, ordered, max_in_flight,
+        pool)
+    return
+  if max_in_flight is None:
+    max_in_flight = 2 * (max_workers or os.cpu_count() or 1)
+  max_in_flight = max(1, max_in_flight)
+
+  iterator = iter(items)
+  def submit() -> Optional[Future]:
+    chunk = list(islice(iterator, chunk_size))
+    return executor.submit(_run_chunk, function, chunk) if chunk else None # type: ignore
+
+  pending: Deque[Future] = deque()
+  for _ in range(max_in_flight):
+    future = submit()
+    if future is None:
+      break
+    pending.append(future)
+
+  while pending:
+    if ordered:
+      done = [pending.popleft()]
+    else:
+      finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+      done = [f for f in pending if f in finished]
+      for future in done:
+        pending.remove(future)
+    for future in done:
+      yield from future.result()
+      following = submit()
+      if following is not None:
+        pending.append(following)
+
+
+def load_documents(
+  paths: Iterable[Path],
+  max_workers: Optional[int] = None,
+  chunk_size: int = 1,
+  ordered: bool = True,
+  max_in_flight: Optional[int] = None,
+) -> Iterator[TaskResult[Path, Document]]:
+  """`load_document` for each path, in parallel. See `parallel_map`."""
+  return parallel_map(
+    load_document, paths, max_workers, chunk_size, ordered, max_in_flight)
+
+
+def load_extractions(
+  paths: Iterable[Path],
+  max_workers: Optional[int] = None,
+  chunk_size: int = 1,
+  ordered: bool = True,
+  max_in_flight: Optional[int] = None,
+) -> Iterator[TaskResult[Path, Extraction]]:
+  """`load_extraction` for each path, in parallel. See `parallel_map`."""
+  return parallel_map(
+    load_extraction, paths, max_workers, chunk_size, ordered, max_in_flight)
+
+
+def load_targets_files(
+  paths: Iterable[Path],
+  max_workers: Optional[int] = None,
+  chunk_size: int = 1,
+  ordered: bool = True,
+  max_in_flight: Optional[int] = None,
+) -> Iterator[TaskResult[Path, Targets]]:
+  """`load_targets` for each path, in parallel. See `parallel_map`."""
+  return parallel_map(
+    load_targets, paths, max_workers, chunk_size, ordered, max_in_flight)
+
+
+def _save_document(item: Tuple[Document, Path]) -> None:
+  save_document(*item)
+
+
+def _save_extraction(item: Tuple[Extraction, Path]) -> None:
+  save_extraction(*item)
+
+
+def save_documents(
+  items: Iterable[Tuple[Document, Path]],
+  max_workers: Optional[int] = None,
+  chunk_size: int = 1,
+  ordered: bool = True,
+  max_in_flight: Optional[int] = None,
+) -> Iterator[TaskResult[Tuple[Document, Path], None]]:
+  """`save_document` for each (document, path), in parallel.
+
+  The results must be consumed for the work to happen.
+  """
+  return parallel_map(
+    _save_document, items, max_workers, chunk_size, ordered, max_in_flight)
+
+
+def save_extractions(
+  items: Iterable[Tuple[Extraction, Path]],
+  max_workers: Optional[int] = None,
+  chunk_size: int = 1,
+  ordered: bool = True,
+  max_in_flight: Optional[int] = None,
+) -> Iterator[TaskResult[Tuple[Extraction, Path], None]]:
+  """`save_extraction` for each (extraction, path), in parallel.
+
+  The results must be consumed for the work to happen.
+  """
+  return parallel_map(
+    _save_extraction, items, max_workers, chunk_size, ordered, max_in_flight)
@@ -0,0 +1,150 @@
+"""Sharing a document between processes through shared memory.
+
+`SharedDocument.publish` writes a document in the binary document format (see
+`binary_format`) into a `multiprocessing.shared_memory` block. Other processes
+`attach` to the block by name and read the document through an `EntityStore`
+whose columns are read-only NumPy arrays over the shared memory, so the
+geometry and text of the document exist once per host rather than once per
+process.
+
+Lifecycle: the publishing process owns the block. Every process, including
+the owner, calls `detach` when done with the document, and the owner then
+calls `unlink` to free the block. Used as a context manager, a SharedDocument
+detaches on exit, and the owner also unlinks.
+"""
+
+import threading
+
+from io import BytesIO
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from types import TracebackType
+from typing import Any, Optional, Tuple, Type
+
+from .binary_format import read_binary_document, write_binary_document
+from .document import Document
+from .entity_store import EntityStore, EntityView
+from .typing_utils import unwrap
+
+
+_register_lock = threading.Lock()
+
+
+def _attach_untracked(name: str) -> SharedMemory:
+  """Opens an existing block without registering it with the resource
+  tracker.
+
+  The tracker unlinks the blocks registered with it when the processes using
+  it exit, so only the publisher may register a block. Attachers in the
+  publisher's process and its forked children share its tracker, so
+  registering and then unregistering would drop the publisher's registration
+  as well.
+  """
+  try:
+    return SharedMemory(name, track=False) # type: ignore
+  except TypeError:
+    # Before Python 3.13 attaching always registers the block, so skip the
+    # registration in this thread for the duration of the call.
+    pass
+  with _register_lock:
+    register = resource_tracker.register
+    attaching = threading.get_ident()
+    def register_other(resource: str, rtype: str) -> Any:
+      # Other threads, e.g. publishing ones, keep registering their blocks.
+      if rtype != 'shared_memory' or threading.get_ident() != attaching:
+        return register(resource, rtype)
+    resource_tracker.register = register_other # type: ignore
+    try:
+      return SharedMemory(name)
+    finally:
+      resource_tracker.register = register # type: ignore
+
+
+class SharedDocument:
+  """A document in a shared memory block.
+
+  Attributes:
+    name: The name of the shared memory block, which other processes pass to
+      `attach`.
+    owner: Whether this process published the document, and so must unlink
+      it.
+  """
+
+  def __init__(self, memory: SharedMemory, owner: bool):
+    self._memory = memory
+    self.name = memory.name
+    self.owner = owner
+    self._buffer: Optional[memoryview] = unwrap(memory.buf).toreadonly()
+    self._store: Optional[EntityStore] = read_binary_document(self._buffer)
+
+  @staticmethod
+  def publish(
+    document: Document,
+    name: Optional[str] = None,
+  ) -> 'SharedDocument':
+    """Copies a document into a new shared memory block.
+
+    Args:
+      document: The document.
+      name: The name of the block. By default a unique name is generated.
+    """
+    f = BytesIO()
+    write_binary_document(EntityStore.from_document(document), f)
+    with f.getbuffer() as data:
+      memory = SharedMemory(name, create=True, size=len(data))
+      unwrap(memory.buf)[:len(data)] = data
+    return SharedDocument(memory, owner=True)
+
+  @staticmethod
+  def attach(name: str) -> 'SharedDocument':
+    """Attaches to a document published by another process."""
+    return SharedDocument(_attach_untracked(name), owner=False)
+
+  @property
+  def store(self) -> EntityStore:
+    if self._store is None:
+      raise ValueError(f'shared document {self.name} is detached')
+    return self._store
+
+  @property
+  def entities(self) -> Tuple[EntityView, ...]:
+    """Views of the top-level entities. See `EntityStore.entities`."""
+    return self.store.entities
+
+  def to_document(self) -> Document:
+    """Materializes the document in this process's memory."""
+    return self.store.to_document()
+
+  def detach(self) -> None:
+    """Stops using the shared memory in this process.
+
+    Any views or arrays obtained from `store` must be released first.
+    Materialized entities stay valid.
+    """
+    if self._buffer is None:
+      return
+    self._store = None
+    self._buffer.release()
+    self._buffer = None
+    self._memory.close()
+
+  def unlink(self) -> None:
+    """Detaches, and frees the shared memory block. Only for the owner."""
+    if not self.owner:
+      raise ValueError('only the publishing process may unlink a document')
+    self.detach()
+    self._memory.unlink()
+
+  def __enter__(self) -> 'SharedDocument':
+    return self
+
+  def __exit__(
+    self,
+    exc_type: Optional[Type[BaseException]],
+    exc_value: Optional[BaseException],
+    traceback: Optional[TracebackType],
+  ) -> None:
+    if self.owner:
+      self.unlink()
+    else:
+      self.detach()
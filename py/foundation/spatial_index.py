@@ -0,0 +1,215 @@
+"""Spatial indexes over entities.
+
+The R-tree here is static: it is bulk-loaded once with Sort-Tile-Recursive
+(STR) packing and then only queried, which matches how documents are used.
+"""
+
+import heapq
+
+from math import ceil, sqrt
+from typing import Callable, Dict, Generic, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from .entity import Entity
+from .geometry import BBox
+
+
+T = TypeVar('T')
+E = TypeVar('E', bound=Entity)
+
+
+# A node entry is (x0, x1, y0, y1, payload). In leaves the payload is an item
+# index; in inner nodes it is the list of child entries.
+_Entry = Tuple[float, float, float, float, object]
+
+
+def _bounds(entries: Sequence[_Entry]) -> Tuple[float, float, float, float]:
+  return (
+    min(e[0] for e in entries),
+    max(e[1] for e in entries),
+    min(e[2] for e in entries),
+    max(e[3] for e in entries))
+
+
+def _str_pack(entries: List[_Entry], capacity: int) -> List[List[_Entry]]:
+  """Groups entries into nodes of at most `capacity` entries using STR."""
+  node_count = ceil(len(entries) / capacity)
+  slice_count = ceil(sqrt(node_count))
+  slice_size = slice_count * capacity
+  entries = sorted(entries, key=lambda e: e[0] + e[1])
+  nodes: List[List[_Entry]] = []
+  for s in range(0, len(entries), slice_size):
+    vertical_slice = sorted(
+      entries[s:s + slice_size], key=lambda e: e[2] + e[3])
+    for n in range(0, len(vertical_slice), capacity):
+      nodes.append(vertical_slice[n:n + capacity])
+  return nodes
+
+
+def _gap(a0: float, a1: float, b0: float, b1: float) -> float:
+  """A lower bound for the `BBox.distance` gap along one axis."""
+  return max(0, b0 - a1, a0 - b1)
+
+
+class RTree(Generic[T]):
+  """A static, STR bulk-loaded R-tree mapping bounding boxes to values."""
+
+  def __init__(
+    self,
+    items: Sequence[Tuple[BBox, T]],
+    node_capacity: int = 16,
+  ):
+    if node_capacity < 2:
+      raise ValueError('R-tree nodes must hold at least 2 entries')
+    self.bboxes = tuple(bbox for bbox, _ in items)
+    self.values = tuple(value for _, value in items)
+    level: List[_Entry] = [
+      (b.ix.a, b.ix.b, b.iy.a, b.iy.b, i) for i, b in enumerate(self.bboxes)]
+    while len(level) > node_capacity:
+      level = [_bounds(node) + (node,)
+               for node in _str_pack(level, node_capacity)]
+    self._root = level
+    self._height = 0
+    node = level
+    while node and not isinstance(node[0][4], int):
+      node = node[0][4] # type: ignore
+      self._height += 1
+
+  def __len__(self) -> int:
+    return len(self.values)
+
+  def _search(
+    self,
+    bbox: BBox,
+    accept: Callable[[BBox], bool],
+  ) -> Iterator[int]:
+    qx0, qx1, qy0, qy1 = bbox.ix.a, bbox.ix.b, bbox.iy.a, bbox.iy.b
+    stack = [(self._root, self._height)]
+    while stack:
+      node, depth = stack.pop()
+      for x0, x1, y0, y1, payload in node:
+        if x1 < qx0 or qx1 < x0 or y1 < qy0 or qy1 < y0:
+          continue
+        if depth:
+          stack.append((payload, depth - 1)) # type: ignore
+        elif accept(self.bboxes[payload]): # type: ignore
+          yield payload # type: ignore
+
+  def search_indices(self, bbox: BBox, contained: bool = False) -> List[int]:
+    """Indices of items intersecting (or contained in) bbox, in item order."""
+    accept = bbox.contains_bbox if contained else bbox.intersects_bbox
+    return sorted(self._search(bbox, accept))
+
+  def search(self, bbox: BBox, contained: bool = False) -> Tuple[T, ...]:
+    """Values whose bboxes intersect bbox.
+
+    Args:
+      bbox: The query region.
+      contained: If true, only return values whose bboxes lie inside bbox.
+    """
+    return tuple(self.values[i] for i in self.search_indices(bbox, contained))
+
+  def nearest_indices(
+    self,
+    bbox: BBox,
+    k: int = 1,
+    max_distance: Optional[float] = None,
+  ) -> List[Tuple[float, int]]:
+    """The k items closest to bbox as (distance, index) pairs.
+
+    Distances are `BBox.distance`.
+    """
+    qx0, qx1, qy0, qy1 = bbox.ix.a, bbox.ix.b, bbox.iy.a, bbox.iy.b
+    # Heap entries are (distance, is_node, tiebreak, payload, depth). Items
+    # sort before nodes at equal distance so that ties resolve early.
+    heap: List[Tuple[float, int, int, object, int]] = []
+    counter = 0
+    def push_node(node: List[_Entry], depth: int) -> None:
+      nonlocal counter
+      for x0, x1, y0, y1, payload in node:
+        if depth:
+          d = sqrt(_gap(qx0, qx1, x0, x1)**2 + _gap(qy0, qy1, y0, y1)**2)
+          counter += 1
+          heapq.heappush(heap, (d, 1, counter, payload, depth - 1))
+        else:
+          i: int = payload # type: ignore
+          d = BBox.distance(bbox, self.bboxes[i])
+          heapq.heappush(heap, (d, 0, i, i, 0))
+    push_node(self._root, self._height)
+    result: List[Tuple[float, int]] = []
+    while heap and len(result) < k:
+      d, is_node, _, payload, depth = heapq.heappop(heap)
+      if max_distance is not None and d > max_distance:
+        break
+      if is_node:
+        push_node(payload, depth) # type: ignore
+      else:
+        result.append((d, payload)) # type: ignore
+    return result
+
+  def nearest(
+    self,
+    bbox: BBox,
+    k: int = 1,
+    max_distance: Optional[float] = None,
+  ) -> Tuple[Tuple[float, T], ...]:
+    """The k values closest to bbox, with their distances, nearest first."""
+    return tuple((d, self.values[i])
+                 for d, i in self.nearest_indices(bbox, k, max_distance))
+
+
+class EntityIndex:
+  """Region and nearest-neighbour queries over a collection of entities.
+
+  One R-tree is built over all entities, and one more per entity type that is
+  queried with `entity_type`, lazily on first use. Type filtering follows
+  `isinstance`, like `Document.filter_entities`.
+  """
+
+  def __init__(self, entities: Sequence[Entity], node_capacity: int = 16):
+    self.entities = tuple(entities)
+    self.node_capacity = node_capacity
+    self._trees: Dict[Optional[type], RTree[Entity]] = {}
+
+  def tree(self, entity_type: Optional[Type[Entity]] = None) -> RTree[Entity]:
+    if entity_type not in self._trees:
+      self._trees[entity_type] = RTree(
+        tuple((e.bbox, e) for e in self.entities
+              if entity_type is None or isinstance(e, entity_type)),
+        self.node_capacity)
+    return self._trees[entity_type]
+
+  def search(
+    self,
+    bbox: BBox,
+    entity_type: Optional[Type[E]] = None,
+    contained: bool = False,
+  ) -> Tuple[E, ...]:
+    """Entities intersecting bbox, in document order.
+
+    Args:
+      bbox: The query region.
+      entity_type: If given, only return entities of this type.
+      contained: If true, only return entities lying inside bbox.
+    """
+    return self.tree(entity_type).search(bbox, contained) # type: ignore
+
+  def nearest(
+    self,
+    bbox: BBox,
+    k: int = 1,
+    entity_type: Optional[Type[E]] = None,
+    max_distance: Optional[float] = None,
+  ) -> Tuple[E, ...]:
+    """The k entities nearest to bbox under `BBox.distance`."""
+    return tuple(e for _, e in self.nearest_with_distances(
+      bbox, k, entity_type, max_distance))
+
+  def nearest_with_distances(
+    self,
+    bbox: BBox,
+    k: int = 1,
+    entity_type: Optional[Type[E]] = None,
+    max_distance: Optional[float] = None,
+  ) -> Tuple[Tuple[float, E], ...]:
+    return self.tree(entity_type).nearest( # type: ignore
+      bbox, k, max_distance)
@@ -0,0 +1,186 @@
+"""Bulk spatial joins between two collections of boxes.
+
+A join partitions the plane into horizontal strips and runs an x-axis sweep
+line within each strip, so matching n boxes against m boxes costs roughly
+O((n + m) log(n + m) + k) instead of O(n * m) pairwise predicate calls.
+"""
+
+from dataclasses import dataclass
+from math import floor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .entity import Entity
+from .geometry import BBox, IntervalIndex
+from .typing_utils import assert_exhaustive
+
+
+@dataclass(frozen=True)
+class Intersects:
+  """Matches pairs whose boxes intersect."""
+  pass
+
+
+@dataclass(frozen=True)
+class Contains:
+  """Matches pairs where the left box contains the right box."""
+  pass
+
+
+@dataclass(frozen=True)
+class MinOverlap:
+  """Matches pairs where at least `fraction` of the right box lies inside the
+  left box.
+
+  The fraction is computed per axis with `Interval.contains_percentage_of` and
+  multiplied, so for non-degenerate boxes it is the fraction of area. It must
+  be positive: only intersecting pairs are ever considered, so a fraction of
+  0 would not match disjoint pairs either. Use `Intersects` instead.
+  """
+  fraction: float
+
+  def __post_init__(self) -> None:
+    if not self.fraction > 0:
+      raise ValueError(
+        f'MinOverlap fraction must be positive, not {self.fraction}')
+
+
+@dataclass(frozen=True)
+class WithinDistance:
+  """Matches pairs whose `BBox.distance` is at most `distance`."""
+  distance: float
+
+
+JoinPredicate = Union[Intersects, Contains, MinOverlap, WithinDistance]
+
+
+Boxes = Sequence[Union[BBox, Entity]]
+
+
+def overlap_fraction(left: BBox, right: BBox) -> float:
+  """The fraction of right lying inside left."""
+  return left.ix.contains_percentage_of(right.ix) * \
+         left.iy.contains_percentage_of(right.iy)
+
+
+def _as_bbox(x: Union[BBox, Entity]) -> BBox:
+  return x if isinstance(x, BBox) else x.bbox
+
+
+def _padding(predicate: JoinPredicate) -> float:
+  if isinstance(predicate, WithinDistance):
+    return predicate.distance
+  return 0
+
+
+def _score(
+  predicate: JoinPredicate,
+  left: BBox,
+  right: BBox,
+) -> Optional[float]:
+  """The pair's score if it satisfies predicate, or None otherwise."""
+  if isinstance(predicate, Intersects):
+    return overlap_fraction(left, right)
+  elif isinstance(predicate, Contains):
+    return overlap_fraction(left, right) \
+      if left.contains_bbox(right) else None
+  elif isinstance(predicate, MinOverlap):
+    fraction = overlap_fraction(left, right)
+    return fraction if fraction >= predicate.fraction else None
+  elif isinstance(predicate, WithinDistance):
+    distance = BBox.distance(left, right)
+    return distance if distance <= predicate.distance else None
+  else:
+    assert_exhaustive(predicate)
+
+
+def _candidate_pairs(
+  left: Sequence[BBox],
+  right: Sequence[BBox],
+) -> List[Tuple[int, int]]:
+  """All (i, j) such that left[i] intersects right[j]."""
+  if not left or not right:
+    return []
+  y_min = min(min(b.iy.a for b in left), min(b.iy.a for b in right))
+  y_max = max(max(b.iy.b for b in left), max(b.iy.b for b in right))
+  heights = sorted(b.height for b in (*left, *right))
+  strip_height = max(
+    heights[len(heights) // 2] * 2,
+    (y_max - y_min) / (len(left) + len(right)))
+  if strip_height <= 0:
+    strip_height = 1
+  strip_count = floor((y_max - y_min) / strip_height) + 1
+
+  def strip(y: float) -> int:
+    return min(strip_count - 1, max(0, floor((y - y_min) / strip_height)))
+
+  def partition(boxes: Sequence[BBox]) -> Dict[int, List[int]]:
+    strips: Dict[int, List[int]] = {}
+    for i, b in enumerate(boxes):
+      if not b.valid:
+        continue
+      for s in range(strip(b.iy.a), strip(b.iy.b) + 1):
+        strips.setdefault(s, []).append(i)
+    return strips
+
+  left_strips = partition(left)
+  right_strips = partition(right)
+  pairs = []
+  for s, left_ids in left_strips.items():
+    right_ids = right_strips.get(s)
+    if not right_ids:
+      continue
+    left_index = IntervalIndex([left[i].ix for i in left_ids])
+    right_index = IntervalIndex([right[j].ix for j in right_ids])
+    for li, rj in left_index.overlapping_pairs(right_index):
+      i, j = left_ids[li], right_ids[rj]
+      L, R = left[i], right[j]
+      if not L.iy.intersects_interval(R.iy):
+        continue
+      # Report each pair only from the strip where their y-overlap begins.
+      if strip(max(L.iy.a, R.iy.a)) == s:
+        pairs.append((i, j))
+  pairs.sort()
+  return pairs
+
+
+def scored_spatial_join(
+  left: Boxes,
+  right: Boxes,
+  predicate: JoinPredicate = Intersects(),
+) -> List[Tuple[int, int, float]]:
+  """Matches two collections of boxes or entities against each other.
+
+  Args:
+    left: BBoxes or Entities.
+    right: BBoxes or Entities.
+    predicate: The condition a (left, right) pair must satisfy.
+
+  Returns:
+    Sorted (i, j, score) triples for left[i] and right[j] satisfying the
+    predicate. The score is the `BBox.distance` for `WithinDistance`, and the
+    fraction of the right box lying inside the left box otherwise. Invalid
+    boxes never match.
+  """
+  left_bboxes = tuple(map(_as_bbox, left))
+  right_bboxes = tuple(map(_as_bbox, right))
+  padding = _padding(predicate)
+  # Invalid boxes stay as they are, so that padding does not make them valid.
+  candidates = _candidate_pairs(
+    tuple(BBox(b.ix.expanded(padding), b.iy.expanded(padding))
+          if b.valid else b for b in left_bboxes) if padding else left_bboxes,
+    right_bboxes)
+  result = []
+  for i, j in candidates:
+    score = _score(predicate, left_bboxes[i], right_bboxes[j])
+    if score is not None:
+      result.append((i, j, score))
+  return result
+
+
+def spatial_join(
+  left: Boxes,
+  right: Boxes,
+  predicate: JoinPredicate = Intersects(),
+) -> List[Tuple[int, int]]:
+  """Like `scored_spatial_join`, but only returns the (i, j) index pairs."""
+  return [(i, j) for i, j, _ in scored_spatial_join(left, right, predicate)]
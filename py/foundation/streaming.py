@@ -0,0 +1,147 @@
+"""Streaming access to documents too large to load at once.
+
+`iter_entities` reads a document's JSON in fixed-size chunks and decodes its
+top-level entities one at a time, so memory use is bounded by the largest
+single entity rather than by the document. See `json_writer` for the other
+direction.
+"""
+
+import json
+import re
+
+from pathlib import Path
+from typing import Any, Callable, Collection, Iterator, Optional, TextIO, Tuple, Type
+
+from .entity import Entity, entity_resolver
+from .geometry import FixedPoint, geometry_factories
+from .instantiate import compile_decoder
+
+
+_WHITESPACE = re.compile(r'\s*')
+
+
+class _ChunkedJSON:
+  """A cursor over JSON text which is read from a file as needed."""
+
+  def __init__(self, f: TextIO, chunk_size: int):
+    self.f = f
+    self.chunk_size = chunk_size
+    self.buffer = ''
+    self.pos = 0
+    self.decoder = json.JSONDecoder()
+
+  def _fill(self, size: int) -> bool:
+    """Reads up to size more characters. Returns False at end of file."""
+    chunk = self.f.read(size)
+    if not chunk:
+      return False
+    # Drop what has been consumed so the buffer does not grow with the file.
+    self.buffer = self.buffer[self.pos:] + chunk
+    self.pos = 0
+    return True
+
+  def peek(self) -> str:
+    """The next non-whitespace character, or '' at end of file."""
+    while True:
+      self.pos = _WHITESPACE.match(self.buffer, self.pos).end() # type: ignore
+      if self.pos < len(self.buffer):
+        return self.buffer[self.pos]
+      if not self._fill(self.chunk_size):
+        return ''
+
+  def expect(self, char: str) -> None:
+    found = self.peek()
+    if found != char:
+      raise ValueError(
+        f'expected {char!r} but found {found or "end of file"!r}')
+    self.pos += 1
+
+  def value(self) -> Any:
+    """Decodes the next JSON value."""
+    self.peek()
+    size = self.chunk_size
+    while True:
+      try:
+        value, end = self.decoder.raw_decode(self.buffer, self.pos)
+      except json.JSONDecodeError:
+        value, end = None, -1
+      # A number at the end of the buffer may continue in the next chunk.
+      if end != -1 and end < len(self.buffer):
+        self.pos = end
+        return value
+      if not self._fill(size):
+        if end != -1:
+          self.pos = end
+          return value
+        # Raises the decoding error for the complete remaining input.
+        self.decoder.raw_decode(self.buffer, self.pos)
+      # Values larger than the buffer are re-parsed after each read, so read
+      # geometrically more to keep that linear.
+      size *= 2
+
+
+def iter_entities(
+  path: Path,
+  entity_types: Optional[Collection[Type[Entity]]] = None,
+  intern_geometry: bool = False,
+  fixed_point: Optional[FixedPoint] = None,
+  chunk_size: int = 1 << 16,
+) -> Iterator[Entity]:
+  """Yields a document's top-level entities one at a time.
+
+  Args:
+    path: A document saved in the inline format. Documents saved by
+      reference cannot be streamed, since entities may refer to entries
+      anywhere in the file.
+    entity_types: If given, only entities which are instances of one of these
+      types are decoded and yielded. Other entities are skipped over as raw
+      JSON.
+    intern_geometry: See `load_fnd_doc_from_json`.
+    fixed_point: See `load_fnd_doc_from_json`.
+    chunk_size: How many characters to read from the file at a time.
+  """
+  wanted = tuple(entity_types) if entity_types is not None else None
+  decode = compile_decoder(
+    Entity,
+    base_classes={Entity},
+    derived_class_resolver=entity_resolver,
+    factories=geometry_factories(intern_geometry, fixed_point))
+  with path.open() as f:
+    reader = _ChunkedJSON(f, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+      return
+    while True:
+      key = reader.value()
+      reader.expect(':')
+      if key == 'entities':
+        yield from _iter_array(reader, decode, wanted)
+      elif key == 'entity_table':
+        raise ValueError(
+          f'{path} is saved by reference and cannot be streamed')
+      else:
+        reader.value()
+      if reader.peek() == '}':
+        return
+      reader.expect(',')
+
+
+def _iter_array(
+  reader: _ChunkedJSON,
+  decode: Callable[[Any], Entity],
+  wanted: Optional[Tuple[Type[Entity], ...]],
+) -> Iterator[Entity]:
+  reader.expect('[')
+  if reader.peek() == ']':
+    reader.pos += 1
+    return
+  while True:
+    raw = reader.value()
+    if not isinstance(raw, dict):
+      raise ValueError('entities saved by reference cannot be streamed')
+    if wanted is None or issubclass(entity_resolver(raw), wanted):
+      yield decode(raw)
+    if reader.peek() == ']':
+      reader.pos += 1
+      return
+    reader.expect(',')
@@ -2,7 +2,7 @@
 
 import json
 
-from dataclasses import asdict, dataclass, field as dc_field
+from dataclasses import dataclass, field as dc_field
 from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -10,7 +10,8 @@ from typing import Dict, List, Optional, Tuple
 from foundation.geometry import BBox
 
 from .extraction import Extraction, Field
-from .instantiate import instantiate
+from .instantiate import compile_decoder
+from .json_writer import write_json
 
 
 @dataclass
@@ -200,7 +201,7 @@ class Targets:
   """
   doc_targets: Tuple[DocTargets, ...]
   schema: TargetsSchema
-  output_config: OutputConfig = OutputConfig()
+  output_config: OutputConfig = dc_field(default_factory=OutputConfig)
   doc_tags: Dict[str, str] = dc_field(default_factory=dict)
   field_groups: Dict[str, FieldGroup] = dc_field(default_factory=dict)
 
@@ -279,12 +280,12 @@ def load_targets(path: Path,
 def load_targets_from_json(blob: Dict,
                            silent: bool = False) \
                              -> Targets:
-  return validate(instantiate(Targets, blob),
+  return validate(compile_decoder(Targets)(blob),
                   silent)
 
 
 def load_doc_targets_from_json(blob: Dict) -> DocTargets:
-  return instantiate(DocTargets, blob)
+  return compile_decoder(DocTargets)(blob)
 
 
 def load_schema(path: Path) -> TargetsSchema:
@@ -293,11 +294,11 @@ def load_schema(path: Path) -> TargetsSchema:
 
 
 def load_schema_from_json(blob: Dict) -> TargetsSchema:
-  return instantiate(TargetsSchema, blob)
+  return compile_decoder(TargetsSchema)(blob)
 
 
 def save_targets(targets: Targets, path: Path, silent: bool = False) -> None:
-  s = json.dumps(asdict(validate(targets, silent=silent)),
-                 indent=2, sort_keys=True)
+  targets = validate(targets, silent=silent)
   with path.open('w') as f:
-    f.write(s + '\n')
+    write_json(targets, f, indent=2, sort_keys=True)
+    f.write('\n')
@@ -0,0 +1,220 @@
+"""An inverted index over the text of a document's Words and Texts.
+
+Text is split into tokens, which are runs of word characters (`\\w+`), and
+each casefolded token maps to the places it occurs: (entity id, token
+position) pairs, where entity ids number the indexed entities in document
+order. Queries match whole tokens, so "Pay" matches "Net Pay:" but not
+"Payroll"; use a prefix query for that.
+"""
+
+import re
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple, Union
+
+from .entity import Entity, Text, Word
+
+try:
+  from re import _parser as sre_parse # type: ignore
+except ImportError: # pragma: no cover
+  # Before Python 3.11.
+  import sre_parse # type: ignore
+
+
+_TOKEN = re.compile(r'\w+')
+
+# (entity id, token position)
+Occurrence = Tuple[int, int]
+
+
+def tokenize(text: str) -> List[str]:
+  """The runs of word characters in text."""
+  return _TOKEN.findall(text)
+
+
+_TOKEN_STARTS = (
+  sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING, sre_parse.AT_BOUNDARY)
+
+
+def _required_literals(pattern: Pattern) -> List[Tuple[str, bool]]:
+  """Substrings which every match of pattern contains.
+
+  These are the runs of literal characters at the top level of the pattern.
+  Anything that is not a plain literal, e.g. a class, a branch or a
+  repetition, ends a run, so the result is conservative. Each run comes with
+  whether it follows `^`, `\\A` or `\\b`, so that a match of it starting
+  with a word character also starts a token.
+  """
+  try:
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+  except Exception:
+    return []
+  literals: List[Tuple[str, bool]] = []
+  run: List[str] = []
+  # With re.ASCII, `\\b` may fall inside a token of non-ASCII characters.
+  starts = _TOKEN_STARTS[:2] if pattern.flags & re.ASCII else _TOKEN_STARTS
+  anchored = False
+  for op, value in parsed:
+    if op == sre_parse.LITERAL:
+      run.append(chr(value))
+    else:
+      literals.append((''.join(run), anchored))
+      run = []
+      anchored = op == sre_parse.AT and value in starts
+  literals.append((''.join(run), anchored))
+  return [(literal, anchored) for literal, anchored in literals if literal]
+
+
+class TextIndex:
+  """Exact, case-insensitive, prefix, phrase and regex search over text.
+
+  Every Word and Text of the given entities is indexed; the index itself is
+  built once in time linear in the amount of text.
+
+  Attributes:
+    entities: The indexed entities. Entity ids index into this.
+  """
+
+  def __init__(self, entities: Iterable[Entity]):
+    self.entities: Tuple[Entity, ...] = tuple(
+      e for e in entities if isinstance(e, (Word, Text)))
+    self._texts: List[str] = [e.text for e in self.entities] # type: ignore
+    self._tokens: List[List[str]] = [tokenize(t) for t in self._texts]
+    self._postings: Dict[str, List[Occurrence]] = {}
+    for entity_id, tokens in enumerate(self._tokens):
+      for position, token in enumerate(tokens):
+        self._postings.setdefault(token.casefold(), []).append(
+          (entity_id, position))
+    self._vocabulary = sorted(self._postings)
+
+  def _prefixed(self, prefix: str) -> List[str]:
+    """The folded tokens starting with a folded prefix."""
+    start = bisect_left(self._vocabulary, prefix)
+    end = start
+    while end < len(self._vocabulary) and \
+        self._vocabulary[end].startswith(prefix):
+      end += 1
+    return self._vocabulary[start:end]
+
+  def occurrences(
+    self,
+    query: str,
+    case_sensitive: bool = False,
+    prefix: bool = False,
+  ) -> List[Occurrence]:
+    """Where the tokens of query occur consecutively.
+
+    Args:
+      query: A word or phrase. Only its tokens matter, so punctuation and
+        spacing are ignored.
+      case_sensitive: Match case exactly. Otherwise tokens are compared
+        casefolded.
+      prefix: The last token of query only needs to be a prefix of a token.
+
+    Returns:
+      The (entity id, position of the first token) of each occurrence, in
+      document order.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+      return []
+    folded = [t.casefold() for t in tokens]
+    last = len(tokens) - 1
+
+    if prefix:
+      last_tokens = self._prefixed(folded[last])
+    else:
+      last_tokens = [folded[last]]
+    # Start from the rarest exact token.
+    exact = range(last) if prefix else range(len(tokens))
+    anchor: Optional[int] = min(
+      exact, key=lambda i: len(self._postings.get(folded[i], ())),
+      default=None)
+
+    if anchor is None:
+      candidates = sorted(
+        occurrence for token in last_tokens
+        for occurrence in self._postings[token])
+      starts = [(e, p - last) for e, p in candidates]
+    else:
+      starts = [(e, p - anchor)
+                for e, p in self._postings.get(folded[anchor], ())]
+    result = []
+    for entity_id, start in starts:
+      if start < 0:
+        continue
+      entity_tokens = self._tokens[entity_id]
+      if start + len(tokens) > len(entity_tokens):
+        continue
+      if all(
+          _token_matches(entity_tokens[start + i], tokens[i], folded[i],
+                         case_sensitive, prefix and i == last)
+          for i in range(len(tokens))):
+        result.append((entity_id, start))
+    return result
+
+  def search(
+    self,
+    query: str,
+    case_sensitive: bool = False,
+    prefix: bool = False,
+  ) -> Tuple[Entity, ...]:
+    """The entities containing query. See `occurrences`."""
+    return self._entities(
+      entity_id for entity_id, _ in self.occurrences(
+        query, case_sensitive, prefix))
+
+  def search_regex(
+    self,
+    pattern: Union[str, Pattern],
+    flags: int = 0,
+  ) -> Tuple[Entity, ...]:
+    """The entities whose text the regular expression matches (`re.search`).
+
+    Only entities containing every literal part of the pattern are tried; the
+    literals are found with the index. Runs of word characters which start a
+    token, e.g. because they follow a space or `\\b`, are looked up as
+    prefixes in the sorted vocabulary; other runs may be in the middle of a
+    token, so the whole vocabulary is scanned for them.
+    """
+    compiled = re.compile(pattern, flags)
+    candidates: Optional[Set[int]] = None
+    for literal, anchored in _required_literals(compiled):
+      folded = literal.casefold()
+      for match in _TOKEN.finditer(folded):
+        run = match.group()
+        if not (anchored or match.start() > 0):
+          # The run may be part of a longer token in the text.
+          tokens = [token for token in self._vocabulary if run in token]
+        elif match.end() < len(folded):
+          tokens = [run] if run in self._postings else []
+        else:
+          tokens = self._prefixed(run)
+        run_ids = {entity_id for token in tokens
+                   for entity_id, _ in self._postings[token]}
+        candidates = run_ids if candidates is None else candidates & run_ids
+    ids: Iterable[int] = range(len(self.entities)) if candidates is None \
+      else sorted(candidates)
+    return self._entities(
+      i for i in ids if compiled.search(self._texts[i]))
+
+  def _entities(self, entity_ids: Iterable[int]) -> Tuple[Entity, ...]:
+    seen: Set[int] = set()
+    result = []
+    for entity_id in entity_ids:
+      if entity_id not in seen:
+        seen.add(entity_id)
+        result.append(self.entities[entity_id])
+    return tuple(result)
+
+
+def _token_matches(
+  token: str,
+  query: str,
+  folded_query: str,
+  case_sensitive: bool,
+  prefix: bool,
+) -> bool:
+  if not case_sensitive:
+    token, query = token.casefold(), folded_query
+  return token.startswith(query) if prefix else token == query
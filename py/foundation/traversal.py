@@ -0,0 +1,81 @@
+"""Iterative traversal of entity DAGs.
+
+`Entity.children` defines a DAG over a document's entities. The walkers here
+visit it without recursion, optionally breadth-first, and can stop descending
+below given entity types or past a given depth.
+"""
+
+from collections import deque
+from typing import Deque, Iterable, Iterator, Optional, Set, Tuple, Type, TypeVar
+
+from .entity import Entity
+
+
+E = TypeVar('E', bound=Entity)
+
+
+def walk_with_depths(
+  roots: Iterable[Entity],
+  breadth_first: bool = False,
+  prune: Tuple[Type[Entity], ...] = (),
+  max_depth: Optional[int] = None,
+  dedupe: bool = True,
+) -> Iterator[Tuple[int, Entity]]:
+  """Yields (depth, entity) for the roots and everything below them.
+
+  Args:
+    roots: The entities to start from, at depth 0.
+    breadth_first: Visit level by level instead of in depth-first pre-order.
+    prune: Entities of these types are visited, but not descended into. For
+      example `prune=(Text,)` stops above the Words of every Text.
+    max_depth: Entities deeper than this are not visited.
+    dedupe: Visit each entity once, even if it is reachable from several
+      parents (e.g. a Word shared by a Text and a Date). Entities are compared
+      by identity, which is cheap.
+  """
+  seen: Set[int] = set()
+  frontier: Deque[Tuple[int, Entity]] = deque(
+    (0, root) for root in roots)
+  if not breadth_first:
+    frontier.reverse()
+  pop = frontier.popleft if breadth_first else frontier.pop
+  while frontier:
+    depth, entity = pop()
+    if dedupe:
+      if id(entity) in seen:
+        continue
+      seen.add(id(entity))
+    yield depth, entity
+    if isinstance(entity, prune) or \
+        (max_depth is not None and depth >= max_depth):
+      continue
+    children = ((depth + 1, child) for child in entity.children)
+    if breadth_first:
+      frontier.extend(children)
+    else:
+      frontier.extend(reversed(tuple(children)))
+
+
+def walk(
+  roots: Iterable[Entity],
+  breadth_first: bool = False,
+  prune: Tuple[Type[Entity], ...] = (),
+  max_depth: Optional[int] = None,
+  dedupe: bool = True,
+) -> Iterator[Entity]:
+  """Like `walk_with_depths`, without the depths."""
+  for _, entity in walk_with_depths(
+      roots, breadth_first, prune, max_depth, dedupe):
+    yield entity
+
+
+def find(
+  roots: Iterable[Entity],
+  entity_type: Type[E],
+  prune: Tuple[Type[Entity], ...] = (),
+  max_depth: Optional[int] = None,
+) -> Iterator[E]:
+  """Yields each distinct entity of the given type at or below the roots."""
+  for entity in walk(roots, prune=prune, max_depth=max_depth):
+    if isinstance(entity, entity_type):
+      yield entity
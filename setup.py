@@ -22,5 +22,6 @@ setup(
     package_dir={'': 'py'},
     install_requires=[
         'mypy==0.790',
+        'numpy',
     ]
 )
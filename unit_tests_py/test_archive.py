@@ -0,0 +1,88 @@
+from pathlib import Path
+from threading import Thread
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foundation.archive import ArchiveWriter, DocumentArchive, save_archive
+from foundation.document import Document
+from foundation.entity import Word
+from foundation.geometry import BBox, Point
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document(name: str) -> Document:
+  word = Word(unwrap(BBox.spanning((Point(0, 0.5), Point(5, 1)))), name)
+  return Document.from_entities((word,), name)
+
+
+class TestArchive(TestCase):
+
+  def test_random_access(self) -> None:
+    docs = [sample_document(f'doc{i}') for i in range(5)]
+    with TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'docs.fnda'
+      save_archive(path, docs[:3])
+      with DocumentArchive(path) as archive:
+        assert archive.names == ['doc0', 'doc1', 'doc2']
+        assert archive['doc1'] == docs[1]
+        assert archive.get('doc3') is None
+
+        with ArchiveWriter(path, compress=True) as writer:
+          writer.add(docs[3])
+          writer.add(docs[4])
+        # Readers keep seeing the index they read until they refresh.
+        assert 'doc4' not in archive
+        archive.refresh()
+        assert archive['doc4'] == docs[4]
+        assert archive['doc0'] == docs[0]
+        assert list(archive) == docs
+
+      with self.assertRaises(ValueError):
+        save_archive(path, [Document(docs[0].bbox)])
+
+  def test_interrupted_append(self) -> None:
+    docs = [sample_document(f'doc{i}') for i in range(3)]
+    with TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'docs.fnda'
+      save_archive(path, docs[:1])
+
+      writer = ArchiveWriter(path)
+      writer.add(docs[1])
+      # Readers are not blocked by an open writer.
+      with DocumentArchive(path) as archive:
+        assert archive.names == ['doc0']
+      # The writer dies without committing, which releases its locks.
+      writer.f.close()
+      writer._writer_lock.close()
+      with DocumentArchive(path) as archive:
+        assert list(archive) == docs[:1]
+
+      save_archive(path, docs[2:])
+      with DocumentArchive(path) as archive:
+        assert list(archive) == [docs[0], docs[2]]
+
+  def test_writers_take_turns(self) -> None:
+    docs = [sample_document(f'doc{i}') for i in range(4)]
+    with TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'docs.fnda'
+      first = ArchiveWriter(path)
+      first.add(docs[0])
+      second = Thread(target=save_archive, args=(path, docs[1:2]))
+      second.start()
+      # The second writer waits rather than writing over the first.
+      second.join(0.2)
+      assert second.is_alive()
+      first.add(docs[2])
+      first.close()
+      second.join()
+      with DocumentArchive(path) as archive:
+        assert list(archive) == [docs[0], docs[2], docs[1]]
+
+      with self.assertRaises(RuntimeError):
+        with ArchiveWriter(path) as writer:
+          writer.add(docs[3])
+          raise RuntimeError()
+      with DocumentArchive(path) as archive:
+        assert 'doc3' not in archive
+        assert list(archive) == [docs[0], docs[2], docs[1]]
@@ -0,0 +1,118 @@
+from unittest import TestCase
+import random
+
+import numpy as np
+
+from foundation.bbox_array import BBoxArray, distance_matrix, pairs_within_distance
+from foundation.geometry import BBox, FixedPoint, Interval, Point
+
+
+def random_bbox(rng: random.Random) -> BBox:
+  x, y = rng.uniform(0, 100), rng.uniform(0, 100)
+  return BBox(Interval(x, x + rng.choice((0, rng.uniform(0, 20)))),
+              Interval(y, y + rng.choice((0, rng.uniform(0, 20)))))
+
+
+class TestBBoxArray(TestCase):
+
+  def test_matches_scalar_methods(self) -> None:
+    rng = random.Random(0)
+    boxes = [random_bbox(rng) for _ in range(200)]
+    array = BBoxArray.from_bboxes(boxes)
+    assert array.to_bboxes() == tuple(boxes)
+
+    for _ in range(20):
+      other = random_bbox(rng)
+      p = Point(rng.uniform(0, 100), rng.uniform(0, 100))
+      assert array.contains(p).tolist() == [p in b for b in boxes]
+      assert array.intersects(other).tolist() == \
+        [b.intersects_bbox(other) for b in boxes]
+      assert array.contains_bbox(other).tolist() == \
+        [b.contains_bbox(other) for b in boxes]
+      assert array.contained_in(other).tolist() == \
+        [other.contains_bbox(b) for b in boxes]
+
+      percentages = array.percentages_overlapping(other)
+      for i, b in enumerate(boxes):
+        expected = b.percentages_overlapping(other)
+        if expected is None:
+          assert percentages.x0[i] != percentages.x0[i] # NaN
+        else:
+          assert percentages[i] == expected
+
+    assert array.area.tolist() == [b.area for b in boxes]
+    cx, cy = array.center
+    assert list(zip(cx.tolist(), cy.tolist())) == \
+      [(b.center.x, b.center.y) for b in boxes]
+    assert array.union() == BBox.union(boxes)
+
+  def test_empty(self) -> None:
+    array = BBoxArray.from_bboxes([])
+    assert len(array) == 0
+    assert array.union() is None
+    assert array.intersects(BBox(Interval(0, 1), Interval(0, 1))).tolist() == []
+
+  def test_distances(self) -> None:
+    rng = random.Random(1)
+    boxes = [random_bbox(rng) for _ in range(300)]
+    array = BBoxArray.from_bboxes(boxes)
+
+    matrix = distance_matrix(array)
+    assert matrix.tolist() == \
+      [[BBox.distance(a, b) for b in boxes] for a in boxes]
+    assert array.distances_to(boxes[0]).tolist() == \
+      [BBox.distance(b, boxes[0]) for b in boxes]
+
+    for cutoff in (0, 2.5, 10):
+      i, j, d = pairs_within_distance(array, cutoff)
+      assert list(zip(i.tolist(), j.tolist(), d.tolist())) == [
+        (a, b, BBox.distance(boxes[a], boxes[b]))
+        for a in range(len(boxes)) for b in range(a + 1, len(boxes))
+        if BBox.distance(boxes[a], boxes[b]) <= cutoff]
+
+  def test_fixed_point(self) -> None:
+    rng = random.Random(2)
+    fixed_point = FixedPoint(100)
+    boxes = [random_bbox(rng) for _ in range(100)]
+    quantized = [fixed_point.quantized_bbox(b) for b in boxes]
+    array = BBoxArray.from_bboxes(quantized, np.int32)
+
+    assert array.dtype == np.int32
+    assert BBoxArray.from_bboxes(quantized).dtype == np.float64
+    assert array.to_bboxes() == tuple(quantized)
+    assert BBoxArray.from_bboxes(boxes).quantized(fixed_point).to_bboxes() == \
+      tuple(quantized)
+    assert distance_matrix(array).tolist() == \
+      [[BBox.distance(a, b) for b in quantized] for a in quantized]
+    assert array.intersects(quantized[0]).tolist() == \
+      [b.intersects_bbox(quantized[0]) for b in quantized]
+
+  def test_fixed_point_overflow(self) -> None:
+    fixed_point = FixedPoint(1000)
+    far = BBox(Interval(0, 3e6), Interval(0, 1))
+    with self.assertRaises(OverflowError):
+      BBoxArray.from_bboxes([far]).quantized(fixed_point)
+    with self.assertRaises(OverflowError):
+      BBoxArray.from_bboxes([fixed_point.quantized_bbox(far)], np.int32)
+    array = BBoxArray.from_bboxes([fixed_point.quantized_bbox(far)], np.int64)
+    assert array.x1.tolist() == [3 * 10 ** 9]
+    near = BBox(Interval(-2e6, 2e6), Interval(0, 1))
+    assert BBoxArray.from_bboxes([near]).quantized(fixed_point).x0.tolist() == \
+      [-2 * 10 ** 9]
+
+  def test_fixed_point_page(self) -> None:
+    # A letter-size page at 300 dpi, at resolution 100.
+    fixed_point = FixedPoint(100)
+    page = fixed_point.quantized_bbox(
+      BBox(Interval(0, 8.5 * 300), Interval(0, 11 * 300)))
+    word = fixed_point.quantized_bbox(
+      BBox(Interval(10, 20), Interval(30, 31)))
+    for dtype in (None, np.int32):
+      array = BBoxArray.from_bboxes([page, word], dtype)
+      assert array.area.tolist() == [page.area, word.area]
+      assert page.area == 84150000000
+      cx, cy = array.center
+      assert list(zip(cx.tolist(), cy.tolist())) == \
+        [(page.center.x, page.center.y), (word.center.x, word.center.y)]
+      assert distance_matrix(array).tolist() == \
+        [[BBox.distance(a, b) for b in (page, word)] for a in (page, word)]
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Type
+from unittest import TestCase
+import json
+
+from foundation.binary_format import open_binary_document, read_binary_document, save_binary_document, write_binary_document
+from foundation.document import Document, dump_to_json, load_fnd_doc_from_json
+from foundation.entity import Date, Entity, Table, TableCell, TableRow, Text, Word, entity_resolver
+from foundation.entity_store import EntityStore
+from foundation.geometry import BBox, Interval, Point
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document() -> Document:
+  w1 = Word(unwrap(BBox.spanning((Point(0, 0.1), Point(5, 1)))), 'Jan')
+  w2 = Word(unwrap(BBox.spanning((Point(6, 0.1), Point(11, 1)))), '2020 €')
+  text = Text.from_words((w1, w2))
+  date = Date(text.bbox, text.text, (w1, w2), likeness_score=0.5)
+  cell = TableCell(text.bbox, (text,))
+  row = TableRow(text.bbox, (cell,))
+  table = Table(text.bbox, (row,))
+  return Document.from_entities((w1, w2, text, date, table), name='doc')
+
+
+class TestBinaryFormat(TestCase):
+
+  def test_round_trip(self) -> None:
+    doc = load_fnd_doc_from_json(json.loads(dump_to_json(sample_document())))
+    with TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'doc.fndb'
+      save_binary_document(doc, path)
+      store = open_binary_document(path)
+      assert not store.geometry.x0.flags.writeable
+      assert store.view(3).likeness_score == 0.5
+      assert store.text(1) == '2020 €'
+      loaded = store.to_document()
+    assert loaded == doc
+    assert dump_to_json(loaded) == dump_to_json(doc)
+
+  def test_from_buffer(self) -> None:
+    f = BytesIO()
+    write_binary_document(EntityStore.from_document(Document(
+      unwrap(BBox.spanning((Point(0, 0), Point(1, 1)))))), f)
+    assert read_binary_document(f.getvalue()).to_document().entities == ()
+    with self.assertRaises(ValueError):
+      read_binary_document(b'JSON' + f.getvalue()[4:])
+
+  def test_custom_types(self) -> None:
+    @dataclass(frozen=True)
+    class Marker(Entity):
+      label: str
+
+    def resolver(v: Any) -> Type[Entity]:
+      return Marker if v['type'] == 'Marker' else entity_resolver(v)
+
+    bbox = BBox(Interval(0, 10), Interval(0, 2))
+    marker = Marker(bbox, 'Marker', 'x')
+    doc = Document.from_entities((marker,))
+    f = BytesIO()
+    write_binary_document(EntityStore.from_document(doc), f)
+    with self.assertRaises(TypeError):
+      read_binary_document(f.getvalue())
+    loaded = read_binary_document(f.getvalue(), resolver).to_document()
+    assert loaded == doc
+    assert type(loaded.entities[0].bbox.ix.b) is int
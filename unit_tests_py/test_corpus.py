@@ -0,0 +1,42 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foundation.corpus import CorpusRecord, CorpusWriter, iter_corpus, iter_corpus_documents, save_corpus
+from foundation.document import Document
+from foundation.entity import Word
+from foundation.extraction import Extraction, ExtractionPoint
+from foundation.geometry import BBox, FixedPoint, Point
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document(name: str) -> Document:
+  word = Word(unwrap(BBox.spanning((Point(0, 0.5), Point(5, 1)))), name)
+  return Document.from_entities((word,), name)
+
+
+class TestCorpus(TestCase):
+
+  def test_round_trip(self) -> None:
+    docs = [sample_document(f'doc\n{i}') for i in range(5)]
+    extraction = Extraction((ExtractionPoint('f', docs[1].entities[0]),))
+    records = [CorpusRecord(docs[0]), CorpusRecord(docs[1], extraction)] + \
+      [CorpusRecord(doc) for doc in docs[2:]]
+    with TemporaryDirectory() as tmp:
+      for file_name in ('corpus.jsonl', 'corpus.jsonl.gz'):
+        path = Path(tmp) / file_name
+        save_corpus(path, records)
+        assert list(iter_corpus(path)) == records
+        assert list(iter_corpus_documents(path, {'doc\n3', 'doc\n4'})) == \
+          docs[3:]
+        fixed_point = FixedPoint(100)
+        quantized = list(iter_corpus_documents(
+          path, {'doc\n0'}, fixed_point=fixed_point))
+        assert quantized[0].entities[0].bbox == \
+          fixed_point.quantized_bbox(docs[0].entities[0].bbox)
+
+        with CorpusWriter(path, append=True) as writer:
+          writer.write(sample_document('extra'))
+        assert [d.name for d in iter_corpus_documents(path, {'extra'})] == \
+          ['extra']
@@ -1,8 +1,11 @@
+from typing import cast
 from unittest import TestCase
+import json
+import pickle
 
-from foundation.document import Document
+from foundation.document import Document, dump_to_json, load_fnd_doc_from_json
 from foundation.entity import Word, Page, Text
-from foundation.geometry import BBox, Point
+from foundation.geometry import BBox, FixedPoint, Point
 
 from foundation.typing_utils import unwrap
 
@@ -45,3 +48,95 @@ class TestDoc(TestCase):
 
     assert set(doc.filter_entities(Page)) == set((p1,))
     assert set(doc.filter_entities(Word)) == set((w1, w2))
+
+  def test_spatial_index(self) -> None:
+    words = tuple(
+      Word(unwrap(BBox.spanning((Point(x, y), Point(x + 3, y + 1)))), f'{x},{y}')
+      for x in range(0, 100, 5) for y in range(0, 100, 2))
+    p1 = Page(unwrap(BBox.spanning((Point(0, 0), Point(100, 100)))), 1)
+    doc = Document.from_entities(words + (p1,))
+
+    region = unwrap(BBox.spanning((Point(10, 10), Point(30, 20))))
+    assert doc.spatial_index.search(region) == tuple(
+      e for e in doc.entities if e.bbox.intersects_bbox(region))
+    assert doc.spatial_index.search(region, Word, contained=True) == tuple(
+      w for w in words if region.contains_bbox(w.bbox))
+    assert doc.spatial_index.search(region, Page) == (p1,)
+
+    query = unwrap(BBox.spanning((Point(41.5, 50.2), Point(41.6, 50.3))))
+    nearest = doc.spatial_index.nearest_with_distances(query, 5, Word)
+    expected = sorted((BBox.distance(query, w.bbox), i)
+                      for i, w in enumerate(words))[:5]
+    assert [d for d, _ in nearest] == [d for d, _ in expected]
+
+  def test_load_interned(self) -> None:
+    w1 = Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'hello')
+    w2 = Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), 'world')
+    doc = Document.from_entities((w1, w2, Text.from_words((w1, w2))))
+
+    loaded = load_fnd_doc_from_json(
+      json.loads(dump_to_json(doc)), intern_geometry=True)
+    assert loaded == doc
+    assert loaded.entities[0].bbox is \
+      cast(Text, loaded.entities[2]).words[0].bbox
+
+  def test_load_fixed_point(self) -> None:
+    w1 = Word(unwrap(BBox.spanning((Point(0, 0.125), Point(5.5, 1)))), 'hello')
+    doc = Document.from_entities((w1,))
+
+    fixed_point = FixedPoint(10)
+    loaded = load_fnd_doc_from_json(
+      json.loads(dump_to_json(doc)), fixed_point=fixed_point)
+    bbox = loaded.entities[0].bbox
+    assert (bbox.ix.a, bbox.ix.b, bbox.iy.a, bbox.iy.b) == (0, 55, 1, 10)
+    assert all(isinstance(x, int)
+               for x in (bbox.ix.a, bbox.ix.b, bbox.iy.a, bbox.iy.b))
+    assert fixed_point.dequantized_bbox(bbox) == \
+      unwrap(BBox.spanning((Point(0, 0.1), Point(5.5, 1))))
+
+  def test_load_by_reference(self) -> None:
+    w1 = Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'hello')
+    w2 = Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), 'world')
+    doc = Document.from_entities((w1, w2, Text.from_words((w1, w2))))
+
+    dumped = dump_to_json(doc, by_reference=True)
+    assert len(dumped) < len(dump_to_json(doc))
+    loaded = load_fnd_doc_from_json(json.loads(dumped))
+    assert loaded == doc
+    assert loaded.entities[0] is cast(Text, loaded.entities[2]).words[0]
+    assert loaded.entities[1] is cast(Text, loaded.entities[2]).words[1]
+
+  def test_pickle(self) -> None:
+    w1 = Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'hello')
+    w2 = Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), 'world')
+    doc = load_fnd_doc_from_json(json.loads(dump_to_json(
+      Document.from_entities((w1, w2, Text.from_words((w1, w2))), 'doc'))))
+    doc.median_line_height()
+
+    data = pickle.dumps(doc)
+    assert len(data) < len(pickle.dumps(json.loads(dump_to_json(doc))))
+    loaded = pickle.loads(data)
+    assert loaded == doc
+    assert loaded.entities[1] is cast(Text, loaded.entities[2]).words[1]
+    assert '_median_line_height' not in loaded.__dict__
+
+  def test_entity_index(self) -> None:
+    p0 = Page(unwrap(BBox.spanning((Point(0, 0), Point(20, 10)))), 0)
+    p1 = Page(unwrap(BBox.spanning((Point(0, 10), Point(20, 20)))), 1)
+    def word(x: float, y: float, text: str) -> Word:
+      return Word(unwrap(BBox.spanning((Point(x, y), Point(x + 2, y + 1)))),
+                  text)
+    w1, w2, w3, w4 = \
+      word(5, 12, 'b'), word(1, 12, 'a'), word(1, 2, 'c'), word(1, 9.5, 'd')
+    text = Text.from_words((w2, w1))
+    doc = Document.from_entities((p1, w1, w2, w3, p0, w4, text))
+
+    assert tuple(doc.filter_entities(Word)) == (w1, w2, w3, w4)
+    # Filtering by type does not assign entities to pages.
+    assert '_page_numbers' not in doc.entity_index.__dict__
+    assert doc.entity_index.pages == (p0, p1)
+    assert doc.entity_index.on_page(1, Word) == (w2, w1)
+    assert doc.entity_index.on_page(1) == (p1, w2, text, w1)
+    assert doc.entity_index.on_page(0, Word) == (w3, w4)
+    assert doc.entity_index.page_number(w4) == 0
+    assert doc.entity_index.on_page(2) == ()
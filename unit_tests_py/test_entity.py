@@ -1,9 +1,12 @@
+from dataclasses import dataclass
+from typing import Any, cast
 from unittest import TestCase
 import json
+import pickle
 
 from foundation.document import Document
-from foundation.entity import Word, Page, Text, Address, dump_to_json, load_entity_from_json
-from foundation.geometry import BBox, Point
+from foundation.entity import Word, Page, Text, Address, Entity, Number, dump_entity_table, dump_to_json, load_entity_from_json
+from foundation.geometry import BBox, Interval, Point
 
 from foundation.typing_utils import unwrap
 
@@ -30,3 +33,81 @@ class TestEntities(TestCase):
     json_str = dump_to_json(entity)
     recreation = load_entity_from_json(json.loads(json_str))
     self.assertEqual(recreation, entity)
+
+  def test_hash_and_digest(self) -> None:
+    def sample(text: str) -> Text:
+      return Text.from_words((
+        Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'hello'),
+        Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), text)))
+
+    t1, t2, t3 = sample('world'), sample('world'), sample('there')
+    assert hash(t1) == hash(t2) and t1 == t2
+    assert '_hash' in t1.__dict__
+    assert t1 != t3
+
+    assert t1.digest == t2.digest
+    assert t1.digest != t3.digest
+    assert t1.digest != t1.words[1].digest
+    assert Document.from_entities((t1,)).digest == \
+      Document.from_entities((t2,)).digest
+    assert Document.from_entities((t1,)).digest != \
+      Document.from_entities((t1,), 'named').digest
+
+  def test_digest_of_equal_numbers(self) -> None:
+    word = Word(BBox(Interval(0, 5), Interval(0, 1)), '1')
+    n1 = Number(word.bbox, (word,), 1)
+    n2 = Number(word.bbox, (word,), 1.0)
+    assert n1 == n2 and n1.digest == n2.digest
+    assert n1.digest != Number(word.bbox, (word,), 2).digest
+
+    a1 = Address(word.bbox, 'a', (), (), likeness_score=1)
+    a2 = Address(word.bbox, 'a', (), (), likeness_score=1.0)
+    assert a1 == a2 and a1.digest == a2.digest
+
+    w1 = Word(BBox(Interval(0.0, 5), Interval(-0.0, 1)), 'zero')
+    w2 = Word(BBox(Interval(-0.0, 5.0), Interval(0, 1.0)), 'zero')
+    assert w1 == w2 and w1.digest == w2.digest
+
+  def test_subclass_hash_is_cached(self) -> None:
+    @dataclass(frozen=True)
+    class Marker(Entity):
+      label: str
+
+    m1 = Marker(BBox(Interval(0, 1), Interval(0, 1)), 'Marker', 'x')
+    m2 = Marker(BBox(Interval(0, 1), Interval(0, 1)), 'Marker', 'x')
+    assert hash(m1) == hash(m2) and m1 == m2
+    assert '_hash' in m1.__dict__
+    assert m1 != Marker(m1.bbox, 'Marker', 'y')
+
+  def test_pickle_keeps_types(self) -> None:
+    w1 = Word(BBox(Interval(0, 5), Interval(0, 1)), 'one')
+    w2 = Word(BBox(Interval(0.0, 5.0), Interval(0.0, 1.0)), 'one')
+    n1 = Number(w1.bbox, (w1,), True)
+    n2 = Number(w1.bbox, (w1,), 1)
+    loaded = pickle.loads(pickle.dumps(
+      Document.from_entities((w1, w2, n1, n2))))
+    assert [type(e.bbox.ix.a) for e in loaded.entities[:2]] == [int, float]
+    assert [type(cast(Number, e).value) for e in loaded.entities[2:]] == \
+      [bool, int]
+
+  def test_entity_table_keeps_types(self) -> None:
+    w1 = Word(BBox(Interval(0, 5), Interval(0, 1)), 'one')
+    w2 = Word(BBox(Interval(0.0, 5.0), Interval(0.0, 1.0)), 'one')
+    n1 = Number(w1.bbox, (w1,), True)
+    n2 = Number(w1.bbox, (w1,), 1)
+    table, roots = dump_entity_table(
+      (w1, w2, n1, n2, Number(w1.bbox, (w1,), 1)))
+    assert roots == [0, 1, 2, 3, 3]
+    assert [type(entry['value']) for entry in table[2:]] == [bool, int]
+
+    @dataclass(frozen=True)
+    class Tagged(Entity):
+      tags: Any
+
+    t1 = Tagged(w1.bbox, 'Tagged', ['a'])
+    t2 = Tagged(w1.bbox, 'Tagged', {'a'})
+    table, roots = dump_entity_table(
+      (t1, Tagged(w1.bbox, 'Tagged', ['a']), t2, t2,
+       Tagged(w1.bbox, 'Tagged', {'a'})))
+    # Unhashable values are only shared by identity.
+    assert roots == [0, 0, 1, 1, 2]
@@ -0,0 +1,69 @@
+from unittest import TestCase
+import json
+
+import numpy as np
+
+from foundation.document import Document, dump_to_json, load_fnd_doc_from_json
+from foundation.entity import Date, Table, TableCell, TableRow, Text, Word
+from foundation.entity_store import EntityStore
+from foundation.geometry import BBox, FixedPoint, Interval, Point
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document() -> Document:
+  w1 = Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'Jan')
+  w2 = Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), '2020')
+  text = Text.from_words((w1, w2))
+  date = Date(text.bbox, text.text, (w1, w2), likeness_score=0.5)
+  cell = TableCell(text.bbox, (text,))
+  row = TableRow(text.bbox, (cell,))
+  table = Table(text.bbox, (row,))
+  return Document.from_entities((w1, w2, text, date, table), name='doc')
+
+
+class TestEntityStore(TestCase):
+
+  def test_round_trip(self) -> None:
+    # Loading from JSON un-shares the words; the store shares them again.
+    doc = load_fnd_doc_from_json(json.loads(dump_to_json(sample_document())))
+    store = EntityStore.from_document(doc)
+
+    assert len(store) == 8
+    assert store.to_document() == doc
+    materialized = store.to_document()
+    assert materialized.entities[0] is \
+      materialized.entities[3].children.__next__() # type: ignore
+
+  def test_views(self) -> None:
+    doc = sample_document()
+    store = EntityStore.from_document(doc)
+    views = store.entities
+
+    assert [v.type for v in views] == [e.type for e in doc.entities]
+    assert [v.bbox for v in views] == [e.bbox for e in doc.entities]
+    assert [v.entity_text for v in views] == \
+      [e.entity_text for e in doc.entities]
+    assert [[w.text for w in v.entity_words()] for v in views] == \
+      [[w.text for w in e.entity_words()] for e in doc.entities]
+    assert views[3].likeness_score == 0.5
+    assert [v.materialize() for v in views[4].rows] == list(
+      doc.entities[4].children)
+    assert store.filter_ids(Text).tolist() == [2]
+
+  def test_coordinate_types(self) -> None:
+    blob = json.loads(dump_to_json(sample_document()))
+    doc = load_fnd_doc_from_json(blob, fixed_point=FixedPoint(10))
+    store = EntityStore.from_document(doc)
+    assert store.geometry.dtype == np.int64
+    materialized = store.to_document()
+    assert materialized == doc
+    assert type(materialized.entities[0].bbox.ix.b) is int
+
+    # Mixed coordinates are stored as floats.
+    w1 = Word(BBox(Interval(0, 5), Interval(0, 1)), 'a')
+    w2 = Word(BBox(Interval(0.5, 5), Interval(0, 1)), 'b')
+    doc = Document.from_entities((w1, w2))
+    store = EntityStore.from_document(doc)
+    assert store.geometry.dtype == np.float64
+    assert store.to_document() == doc
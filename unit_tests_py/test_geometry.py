@@ -0,0 +1,192 @@
+from itertools import chain
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+from unittest import TestCase
+import copy
+import pickle
+import random
+
+from foundation.geometry import BBox, GeometryInterner, Interval, IntervalIndex, Point
+
+
+# The aggregates as they were before they were made single-pass.
+
+def reference_interval_spanning(xs: Iterable[float]) -> Interval:
+  xs = tuple(xs)
+  if not xs:
+    raise RuntimeError('empty')
+  return Interval(min(xs), max(xs))
+
+
+def reference_spanning_intervals(Is: Iterable[Interval]) -> Interval:
+  return reference_interval_spanning(chain.from_iterable(I.ends for I in Is))
+
+
+def reference_interval_intersection(
+  Is: Iterable[Interval],
+) -> Optional[Interval]:
+  Is = tuple(Is)
+  if not Is:
+    raise RuntimeError('empty')
+  return Interval.build(max(I.a for I in Is), min(I.b for I in Is))
+
+
+def reference_bbox_spanning(ps: Iterable[Point]) -> Optional[BBox]:
+  ps = tuple(ps)
+  if not ps:
+    return None
+  return BBox(Interval(min(p.x for p in ps), max(p.x for p in ps)),
+              Interval(min(p.y for p in ps), max(p.y for p in ps)))
+
+
+def reference_bbox_intersection(bs: Iterable[BBox]) -> Optional[BBox]:
+  bs = tuple(bs)
+  if not bs:
+    return None
+  ix = reference_interval_intersection(b.ix for b in bs)
+  iy = reference_interval_intersection(b.iy for b in bs)
+  if ix is None or iy is None:
+    return None
+  return BBox(ix, iy)
+
+
+def reference_bbox_union(bs: Iterable[BBox]) -> Optional[BBox]:
+  return reference_bbox_spanning(
+    chain.from_iterable([b.corners() for b in bs]))
+
+
+def coordinates(value: Any) -> Any:
+  """Coordinates with their types, which equality alone would not check."""
+  if isinstance(value, BBox):
+    return coordinates(value.ix), coordinates(value.iy)
+  if isinstance(value, Interval):
+    return (value.a, type(value.a)), (value.b, type(value.b))
+  return value
+
+
+class TestAggregates(TestCase):
+
+  def assert_same(
+    self,
+    function: Callable[[Iterable[Any]], Any],
+    reference: Callable[[List[Any]], Any],
+    inputs: Sequence[List[Any]],
+  ) -> None:
+    for items in inputs:
+      try:
+        expected = coordinates(reference(items))
+      except RuntimeError:
+        with self.assertRaises(RuntimeError):
+          function(items)
+        continue
+      assert coordinates(function(items)) == expected, items
+      # Also from a one-shot iterator.
+      assert coordinates(function(iter(items))) == expected, items
+
+  def test_intervals(self) -> None:
+    intervals = [
+      [],
+      [Interval(1, 2)],
+      # Invalid.
+      [Interval(3, 1)],
+      [Interval(0, 1), Interval(5, 2)],
+      # Disjoint.
+      [Interval(0, 1), Interval(2, 3)],
+      # Mixed int and float, with ties.
+      [Interval(1, 2.0), Interval(1.0, 2), Interval(0.5, 2)],
+      [Interval(2.0, 2), Interval(2, 2.0)],
+      [Interval(0, 1), Interval(2.0, 2), Interval(-1.0, -1)],
+    ]
+    self.assert_same(
+      Interval.spanning_intervals, reference_spanning_intervals, intervals)
+    self.assert_same(
+      Interval.intersection, reference_interval_intersection, intervals)
+    self.assert_same(
+      Interval.spanning, reference_interval_spanning,
+      [[], [1], [3, 1.0, 1, 3.0], [2.5, -1, 7]])
+
+  def test_bboxes(self) -> None:
+    rng = random.Random(3)
+    def random_bbox() -> BBox:
+      a, b, c, d = (rng.choice((rng.randint(0, 5), float(rng.randint(0, 5))))
+                    for _ in range(4))
+      return BBox(Interval(a, b), Interval(c, d))
+    bboxes = [
+      [],
+      [BBox(Interval(0, 1), Interval(2, 3))],
+      # Invalid.
+      [BBox(Interval(3, 1), Interval(0, 1))],
+      [BBox(Interval(0, 4), Interval(0, 4)),
+       BBox(Interval(3, 1), Interval(2, 1))],
+      # Disjoint.
+      [BBox(Interval(0, 1), Interval(0, 1)),
+       BBox(Interval(2, 3), Interval(2, 3))],
+      # Mixed int and float, with ties.
+      [BBox(Interval(0, 1.0), Interval(0.0, 1)),
+       BBox(Interval(0.0, 1), Interval(0, 1.0))],
+    ] + [[random_bbox() for _ in range(rng.randint(1, 5))] for _ in range(200)]
+    self.assert_same(BBox.union, reference_bbox_union, bboxes)
+    self.assert_same(BBox.intersection, reference_bbox_intersection, bboxes)
+    points = [list(chain.from_iterable(b.corners() for b in bs))
+              for bs in bboxes]
+    self.assert_same(BBox.spanning, reference_bbox_spanning, points)
+
+
+class TestIntervalIndex(TestCase):
+
+  def test_matches_brute_force(self) -> None:
+    rng = random.Random(0)
+    def random_interval() -> Interval:
+      a = float(rng.randint(0, 50))
+      return Interval(a, a + rng.randint(0, 10))
+    intervals = [random_interval() for _ in range(300)]
+    other = [random_interval() for _ in range(100)]
+    index = IntervalIndex(intervals)
+    n = len(intervals)
+
+    for _ in range(50):
+      query = random_interval()
+      x = rng.uniform(0, 60)
+      assert index.overlapping(query) == \
+        [i for i in range(n) if intervals[i].intersects_interval(query)]
+      assert index.stabbing(x) == [i for i in range(n) if x in intervals[i]]
+      assert index.containing(query) == \
+        [i for i in range(n) if intervals[i].contains_interval(query)]
+      assert index.contained_in(query) == \
+        [i for i in range(n) if query.contains_interval(intervals[i])]
+
+    assert index.overlapping_pairs() == [
+      (i, j) for i in range(n) for j in range(i + 1, n)
+      if intervals[i].intersects_interval(intervals[j])]
+    assert index.overlapping_pairs(IntervalIndex(other)) == [
+      (i, j) for i in range(n) for j in range(len(other))
+      if intervals[i].intersects_interval(other[j])]
+
+  def test_contained_in_long_intervals(self) -> None:
+    # Many long intervals overlap the query, but few are inside it.
+    intervals = [Interval(i, i + 1000) for i in range(1000)] + \
+      [Interval(500, 501), Interval(600.5, 601)]
+    index = IntervalIndex(intervals)
+    assert index.contained_in(Interval(400, 700)) == [1000, 1001]
+    assert index.contained_in(Interval(0, 1000)) == [0, 1000, 1001]
+    assert index.contained_in(Interval(5, 1)) == []
+
+  def test_empty(self) -> None:
+    index = IntervalIndex([])
+    assert index.overlapping(Interval(0, 1)) == []
+    assert index.overlapping_pairs() == []
+
+
+class TestGeometryObjects(TestCase):
+
+  def test_slots_and_pickling(self) -> None:
+    b = BBox(Interval(0, 1.5), Interval(2, 3))
+    assert not hasattr(b, '__dict__')
+    assert pickle.loads(pickle.dumps(b)) == b
+    assert copy.deepcopy(b) == b
+
+  def test_interning(self) -> None:
+    interner = GeometryInterner()
+    b1 = interner.bbox(Interval(0, 1.5), Interval(2, 3))
+    b2 = interner.bbox(Interval(0, 1.5), Interval(2, 3))
+    assert b1 is b2
+    assert interner.interval(0, 1) is not interner.interval(0.0, 1.0)
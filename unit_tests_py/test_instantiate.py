@@ -0,0 +1,52 @@
+import json
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from unittest import TestCase
+
+from foundation.document import Document, dump_to_json
+from foundation.entity import Entity, Text, Word, entity_resolver
+from foundation.geometry import BBox, Interval
+from foundation.instantiate import compile_decoder, instantiate
+
+
+@dataclass(frozen=True)
+class Leaf:
+  x: int
+  name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Tree:
+  leaves: Tuple[Leaf, ...]
+  weights: List[float]
+  by_name: Dict[str, Leaf]
+  root: Optional[Leaf] = None
+
+
+class TestInstantiate(TestCase):
+
+  def test_compiled_decoder_matches_instantiate(self) -> None:
+    blob = {
+      'leaves': [{'x': 1}, {'x': 2, 'name': 'b'}],
+      'weights': [1, 2.5],
+      'by_name': {'a': {'x': 3}},
+      'root': None,
+    }
+    assert compile_decoder(Tree)(blob) == instantiate(Tree, blob)
+
+    with self.assertRaises(RuntimeError):
+      compile_decoder(Tree)({'leaves': {}, 'weights': [], 'by_name': {}})
+
+  def test_compiled_decoder_dispatches_base_classes(self) -> None:
+    w1 = Word(BBox(Interval(0, 1), Interval(0, 1)), 'a')
+    w2 = Word(BBox(Interval(2, 3), Interval(0, 1)), 'b')
+    doc = Document.from_entities((w1, w2, Text.from_words((w1, w2))))
+    blob = json.loads(dump_to_json(doc))
+
+    decode = compile_decoder(
+      Document, base_classes={Entity}, derived_class_resolver=entity_resolver)
+    assert decode(blob) == instantiate(
+      Document, blob, base_classes={Entity},
+      derived_class_resolver=entity_resolver)
+    assert isinstance(decode(blob).entities[2], Text)
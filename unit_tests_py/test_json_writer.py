@@ -0,0 +1,39 @@
+from dataclasses import asdict
+from io import StringIO
+from typing import Any, Dict, Tuple
+from unittest import TestCase
+import json
+
+from foundation.document import Document, dump_to_json
+from foundation.entity import Text, Word
+from foundation.extraction import Extraction, ExtractionPoint
+from foundation.geometry import BBox, Point
+from foundation.json_writer import DataclassEncoder, write_json
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document() -> Document:
+  words = tuple(
+    Word(unwrap(BBox.spanning((Point(i, 0), Point(i + 0.5, 1.25)))), f'w{i}')
+    for i in range(20))
+  texts = tuple(Text.from_words(words[i:i + 4]) for i in range(0, 20, 4))
+  return Document.from_entities(words + texts, 'sample')
+
+
+class TestJSONWriter(TestCase):
+
+  def test_matches_asdict(self) -> None:
+    doc = sample_document()
+    assert dump_to_json(doc) == json.dumps(asdict(doc))
+    assert DataclassEncoder(indent=2, sort_keys=True).encode(doc) == \
+      json.dumps(asdict(doc), indent=2, sort_keys=True)
+
+    extraction = Extraction((ExtractionPoint('first', doc.entities[-1]),))
+    option_sets: Tuple[Dict[str, Any], ...] = \
+      ({}, {'indent': 2, 'sort_keys': True})
+    for options in option_sets:
+      for chunk_size in (1, 1 << 16):
+        f = StringIO()
+        write_json(extraction, f, chunk_size, **options)
+        assert f.getvalue() == json.dumps(asdict(extraction), **options)
@@ -0,0 +1,41 @@
+from typing import cast
+from unittest import TestCase
+import json
+
+from foundation.document import Document, dump_to_json
+from foundation.entity import Text, Word
+from foundation.geometry import BBox, Point
+from foundation.lazy import LazyDocument
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document() -> Document:
+  w1 = Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'hello')
+  w2 = Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), 'world')
+  return Document.from_entities(
+    (Text.from_words((w1, w2)), w1, w2), 'sample')
+
+
+class TestLazyDocument(TestCase):
+
+  def test_decodes_on_demand(self) -> None:
+    doc = sample_document()
+    lazy = LazyDocument(json.loads(dump_to_json(doc)))
+    assert lazy.bbox == doc.bbox
+    assert lazy.name == 'sample'
+    assert len(lazy) == 3
+    assert lazy.decoded_count == 0
+
+    assert tuple(lazy.filter_entities(Word)) == doc.entities[1:]
+    assert lazy.decoded_count == 2
+    assert lazy.entity(1) is lazy.entity(1)
+    assert lazy.to_document() == doc
+    assert lazy.decoded_count == 3
+
+  def test_by_reference(self) -> None:
+    doc = sample_document()
+    lazy = LazyDocument(json.loads(dump_to_json(doc, by_reference=True)))
+    assert lazy.entity_type(0) is Text
+    assert lazy.entity(2) is cast(Text, lazy.entity(0)).words[1]
+    assert lazy.to_document() == doc
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from foundation.document import Document
+from foundation.entity import Page, Word
+from foundation.geometry import BBox, Point
+from foundation.lines import build_clusters, build_lines, document_lines
+
+from foundation.typing_utils import unwrap
+
+
+def _word(x: float, y: float, text: str) -> Word:
+  return Word(unwrap(BBox.spanning((Point(x, y), Point(x + 4, y + 1)))), text)
+
+
+class TestLines(TestCase):
+
+  def test_build_lines(self) -> None:
+    words = (
+      _word(0, 0, 'Net'), _word(4.5, 0.1, 'Pay'),
+      # Another column.
+      _word(20, 0.05, '$100'),
+      _word(0, 1.2, 'Gross'), _word(4.5, 1.2, 'Pay'),
+      # A new paragraph.
+      _word(0, 5, 'Total'),
+    )
+    lines = build_lines(reversed(words))
+    assert [line.text for line in lines] == \
+      ['Net Pay', '$100', 'Gross Pay', 'Total']
+    assert build_lines(words) == lines
+    assert build_lines(()) == ()
+
+    clusters = build_clusters(lines)
+    assert [cluster.text for cluster in clusters] == \
+      ['Net Pay\nGross Pay', '$100', 'Total']
+    assert build_clusters(tuple(reversed(lines))) == clusters
+
+    page = Page(unwrap(BBox.spanning((Point(0, 0), Point(30, 10)))), 0)
+    doc = Document.from_entities(words + (page,))
+    assert document_lines(doc) == lines
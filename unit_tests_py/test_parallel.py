@@ -0,0 +1,46 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foundation.document import Document
+from foundation.entity import Word
+from foundation.geometry import BBox, Point
+from foundation.parallel import load_documents, parallel_map, save_documents
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document(name: str) -> Document:
+  word = Word(unwrap(BBox.spanning((Point(0, 0.5), Point(5, 1)))), name)
+  return Document.from_entities((word,), name)
+
+
+def reciprocal(x: int) -> float:
+  return 1 / x
+
+
+class TestParallel(TestCase):
+
+  def test_parallel_map(self) -> None:
+    for ordered in (True, False):
+      results = list(parallel_map(
+        reciprocal, range(-5, 6), max_workers=2, chunk_size=3,
+        ordered=ordered, max_in_flight=1))
+      if ordered:
+        assert [r.item for r in results] == list(range(-5, 6))
+      assert sorted(r.item for r in results) == list(range(-5, 6))
+      for r in results:
+        assert r.ok == (r.item != 0)
+        assert r.value == (1 / r.item if r.item else None)
+      failed, = (r for r in results if not r.ok)
+      assert 'ZeroDivisionError' in unwrap(failed.error)
+
+  def test_load_and_save(self) -> None:
+    docs = [sample_document(f'doc{i}') for i in range(6)]
+    with TemporaryDirectory() as tmp:
+      paths = [Path(tmp) / f'doc{i}.json' for i in range(6)]
+      assert all(r.ok for r in save_documents(zip(docs, paths), 2))
+      results = list(load_documents(
+        paths + [Path(tmp) / 'missing.json'], 2, chunk_size=2))
+    assert [r.value for r in results[:-1]] == docs
+    assert 'FileNotFoundError' in unwrap(results[-1].error)
@@ -0,0 +1,67 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+import subprocess
+import sys
+from typing import Optional
+from unittest import TestCase
+
+from foundation.document import Document
+from foundation.entity import Text, Word
+from foundation.geometry import BBox, Point
+from foundation.shm import SharedDocument
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document() -> Document:
+  w1 = Word(unwrap(BBox.spanning((Point(0, 0.5), Point(5, 1)))), 'hello')
+  w2 = Word(unwrap(BBox.spanning((Point(6, 0.5), Point(11, 1)))), 'world')
+  return Document.from_entities((w1, w2, Text.from_words((w1, w2))), 'doc')
+
+
+def shared_text(name: str) -> Optional[str]:
+  with SharedDocument.attach(name) as shared:
+    return shared.entities[2].text
+
+
+class TestSharedDocument(TestCase):
+
+  def test_publish_and_attach(self) -> None:
+    doc = sample_document()
+    with SharedDocument.publish(doc) as shared:
+      assert shared.to_document() == doc
+      assert not shared.store.geometry.x0.flags.writeable
+      with ProcessPoolExecutor(1) as pool:
+        assert pool.submit(shared_text, shared.name).result() == 'hello world'
+
+      attached = SharedDocument.attach(shared.name)
+      assert attached.to_document() == doc
+      attached.detach()
+      with self.assertRaises(ValueError):
+        attached.store
+      with self.assertRaises(ValueError):
+        attached.unlink()
+
+  def test_resource_tracker(self) -> None:
+    # The resource tracker reports errors on the stderr of the process tree,
+    # so run the whole lifecycle in a fresh interpreter.
+    script = '''if True:
+      from concurrent.futures import ProcessPoolExecutor
+      from test_shm import sample_document, shared_text
+      from foundation.shm import SharedDocument
+      shared = SharedDocument.publish(sample_document())
+      with ProcessPoolExecutor(1) as pool:
+        assert pool.submit(shared_text, shared.name).result() == 'hello world'
+      attached = SharedDocument.attach(shared.name)
+      attached.detach()
+      shared.unlink()
+    '''
+    tests = Path(__file__).parent
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+      [str(tests.parent / 'py'), str(tests)]))
+    result = subprocess.run(
+      [sys.executable, '-c', script], env=env, stdout=subprocess.PIPE,
+      stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stderr == ''
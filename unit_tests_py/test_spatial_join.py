@@ -0,0 +1,45 @@
+from unittest import TestCase
+import random
+
+from foundation.geometry import BBox, Interval
+from foundation.spatial_join import Contains, Intersects, MinOverlap, WithinDistance, overlap_fraction, scored_spatial_join, spatial_join
+
+
+def random_bbox(rng: random.Random, size: float) -> BBox:
+  x, y = rng.uniform(0, 100), rng.uniform(0, 100)
+  return BBox(Interval(x, x + rng.uniform(0, size)),
+              Interval(y, y + rng.uniform(0, size)))
+
+
+class TestSpatialJoin(TestCase):
+
+  def test_matches_brute_force(self) -> None:
+    rng = random.Random(0)
+    left = [random_bbox(rng, 30) for _ in range(150)]
+    right = [random_bbox(rng, 5) for _ in range(200)]
+    pairs = [(i, j) for i in range(len(left)) for j in range(len(right))]
+
+    assert spatial_join(left, right, Intersects()) == \
+      [(i, j) for i, j in pairs if left[i].intersects_bbox(right[j])]
+    assert spatial_join(left, right, Contains()) == \
+      [(i, j) for i, j in pairs if left[i].contains_bbox(right[j])]
+    assert spatial_join(left, right, MinOverlap(0.5)) == \
+      [(i, j) for i, j in pairs if left[i].intersects_bbox(right[j]) and
+       overlap_fraction(left[i], right[j]) >= 0.5]
+    assert scored_spatial_join(left, right, WithinDistance(3)) == \
+      [(i, j, BBox.distance(left[i], right[j])) for i, j in pairs
+       if BBox.distance(left[i], right[j]) <= 3]
+
+  def test_min_overlap_must_be_positive(self) -> None:
+    for fraction in (0, -0.5, float('nan')):
+      with self.assertRaises(ValueError):
+        MinOverlap(fraction)
+
+  def test_invalid_boxes_never_match(self) -> None:
+    valid = BBox(Interval(0, 2), Interval(0, 2))
+    # Valid once grown by 1 on each side.
+    invalid = BBox(Interval(2, 1), Interval(1, 0.5))
+    for predicate in (Intersects(), WithinDistance(1), WithinDistance(10)):
+      assert spatial_join([invalid], [valid], predicate) == []
+      assert spatial_join([valid], [invalid], predicate) == []
+    assert spatial_join([valid], [valid], WithinDistance(1)) == [(0, 0)]
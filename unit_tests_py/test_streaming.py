@@ -0,0 +1,40 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from foundation.document import Document, save_document
+from foundation.entity import Date, Text, Word
+from foundation.geometry import BBox, Point
+from foundation.streaming import iter_entities
+
+from foundation.typing_utils import unwrap
+
+
+def sample_document() -> Document:
+  words = tuple(
+    Word(unwrap(BBox.spanning((Point(i, 0), Point(i + 0.5, 1.25)))), f'w{i}')
+    for i in range(20))
+  texts = tuple(Text.from_words(words[i:i + 4]) for i in range(0, 20, 4))
+  return Document.from_entities(words + texts, 'sample "doc"')
+
+
+class TestStreaming(TestCase):
+
+  def test_iter_entities(self) -> None:
+    doc = sample_document()
+    with TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'doc.json'
+      save_document(doc, path)
+      for chunk_size in (1, 7, 1 << 16):
+        assert tuple(iter_entities(path, chunk_size=chunk_size)) == \
+          doc.entities
+        assert tuple(iter_entities(path, {Text}, chunk_size=chunk_size)) == \
+          tuple(doc.filter_entities(Text))
+      assert tuple(iter_entities(path, {Date})) == ()
+
+  def test_by_reference(self) -> None:
+    with TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'doc.json'
+      save_document(sample_document(), path, by_reference=True)
+      with self.assertRaises(ValueError):
+        tuple(iter_entities(path))
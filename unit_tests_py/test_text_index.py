@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from foundation.document import Document
+from foundation.entity import Page, Text, Word
+from foundation.geometry import BBox, Point
+
+from foundation.typing_utils import unwrap
+
+
+def _word(x: float, y: float, text: str) -> Word:
+  return Word(unwrap(BBox.spanning((Point(x, y), Point(x + 4, y + 1)))), text)
+
+
+class TestTextIndex(TestCase):
+
+  def test_search(self) -> None:
+    net, pay, payroll = _word(0, 0, 'Net'), _word(5, 0, 'Pay:'), \
+      _word(0, 2, 'PAYROLL')
+    total = _word(0, 4, 'Total')
+    line = Text.from_words((net, pay))
+    page = Page(unwrap(BBox.spanning((Point(0, 0), Point(10, 10)))), 0)
+    doc = Document.from_entities((net, pay, payroll, total, line, page))
+    index = doc.text_index
+
+    assert index.entities == (net, pay, payroll, total, line)
+    assert index.search('pay') == (pay, line)
+    assert index.search('pay', case_sensitive=True) == ()
+    assert index.search('Pay', case_sensitive=True) == (pay, line)
+    assert index.search('pay', prefix=True) == (pay, payroll, line)
+    assert index.search('PAY', prefix=True, case_sensitive=True) == \
+      (payroll,)
+    assert index.search('net pay') == (line,)
+    assert index.search('Net: pa', prefix=True) == (line,)
+    assert index.search('pay net') == ()
+    assert index.search('--') == ()
+    assert index.occurrences('pay') == [(1, 0), (4, 1)]
+
+    assert index.search_regex(r'Pay\b') == (pay, line)
+    assert index.search_regex(r'Y[rR]O') == (payroll,)
+    assert index.search_regex(r'ota|^Net') == (net, total, line)
+    assert index.search_regex(r'net p', flags=0) == ()
+    assert index.search_regex(r'(?i)net p') == (line,)
+    assert index.search_regex(r'\bPAY') == (payroll,)
+    assert index.search_regex(r'(?i)\bpay') == (pay, payroll, line)
+    assert index.search_regex(r'(?i)^pay: ') == ()
+    assert index.search_regex(r'(?i)\bay') == ()
+    assert index.search_regex(r'(?i)et pay:') == (line,)
+
+    accented = _word(0, 6, 'éPay')
+    index = Document.from_entities((accented,)).text_index
+    assert index.search_regex(r'(?a)\bPay') == (accented,)
+    assert index.search_regex(r'\bPay') == ()
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from foundation.entity import Date, Table, TableCell, TableRow, Text, Word
+from foundation.geometry import BBox, Point
+from foundation.traversal import find, walk, walk_with_depths
+
+from foundation.typing_utils import unwrap
+
+
+class TestTraversal(TestCase):
+
+  def setUp(self) -> None:
+    self.w1 = Word(unwrap(BBox.spanning((Point(0, 0), Point(5, 1)))), 'Jan')
+    self.w2 = Word(unwrap(BBox.spanning((Point(6, 0), Point(11, 1)))), '2020')
+    self.text = Text.from_words((self.w1, self.w2))
+    self.date = Date(self.text.bbox, self.text.text, (self.w1, self.w2))
+    self.cell = TableCell(self.text.bbox, (self.text,))
+    self.row = TableRow(self.text.bbox, (self.cell,))
+    self.table = Table(self.text.bbox, (self.row,))
+
+  def test_walk(self) -> None:
+    roots = (self.table, self.date)
+    assert list(walk(roots)) == [
+      self.table, self.row, self.cell, self.text, self.w1, self.w2, self.date]
+    assert list(walk(roots, dedupe=False))[-3:] == \
+      [self.date, self.w1, self.w2]
+    assert list(walk(roots, breadth_first=True)) == [
+      self.table, self.date, self.row, self.w1, self.w2, self.cell, self.text]
+    assert list(walk(roots, prune=(TableCell,))) == \
+      [self.table, self.row, self.cell, self.date, self.w1, self.w2]
+    assert list(walk_with_depths((self.table,), max_depth=1)) == \
+      [(0, self.table), (1, self.row)]
+    assert list(find(roots, Word)) == [self.w1, self.w2]
+
+  def test_cached_entity_words(self) -> None:
+    assert list(self.table.entity_words()) == [self.w1, self.w2]
+    assert list(self.table.entity_words()) == [self.w1, self.w2]
+    assert list(self.w1.entity_words()) == [self.w1]
+    assert self.table == Table(self.text.bbox, (self.row,))